@@ -0,0 +1,78 @@
+#!/usr/bin/python3
+
+# Builds an APT root directory (dpkg status, sources and lists) so that the tests and
+# benchmarks check for updates against known packages instead of the state of the system.
+
+import contextlib
+import os
+import tempfile
+
+import apt
+import apt_pkg
+
+SITE = "archive.example.org"
+ARCH = apt_pkg.config.find("APT::Architecture")
+
+def get_stanza(package, **fields):
+    """ Returns a package stanza, package is a dict with at least Package and Version """
+    name = package["Package"]
+    stanza = {"Package": name,
+              "Architecture": ARCH,
+              "Maintainer": "Maintainer <maintainer@example.org>",
+              "Section": "utils",
+              "Description": "%s package\n Long description of %s." % (name, name)}
+    stanza.update(fields)
+    stanza.update(package)
+    return "".join("%s: %s\n" % (key, value) for (key, value) in stanza.items()) + "\n"
+
+class AptRoot():
+
+    def __init__(self, path):
+        self.path = path
+        self.lists_path = os.path.join(path, "var/lib/apt/lists")
+        self.suites = []
+        for directory in ("etc/apt", "var/lib/dpkg", "var/lib/apt/lists", "var/cache/apt"):
+            os.makedirs(os.path.join(path, directory), exist_ok=True)
+        # No binary caches, the files are rewritten faster than their mtime changes
+        with open(os.path.join(path, "etc/apt/apt.conf"), "w") as f:
+            f.write('Dir::Cache::pkgcache "";\nDir::Cache::srcpkgcache "";\nAPT::Architectures { "%s"; };\n' % ARCH)
+
+    def write_status(self, packages):
+        with open(os.path.join(self.path, "var/lib/dpkg/status"), "w") as f:
+            for package in packages:
+                f.write(get_stanza(package, Status="install ok installed"))
+
+    def write_archive(self, suite, packages, origin="Debian", label="Debian"):
+        """ Writes the Release and Packages files of a suite and adds it to the sources """
+        if suite not in self.suites:
+            self.suites.append(suite)
+            with open(os.path.join(self.path, "etc/apt/sources.list"), "w") as f:
+                for name in self.suites:
+                    f.write("deb [trusted=yes] http://%s/debian %s main\n" % (SITE, name))
+        prefix = os.path.join(self.lists_path, "%s_debian_dists_%s_" % (SITE, suite))
+        with open(prefix + "Release", "w") as f:
+            f.write("Origin: %s\nLabel: %s\nSuite: %s\nCodename: %s\nArchitectures: %s\nComponents: main\n" %
+                    (origin, label, suite, suite, ARCH))
+        with open(prefix + "main_binary-%s_Packages" % ARCH, "w") as f:
+            for package in packages:
+                f.write(get_stanza(package, Filename="pool/%s_%s.deb" % (package["Package"], package["Version"]),
+                                   Size="1000"))
+
+    def open_cache(self):
+        return apt.Cache(rootdir=self.path)
+
+def restore_system_config():
+    """ apt.Cache(rootdir) changes the global APT configuration, point it back to the system """
+    for key in ("Dir", "Dir::State::status", "Dir::bin::dpkg", "Dir::Cache::pkgcache", "Dir::Cache::srcpkgcache",
+                "APT::Architectures"):
+        apt_pkg.config.clear(key)
+    apt_pkg.init_config()
+    apt_pkg.init_system()
+
+@contextlib.contextmanager
+def apt_root():
+    with tempfile.TemporaryDirectory() as path:
+        try:
+            yield AptRoot(path)
+        finally:
+            restore_system_config()
@@ -0,0 +1,72 @@
+#!/usr/bin/python3
+
+# Compares the time and memory APTCheck.find_changes() takes to build the updates from the
+# marked upgrades, with apt.Cache and with the apt_pkg engine (use_apt_pkg).
+# The dist-upgrade is marked once beforehand in each cache, it's the same for both.
+#
+# Without arguments the local system is used. With a number of packages, an APT root is
+# generated with that many installed packages (3 per source), a tenth of them upgradable.
+#
+# Usage: tests/benchmark_apt_pkg_engine.py [number of installed packages]
+
+import os
+import sys
+import time
+import tracemalloc
+
+myPath = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, myPath + '/../usr/lib/linuxmint/mintUpdate/')
+
+from apt_root import apt_root
+from checkAPT import APTCheck
+from Classes import Blacklist
+
+RUNS = 5
+
+def get_packages(count):
+    installed = []
+    security = []
+    updates = []
+    for i in range(count // 3):
+        source = "source%04d" % i
+        for name, section in (("lib%s1" % source, "libs"), (source, "utils"), ("%s-data" % source, "misc")):
+            installed.append({"Package": name, "Version": "1.0-1", "Source": source, "Section": section})
+            if i % 10 == 0:
+                package = {"Package": name, "Version": "1.0-2", "Source": source, "Section": section}
+                (security if i % 30 == 0 else updates).append(package)
+    return installed, security, updates
+
+def measure(check):
+    blacklist = Blacklist(check.settings.get_strv("blacklisted-packages"))
+    for use_apt_pkg in (False, True):
+        check.use_apt_pkg = use_apt_pkg
+        check.mark_upgrades()
+    check.mark_upgrades = lambda: None
+    print("%d installed packages, %d upgrades" % (len([pkg for pkg in check.cache if pkg.is_installed]),
+                                                 len(check.cache.get_changes())))
+    for name, use_apt_pkg in [("apt.Cache", False), ("apt_pkg", True)]:
+        check.use_apt_pkg = use_apt_pkg
+        timings = []
+        for i in range(RUNS):
+            start = time.perf_counter()
+            check.find_changes(blacklist)
+            timings.append(time.perf_counter() - start)
+        tracemalloc.start()
+        check.find_changes(blacklist)
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print("%-10s %8.1f ms (best of %d) %8.1f KiB peak allocations, %d updates" %
+              (name, min(timings) * 1000, RUNS, peak / 1024, len(check.updates)))
+
+if __name__ == "__main__":
+    check = APTCheck()
+    if len(sys.argv) > 1:
+        with apt_root() as root:
+            installed, security, updates = get_packages(int(sys.argv[1]))
+            root.write_status(installed)
+            root.write_archive("stable-security", security, label="Debian-Security")
+            root.write_archive("stable-updates", updates)
+            check._cache = root.open_cache()
+            measure(check)
+    else:
+        measure(check)
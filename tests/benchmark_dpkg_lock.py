@@ -0,0 +1,36 @@
+#!/usr/bin/python3
+
+# Compares the cost of Classes.get_dpkg_lock_holder() with the former
+# subprocess based check (fuser on /var/lib/dpkg/lock).
+#
+# Usage: tests/benchmark_dpkg_lock.py [number of calls]
+
+import os
+import subprocess
+import sys
+import timeit
+
+myPath = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, myPath + '/../usr/lib/linuxmint/mintUpdate/')
+
+from Classes import get_dpkg_lock_holder
+
+def subprocess_check():
+    # The former dpkg_lock_check.sh, without the sudo round trip
+    try:
+        subprocess.run(["/bin/fuser", "/var/lib/dpkg/lock"],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+        return True
+    except subprocess.CalledProcessError:
+        return False
+
+def in_process_check():
+    return get_dpkg_lock_holder() is not None
+
+if __name__ == "__main__":
+    number = int(sys.argv[1]) if len(sys.argv) > 1 else 100
+    print("Locked: subprocess=%s, in-process=%s (holder: %s)" % \
+        (subprocess_check(), in_process_check(), get_dpkg_lock_holder()))
+    for name, func in [("subprocess", subprocess_check), ("in-process", in_process_check)]:
+        seconds = timeit.timeit(func, number=number)
+        print("%-12s %10.1f us per call" % (name, seconds * 1000000 / number))
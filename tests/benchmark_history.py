@@ -0,0 +1,41 @@
+#!/usr/bin/python3
+
+# Measures the history index on a synthetic dpkg.log: the first indexing,
+# an incremental run, loading the entries (by page and all of them) and sorting them by name.
+#
+# Usage: tests/benchmark_history.py [number of entries]
+
+import os
+import sys
+import tempfile
+import time
+
+myPath = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, myPath + '/../usr/lib/linuxmint/mintUpdate/')
+
+import history
+
+def measure(name, func):
+    start = time.perf_counter()
+    result = func()
+    print("%-20s %8.1f ms" % (name, (time.perf_counter() - start) * 1000))
+    return result
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        log_path = os.path.join(tmp_dir, "dpkg.log")
+        with open(log_path, "w") as f:
+            for i in range(count):
+                f.write("2024-%02d-%02d %02d:%02d:%02d upgrade package%d:amd64 1.%d-1 1.%d-2\n" % \
+                    (i % 12 + 1, i % 28 + 1, i % 24, i % 60, i % 60, i, i, i))
+        history.DPKG_LOG_PATTERN = log_path + "*"
+        index = history.UpdateHistory(os.path.join(tmp_dir, "history.db"))
+        print("%d entries" % count)
+        measure("first indexing", index.update)
+        measure("incremental update", index.update)
+        first_entries = measure("load first entries", lambda: index.get_entries(2000))
+        measure("load next entries", lambda: index.get_entries(2000, first_entries.get_next_key()))
+        entries = measure("load all entries", index.get_entries)
+        measure("sort by name", lambda: entries.get_order(2, False))
+        measure("sort by date", lambda: entries.get_order(0, True))
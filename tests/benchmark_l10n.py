@@ -0,0 +1,99 @@
+#!/usr/bin/python3
+
+# Compares the legacy Translation file parser with checkAPT.TranslationFile
+# (first run without an index, then with the offset index).
+#
+# Usage: tests/benchmark_l10n.py /var/lib/apt/lists/<...>_i18n_Translation-de [number of packages]
+
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+myPath = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, myPath + '/../usr/lib/linuxmint/mintUpdate/')
+
+def pick_packages(path, count):
+    """ Picks every nth package of the file, to simulate a list of updates """
+    names = []
+    with open(path, encoding="utf-8", errors="replace") as f:
+        for line in f:
+            if line.startswith("Package: "):
+                names.append(line[9:].strip())
+    step = max(1, len(names) // count)
+    return names[::step][:count]
+
+def run_legacy(path, pkgnames):
+    # Same approach as the former APTCheck.apply_l10n_descriptions()
+    import codecs
+    found = 0
+    super_buffer = []
+    fd = codecs.open(path, "r", "utf-8")
+    super_buffer += fd.readlines()
+    i = 0
+    while i < len(super_buffer):
+        line = super_buffer[i].strip()
+        if line.startswith("Package: "):
+            pkgname = line.replace("Package: ", "")
+            if pkgname in pkgnames:
+                j = 2
+                while i + j < len(super_buffer):
+                    if super_buffer[i+j].strip().startswith("Package: "):
+                        break
+                    j += 1
+                found += 1
+        i += 1
+    return found
+
+def run_streaming(path, pkgnames):
+    import checkAPT
+    found = 0
+    for pkgname, lines in checkAPT.TranslationFile(path).get_stanzas(pkgnames):
+        found += 1
+    return found
+
+def measure(mode, path, pkgnames):
+    start = time.perf_counter()
+    if mode == "legacy":
+        found = run_legacy(path, pkgnames)
+    else:
+        found = run_streaming(path, pkgnames)
+    elapsed = time.perf_counter() - start
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return {"mode": mode, "found": found, "seconds": elapsed, "peak_rss_kb": peak_rss}
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "--child":
+        mode, path, names_file = sys.argv[2:5]
+        with open(names_file) as f:
+            pkgnames = set(json.load(f))
+        if mode != "legacy":
+            import checkAPT
+            checkAPT.L10N_INDEX_PATH = os.environ["L10N_INDEX_PATH"]
+        print(json.dumps(measure(mode, path, pkgnames)))
+        sys.exit(0)
+
+    if len(sys.argv) < 2:
+        print("Usage: %s TRANSLATION_FILE [NUMBER_OF_PACKAGES]" % sys.argv[0])
+        sys.exit(1)
+
+    path = sys.argv[1]
+    count = int(sys.argv[2]) if len(sys.argv) > 2 else 300
+    pkgnames = pick_packages(path, count)
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        names_file = os.path.join(tmp_dir, "names.json")
+        with open(names_file, "w") as f:
+            json.dump(pkgnames, f)
+        env = dict(os.environ, L10N_INDEX_PATH=os.path.join(tmp_dir, "l10n"))
+        print("%s (%d packages looked up)" % (path, len(pkgnames)))
+        # Each mode runs in its own process so that peak RSS is measured separately
+        for mode in ["legacy", "streaming-no-index", "streaming-indexed"]:
+            output = subprocess.run([sys.executable, __file__, "--child", mode, path, names_file],
+                                    stdout=subprocess.PIPE, env=env, check=True).stdout
+            result = json.loads(output)
+            print("%-20s %8.3f s %10d KB peak RSS %6d stanzas" % \
+                (result["mode"], result["seconds"], result["peak_rss_kb"], result["found"]))
@@ -0,0 +1,96 @@
+#!/usr/bin/python3
+
+# Measures how long building the list of updates blocks the main loop, with the former
+# per-row inserts into a sorted TreeStore and with the current batch build
+# (MintUpdate.fill_update_model, then a single sort).
+#
+# Usage: tests/benchmark_update_model.py [number of updates]
+
+import os
+import sys
+import time
+
+myPath = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, myPath + '/../usr/lib/linuxmint/mintUpdate/')
+
+import gi
+gi.require_version('Gtk', '3.0')
+from gi.repository import Gtk, GLib, GObject
+
+from Classes import Update
+
+(UPDATE_CHECKED, UPDATE_DISPLAY_NAME, UPDATE_OLD_VERSION, UPDATE_NEW_VERSION, UPDATE_SOURCE, UPDATE_SIZE, UPDATE_SIZE_STR, UPDATE_TYPE_PIX, UPDATE_TYPE, UPDATE_TOOLTIP, UPDATE_SORT_STR, UPDATE_OBJ) = range(12)
+
+def get_model_items(count):
+    items = []
+    for i in range(count):
+        update = Update()
+        update.source_name = update.display_name = "package%04d" % ((i * 7919) % count)
+        update.old_version = "1.%d-1" % i
+        update.new_version = "1.%d-2" % i
+        update.size = 1000 * i
+        update.type = ["package", "security", "kernel"][i % 3]
+        description = "Synthetic update number %d & co." % i
+        sort_key = "%d%s" % (i % 4 + 1, update.display_name)
+        items.append((update, update.display_name, description, "Ubuntu / jammy-updates",
+                      "mintupdate-type-%s-symbolic" % update.type, sort_key, "Software update"))
+    return items
+
+def new_model():
+    return Gtk.TreeStore(bool, str, str, str, str, GObject.TYPE_LONG, str, str, str, str, str, object)
+
+def build_legacy(treeview, items, settings):
+    model = new_model()
+    model.set_sort_column_id(UPDATE_SORT_STR, Gtk.SortType.ASCENDING)
+    for item in items:
+        update, title, description, source, icon, sort_key, tooltip = item
+        iter = model.insert_before(None, None)
+        model.row_changed(model.get_path(iter), iter)
+        model.set_value(iter, UPDATE_CHECKED, True)
+        if settings["show-descriptions"]:
+            model.set_value(iter, UPDATE_DISPLAY_NAME, "<b>%s</b>\n%s" % (GLib.markup_escape_text(title),
+                                                                          GLib.markup_escape_text(description)))
+        else:
+            model.set_value(iter, UPDATE_DISPLAY_NAME, "<b>%s</b>" % GLib.markup_escape_text(title))
+        model.set_value(iter, UPDATE_OLD_VERSION, update.old_version)
+        model.set_value(iter, UPDATE_NEW_VERSION, update.new_version)
+        model.set_value(iter, UPDATE_SOURCE, source)
+        model.set_value(iter, UPDATE_SIZE, update.size)
+        model.set_value(iter, UPDATE_SIZE_STR, str(update.size))
+        model.set_value(iter, UPDATE_TYPE_PIX, icon)
+        model.set_value(iter, UPDATE_TYPE, update.type)
+        model.set_value(iter, UPDATE_TOOLTIP, tooltip)
+        model.set_value(iter, UPDATE_SORT_STR, sort_key)
+        model.set_value(iter, UPDATE_OBJ, update)
+    treeview.set_model(model)
+
+def build_batch(treeview, items, settings):
+    # Same steps as MintUpdate.show_updates_in_UI() and fill_update_model()
+    model = new_model()
+    show_descriptions = settings["show-descriptions"]
+    for item in items:
+        update, title, description, source, icon, sort_key, tooltip = item
+        if show_descriptions:
+            display_name = "<b>%s</b>\n%s" % (GLib.markup_escape_text(title), GLib.markup_escape_text(description))
+        else:
+            display_name = "<b>%s</b>" % GLib.markup_escape_text(title)
+        model.append(None, (True, display_name, update.old_version, update.new_version, source,
+                            update.size, str(update.size), icon, update.type, tooltip, sort_key, update))
+    model.set_sort_column_id(UPDATE_SORT_STR, Gtk.SortType.ASCENDING)
+    treeview.set_model(model)
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    items = get_model_items(count)
+    settings = {"show-descriptions": True}
+    treeview = Gtk.TreeView()
+    treeview.append_column(Gtk.TreeViewColumn("Update", Gtk.CellRendererText(), markup=UPDATE_DISPLAY_NAME))
+    print("%d updates" % count)
+    for name, func in [("per-row inserts", build_legacy), ("batch build", build_batch)]:
+        timings = []
+        for i in range(5):
+            start = time.perf_counter()
+            func(treeview, items, settings)
+            timings.append(time.perf_counter() - start)
+            treeview.set_model(None)
+        print("%-16s %8.1f ms (best of 5)" % (name, min(timings) * 1000))
@@ -0,0 +1,97 @@
+#!/usr/bin/python3
+
+import sys, os
+myPath = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, myPath + '/../usr/lib/linuxmint/mintUpdate/')
+
+import pytest
+from apt_root import apt_root
+from checkAPT import APTCheck
+from Classes import Blacklist, Update
+
+INSTALLED = [
+    {"Package": "foo", "Version": "1.0"},
+    {"Package": "libfoo1", "Version": "1.0", "Source": "foo", "Section": "libs"},
+    {"Package": "foo-dev", "Version": "1.0", "Source": "foo", "Section": "libdevel"},
+    {"Package": "bar", "Version": "1:2.0-1", "Source": "bar-src (2.0-1)"},
+    {"Package": "held", "Version": "1.0"},
+    {"Package": "current", "Version": "1.0"},
+    {"Package": "gir1.2-baz", "Version": "0.9", "Source": "baz"},
+    {"Package": "baz-common", "Version": "0.9", "Source": "baz"},
+]
+
+SECURITY = [
+    {"Package": "foo", "Version": "1.1", "Depends": "libfoo1 (= 1.1)",
+     "Description": "Foo tool\n Does foo things & more.\n .\n  foo --verbatim\n Last paragraph."},
+    {"Package": "libfoo1", "Version": "1.1", "Source": "foo", "Section": "libs"},
+    {"Package": "foo-dev", "Version": "1.1", "Source": "foo", "Section": "libdevel"},
+]
+
+UPDATES = [
+    {"Package": "bar", "Version": "1:2.0-2+b1", "Source": "bar-src (2.0-2)"},
+    # Held back, its dependency isn't available
+    {"Package": "held", "Version": "2.0", "Depends": "missing"},
+    {"Package": "current", "Version": "1.0"},
+    {"Package": "gir1.2-baz", "Version": "1.0", "Source": "baz"},
+    {"Package": "baz-common", "Version": "1.0", "Source": "baz"},
+]
+
+@pytest.fixture
+def root():
+    with apt_root() as root:
+        root.write_status(INSTALLED)
+        root.write_archive("stable-security", SECURITY, label="Debian-Security")
+        root.write_archive("stable-updates", UPDATES)
+        yield root
+
+def find_changes(root, use_apt_pkg, blacklist=(), with_descriptions=True):
+    check = APTCheck()
+    # Points the APT configuration to the root
+    cache = root.open_cache()
+    check.use_apt_pkg = use_apt_pkg
+    if use_apt_pkg:
+        check.open_apt_pkg_cache()
+    else:
+        check._cache = cache
+    check.with_descriptions = with_descriptions
+    check.find_changes(Blacklist(blacklist))
+    if use_apt_pkg:
+        assert check._cache is None
+    return [update.to_tuple() for update in check.get_updates()], check.candidates, check.priority_updates_available
+
+def test_fixture_has_upgrades(root):
+    updates, candidates, priority_updates_available = find_changes(root, False)
+    assert [Update.from_tuple(update).source_name for update in updates] == ["bar-src", "baz", "foo"]
+    assert ("held", "2.0") not in candidates
+
+# Both engines must produce the same updates, descriptions included
+def test_apt_pkg_engine_matches_apt_engine(root):
+    assert find_changes(root, True) == find_changes(root, False)
+
+def test_apt_pkg_engine_without_descriptions(root):
+    assert find_changes(root, True, with_descriptions=False) == find_changes(root, False, with_descriptions=False)
+
+# Blacklisting some of the packages changes the grouping of the others
+def test_apt_pkg_engine_with_blacklist(root):
+    for blacklist in (["foo=1.1"], ["bar-src"], ["ba*"]):
+        assert find_changes(root, True, blacklist) == find_changes(root, False, blacklist)
+
+# The updates of Update Manager itself replace the others
+def test_apt_pkg_engine_with_priority_update(root):
+    root.write_status(INSTALLED + [{"Package": "mintupdate", "Version": "6.0"}])
+    root.write_archive("stable-updates", UPDATES + [{"Package": "mintupdate", "Version": "6.1"}])
+    updates, candidates, priority_updates_available = find_changes(root, True)
+    assert priority_updates_available and [Update.from_tuple(update).source_name for update in updates] == ["mintupdate"]
+    assert find_changes(root, True) == find_changes(root, False)
+
+# Kernel meta packages are grouped with the kernel they depend on
+def test_apt_pkg_engine_with_kernel_meta(root):
+    kernel = {"Package": "linux-image-5.15.0-101-generic", "Version": "5.15.0-101.111", "Source": "linux-signed",
+              "Section": "kernel"}
+    root.write_status(INSTALLED + [{"Package": "linux-generic", "Version": "5.15.0.100.100", "Source": "linux-meta"}])
+    root.write_archive("stable-updates", UPDATES + [kernel,
+        {"Package": "linux-generic", "Version": "5.15.0.101.101", "Source": "linux-meta",
+         "Depends": "linux-image-5.15.0-101-generic (= 5.15.0-101.111) | linux-image-unsigned"}])
+    updates, candidates, priority_updates_available = find_changes(root, True)
+    assert "linux-5.15.0-101.111" in [Update.from_tuple(update).source_name for update in updates]
+    assert find_changes(root, True) == find_changes(root, False)
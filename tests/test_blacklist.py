@@ -0,0 +1,37 @@
+#!/usr/bin/python3
+
+import sys, os
+myPath = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, myPath + '/../usr/lib/linuxmint/mintUpdate/')
+
+import fnmatch
+from Classes import Blacklist
+
+ENTRIES = ["firefox", "linux-*", "lib?foo", "thunderbird=1:115.0", "nvidia-*=535.1", "[ab]*-dev", "gimp=", ""]
+
+# The loop formerly used by APTCheck and mintupdate-cli
+def is_blacklisted_legacy(entries, source_name, version):
+    for blacklist in entries:
+        if "=" in blacklist:
+            (bl_pkg, bl_ver) = blacklist.split("=", 1)
+        else:
+            bl_pkg = blacklist
+            bl_ver = None
+        if fnmatch.fnmatch(source_name, bl_pkg) and (not bl_ver or bl_ver == version):
+            return True
+    return False
+
+def test_blacklist_matches_legacy_loop():
+    blacklist = Blacklist(ENTRIES)
+    names = ["firefox", "firefox-esr", "linux-hwe", "linux", "libxfoo", "libfoo", "thunderbird",
+             "nvidia-driver", "a-dev", "abc-dev", "c-dev", "gimp", "mintupdate"]
+    versions = ["1:115.0", "535.1", "1.0"]
+    for name in names:
+        for version in versions:
+            assert blacklist.is_blacklisted(name, version) == is_blacklisted_legacy(ENTRIES, name, version), name
+
+def test_blacklist_without_version():
+    blacklist = Blacklist(ENTRIES)
+    assert blacklist.is_blacklisted("linux-generic")
+    assert not blacklist.is_blacklisted("thunderbird")
+    assert not Blacklist([]).is_blacklisted("firefox")
@@ -0,0 +1,43 @@
+#!/usr/bin/python3
+
+import queue
+import sys, os
+myPath = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, myPath + '/../usr/lib/linuxmint/mintUpdate/')
+
+from changelog import ChangelogCache, ChangelogPrefetcher, ChangelogRetriever
+from Classes import Update
+
+def get_update(source_name):
+    update = Update()
+    update.real_source_name = update.source_name = source_name
+    update.new_version = "1.0"
+    update.origin = "debian"
+    return update
+
+# Unavailable changelogs aren't prefetched again until their marker expires
+def test_changelog_missing(tmp_path, monkeypatch):
+    cache = ChangelogCache(str(tmp_path))
+    retriever = ChangelogRetriever(cache)
+    requests = []
+    def fetch(opener, changelog_source):
+        requests.append(changelog_source)
+        return "changelog" if "found" in changelog_source else None
+    monkeypatch.setattr(retriever, "fetch", fetch)
+    missing, found = get_update("missing"), get_update("found")
+    assert retriever.get_changelog(missing, race=False, opener=object()) is None
+    assert retriever.get_changelog(found, race=False, opener=object()) == "changelog"
+    assert retriever.is_missing(missing) and not retriever.is_missing(found)
+
+    prefetched = queue.Queue()
+    prefetcher = ChangelogPrefetcher(retriever, None)
+    monkeypatch.setattr(prefetcher, "run", lambda updates, cancelled: prefetched.put(updates))
+    other = get_update("other")
+    prefetcher.start([missing, found, other])
+    assert prefetched.get(timeout=10) == [other]
+
+    # Expired
+    cache.missing_ttl = 0
+    assert not retriever.is_missing(missing)
+    cache.trim()
+    assert not os.path.exists(cache.get_missing_path("missing", "1.0", "debian"))
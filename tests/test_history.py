@@ -0,0 +1,25 @@
+#!/usr/bin/python3
+
+import sys, os
+myPath = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, myPath + '/../usr/lib/linuxmint/mintUpdate/')
+
+import history
+
+# The pages must give the same entries as a single query, entries with the same date included
+def test_history_pages(tmp_path, monkeypatch):
+    log_path = tmp_path / "dpkg.log"
+    with open(log_path, "w") as f:
+        for i in range(25):
+            f.write("2024-01-%02d 10:00:00 upgrade package%d:amd64 1.0 1.1\n" % (i // 3 + 1, i))
+    monkeypatch.setattr(history, "DPKG_LOG_PATTERN", str(log_path) + "*")
+    index = history.UpdateHistory(str(tmp_path / "history.db"))
+    assert index.update() == 25
+    entries = index.get_entries(4)
+    page = entries
+    while page.get_next_key() is not None:
+        page = index.get_entries(4, page.get_next_key())
+        entries.extend(page)
+    all_entries = index.get_entries()
+    assert len(entries) == len(all_entries) == 25
+    assert [entries.get_row(i) for i in range(25)] == [all_entries.get_row(i) for i in range(25)]
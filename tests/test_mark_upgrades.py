@@ -0,0 +1,39 @@
+#!/usr/bin/python3
+
+import sys, os
+myPath = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, myPath + '/../usr/lib/linuxmint/mintUpdate/')
+
+from apt_root import apt_root
+import pytest
+from checkAPT import APTCheck
+
+def get_marked(check):
+    if check.use_apt_pkg:
+        return sorted(pkg.get_fullname(True) for pkg in check.apt_pkg_cache.packages
+                      if not check.depcache.marked_keep(pkg))
+    return sorted(pkg.name for pkg in check.cache.get_changes())
+
+def mark_changes(check):
+    if check.use_apt_pkg:
+        check.depcache.mark_install(check.apt_pkg_cache["baz"])
+        check.depcache.mark_delete(check.apt_pkg_cache["bar"])
+    else:
+        check.cache["baz"].mark_install()
+        check.cache["bar"].mark_delete()
+
+# The worker reuses the cache between checks, marks left from a previous check must not leak into the next one
+@pytest.mark.parametrize("use_apt_pkg", [False, True])
+def test_mark_upgrades_clears_previous_marks(use_apt_pkg):
+    with apt_root() as root:
+        root.write_status([{"Package": "foo", "Version": "1.0"}, {"Package": "bar", "Version": "1.0"}])
+        root.write_archive("stable", [{"Package": "foo", "Version": "2.0"}, {"Package": "baz", "Version": "1.0"}])
+        check = APTCheck()
+        check.use_apt_pkg = use_apt_pkg
+        # Points the APT configuration to the root
+        check._cache = root.open_cache()
+        check.mark_upgrades()
+        assert get_marked(check) == ["foo"]
+        mark_changes(check)
+        check.mark_upgrades()
+        assert get_marked(check) == ["foo"]
@@ -0,0 +1,73 @@
+#!/usr/bin/python3
+
+import sys, os
+myPath = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, myPath + '/../usr/lib/linuxmint/mintUpdate/')
+
+import pytest
+import Classes
+from Classes import Blacklist, SystemCheckResult, Update
+
+KEY = [["/var/cache/apt/pkgcache.bin", 1, 2, 3], ["/var/lib/dpkg/status", 4, 5, 6], "6.8.0-45-generic"]
+
+def get_update(source_name, version):
+    update = Update()
+    update.package_names = [source_name]
+    update.source_packages = ["%s=%s" % (source_name, version)]
+    update.main_package_name = update.package_name = source_name
+    update.real_source_name = update.source_name = update.display_name = source_name
+    update.new_version = version
+    update.old_version = "1.0"
+    return update
+
+@pytest.fixture
+def result(tmp_path, monkeypatch):
+    result = SystemCheckResult(str(tmp_path / "mintupdate" / "updates.json"))
+    monkeypatch.setattr(result, "get_key", lambda: KEY)
+    updates = [get_update("firefox", "2.0"), get_update("linux-6.8.0-50", "6.8.0-50.51")]
+    candidates = {("firefox", "2.0"), ("linux-meta", "6.8.0.50.51")}
+    result.save(KEY, "-generic", updates, candidates, ["linux-generic"])
+    return result
+
+def test_system_check_round_trip(result):
+    updates, meta_names = result.load("-generic", Blacklist([]))
+    assert [update.source_name for update in updates] == ["firefox", "linux-6.8.0-50"]
+    assert updates[0].new_version == "2.0"
+    assert meta_names == ["linux-generic"]
+
+def test_system_check_is_readable_by_all(result):
+    assert os.stat(result.path).st_mode & 0o777 == 0o644
+
+def test_system_check_other_kernel_type(result):
+    assert result.load("-lowlatency", Blacklist([])) is None
+
+def test_system_check_stale_key(result, monkeypatch):
+    monkeypatch.setattr(result, "get_key", lambda: KEY[:2] + ["6.8.0-50-generic"])
+    assert result.load("-generic", Blacklist([])) is None
+
+# A blacklist matching one of the candidates requires a local check
+def test_system_check_blacklisted_candidate(result):
+    assert result.load("-generic", Blacklist(["linux-meta"])) is None
+    assert result.load("-generic", Blacklist(["firefox=2.0"])) is None
+    assert result.load("-generic", Blacklist(["firefox=1.0", "thunderbird"])) is not None
+
+def test_system_check_missing(tmp_path):
+    assert SystemCheckResult(str(tmp_path / "updates.json")).load("-generic", Blacklist([])) is None
+
+# A session waits for a running system-wide check instead of checking by itself
+def test_system_check_wait(result, monkeypatch):
+    monkeypatch.setattr(Classes, "get_dpkg_lock_holder", lambda: None)
+    states = [True, True, False]
+    monkeypatch.setattr(result, "is_running", lambda: states.pop(0))
+    assert result.wait(timeout=10)
+    monkeypatch.setattr(result, "is_running", lambda: False)
+    assert not result.wait(timeout=10)
+
+# While dpkg is locked the system-wide check waits for it, the session doesn't wait for the check
+def test_system_check_wait_dpkg_locked(result, monkeypatch):
+    monkeypatch.setattr(result, "is_running", lambda: True)
+    monkeypatch.setattr(Classes, "get_dpkg_lock_holder", lambda: 1234)
+    assert not result.wait(timeout=10)
+    locks = [None, None, 1234]
+    monkeypatch.setattr(Classes, "get_dpkg_lock_holder", lambda: locks.pop(0))
+    assert not result.wait(timeout=10)
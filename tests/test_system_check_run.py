@@ -0,0 +1,50 @@
+#!/usr/bin/python3
+
+import sys, os
+myPath = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, myPath + '/../usr/lib/linuxmint/mintUpdate/')
+
+import pytest
+from apt_root import apt_root
+from checkAPT import APTCheck
+from Classes import Blacklist, SystemCheckResult, Update
+import system_check
+
+@pytest.fixture
+def root():
+    with apt_root() as root:
+        root.write_status([{"Package": "foo", "Version": "1.0"}])
+        root.write_archive("stable", [{"Package": "foo", "Version": "2.0"}])
+        # Makes apt.Cache() use this root
+        root.open_cache()
+        yield root
+
+def test_system_check_saves_result(root, tmp_path, monkeypatch):
+    result = SystemCheckResult(str(tmp_path / "updates.json"))
+    monkeypatch.setattr(result, "get_key", lambda: ["key"])
+    assert system_check.check(result, "-generic") == 1
+    updates, meta_names = result.load("-generic", Blacklist([]))
+    assert [update.source_name for update in updates] == ["foo"]
+
+# A result computed while the package system changed would be saved under the wrong key
+def test_system_check_package_system_changed(root, tmp_path, monkeypatch):
+    result = SystemCheckResult(str(tmp_path / "updates.json"))
+    keys = [["before"], ["after"]]
+    monkeypatch.setattr(result, "get_key", lambda: keys.pop(0))
+    assert system_check.check(result, "-generic") is None
+    assert not os.path.exists(result.path)
+
+# The description kept by the check is used, without opening the APT cache
+def test_description_from_check(monkeypatch):
+    check = APTCheck()
+    check.aliases = {}
+    monkeypatch.setattr(check, "apply_l10n_descriptions", lambda: None)
+    update = Update()
+    update.source_name = update.main_package_name = "foo"
+    update.package_names = ["foo"]
+    update.new_version = "2.0"
+    update.description = "Description of foo"
+    check.updates = {"foo": update}
+    received = Update.from_tuple(update.to_tuple(with_description=False))
+    assert check.get_description(received) == "Description of foo"
+    assert check._cache is None and check.apt_pkg_cache is None
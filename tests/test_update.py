@@ -0,0 +1,41 @@
+#!/usr/bin/python3
+
+import sys, os
+myPath = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, myPath + '/../usr/lib/linuxmint/mintUpdate/')
+
+import pytest
+from apt_root import apt_root
+from Classes import Update
+
+@pytest.fixture
+def cache():
+    with apt_root() as root:
+        root.write_status([{"Package": "apt", "Version": "2.6.0"},
+                           {"Package": "libapt-pkg-dev", "Version": "2.6.0", "Source": "apt", "Section": "libdevel"}])
+        root.write_archive("stable-updates", [{"Package": "apt", "Version": "2.6.1"},
+                           {"Package": "libapt-pkg-dev", "Version": "2.6.1", "Source": "apt", "Section": "libdevel"}])
+        yield root.open_cache()
+
+@pytest.fixture
+def update(cache):
+    update = Update(cache["apt"])
+    update.add_package(cache["libapt-pkg-dev"])
+    return update
+
+# The serialized form must restore every attribute
+def test_update_serialization_round_trip(update):
+    restored = Update.from_tuple(update.to_tuple())
+    for name in Update.__slots__:
+        assert getattr(restored, name) == getattr(update, name)
+
+def test_update_serialization_without_description(update):
+    restored = Update.from_tuple(update.to_tuple(with_description=False))
+    assert restored.description is None
+    assert restored.short_description == update.short_description
+
+def test_update_serialization_version(update):
+    data = list(update.to_tuple())
+    data[0] = Update.SERIALIZATION_VERSION + 1
+    with pytest.raises(ValueError):
+        Update.from_tuple(tuple(data))
@@ -4,14 +4,21 @@ import gi
 from gi.repository import Gio, GLib
 
 import datetime
+import fcntl
+import fnmatch
 import gettext
+import glob
+import gzip
 import html
 import json
+import locale
 import os
-import subprocess
+import pickle
 import sys
 import time
 import re
+import struct
+import subprocess
 import threading
 
 gettext.install("mintupdate", "/usr/share/locale")
@@ -22,19 +29,34 @@ PRIORITY_UPDATES = ['mintupdate', 'mint-upgrade-info']
 # These updates, if appearing alone, should use their binary package names to avoid confusion.
 SOURCE_PACKAGE_NAME_OVERRIDES = ["linux-libc-dev"]
 
-settings = Gio.Settings(schema_id="com.linuxmint.updates")
-
 SUPPORTED_KERNEL_TYPES = ["-generic", "-lowlatency", "-aws", "-azure", "-gcp", "-kvm", "-oem", "-oracle"]
 KERNEL_PKG_NAMES = ['linux-headers-VERSION', 'linux-headers-VERSION-KERNELTYPE', 'linux-image-VERSION-KERNELTYPE', \
     'linux-modules-VERSION-KERNELTYPE', 'linux-modules-extra-VERSION-KERNELTYPE']
 KERNEL_PKG_NAMES.append('linux-image-extra-VERSION-KERNELTYPE') # Naming convention in 16.04, until 4.15 series
 
-CONFIGURED_KERNEL_TYPE = settings.get_string("selected-kernel-type")
-if CONFIGURED_KERNEL_TYPE not in SUPPORTED_KERNEL_TYPES:
-    CONFIGURED_KERNEL_TYPE = "-generic"
+def get_configured_kernel_type():
+    """ Returns the selected kernel type, which can change while the application runs """
+    kernel_type = Gio.Settings(schema_id="com.linuxmint.updates").get_string("selected-kernel-type")
+    if kernel_type not in SUPPORTED_KERNEL_TYPES:
+        kernel_type = "-generic"
+    return kernel_type
 
 CONFIG_PATH = os.path.expanduser("~/.linuxmint/mintupdate")
 
+PKGCACHE_PATH = "/var/cache/apt/pkgcache.bin"
+DPKG_STATUS_PATH = "/var/lib/dpkg/status"
+ALIASES_PATH = "/usr/lib/linuxmint/mintUpdate/aliases"
+DPKG_LOCK_PATHS = ["/var/lib/dpkg/lock-frontend", "/var/lib/dpkg/lock"]
+APT_HISTORY_PATH = "/var/log/apt/history.log"
+SYSTEM_CHECK_PATH = "/var/cache/mintupdate/updates.json"
+SYSTEM_CHECK_SERVICE = "mintupdate-system-check.service"
+# Seconds a session waits for a running system-wide check before checking by itself
+SYSTEM_CHECK_TIMEOUT = 30
+# Written by mintupdate-launcher while it updates the spices and flatpaks, holds its PID
+MAINTENANCE_PATH = os.path.join(CONFIG_PATH, "maintenance")
+# Written by the flatpak update worker, read by the history of updates
+FLATPAK_LOG_PATH = os.path.join(CONFIG_PATH, "flatpak-updates.log")
+
 # Used as a decorator to run things in the background
 def _async(func):
     def wrapper(*args, **kwargs):
@@ -50,6 +72,46 @@ def _idle(func):
         GLib.idle_add(func, *args)
     return wrapper
 
+def get_dpkg_lock_holder():
+    """ Returns the PID of the process locking the dpkg database, 0 if it's unknown, or None if it's not locked """
+    for path in DPKG_LOCK_PATHS:
+        try:
+            fd = os.open(path, os.O_RDONLY)
+        except FileNotFoundError:
+            continue
+        except PermissionError:
+            # The lock files are only readable by root, look them up in /proc/locks instead
+            pid = get_lock_holder_from_proc(path)
+        else:
+            try:
+                # struct flock: l_type, l_whence, l_start, l_len, l_pid
+                flock = struct.pack("hhqqixxxx", fcntl.F_WRLCK, os.SEEK_SET, 0, 0, 0)
+                flock = fcntl.fcntl(fd, fcntl.F_GETLK, flock)
+                l_type, l_whence, l_start, l_len, l_pid = struct.unpack("hhqqixxxx", flock)
+                pid = None if l_type == fcntl.F_UNLCK else l_pid
+            finally:
+                os.close(fd)
+        if pid is not None:
+            return pid
+    return None
+
+def get_lock_holder_from_proc(path):
+    try:
+        stat = os.stat(path)
+        with open("/proc/locks") as f:
+            for line in f:
+                # e.g. "1: POSIX  ADVISORY  WRITE 1234 08:02:1311236 0 EOF", waiters are prefixed with "->"
+                fields = line.split()
+                if len(fields) < 6 or fields[1] == "->":
+                    continue
+                major, minor, inode = fields[5].split(":")
+                if int(inode) == stat.st_ino and int(major, 16) == os.major(stat.st_dev) and \
+                   int(minor, 16) == os.minor(stat.st_dev):
+                    return max(int(fields[4]), 0)
+    except Exception as e:
+        print("Could not check the lock on %s: %s" % (path, e))
+    return None
+
 def get_release_dates():
     """ Get distro release dates for support duration calculation """
     release_dates = {}
@@ -100,11 +162,33 @@ class KernelVersion():
 
 class Update():
 
-    def __init__(self, package=None, source_name=None):
+    __slots__ = ("package_names", "source_packages", "main_package_name", "package_name", "new_version",
+                 "old_version", "size", "real_source_name", "source_name", "display_name",
+                 "short_description", "description", "archive", "type", "origin", "site")
+
+    # Version of the format produced by to_tuple()
+    SERIALIZATION_VERSION = 1
+
+    def __init__(self, package=None, source_name=None, with_description=True):
         self.package_names = []
+        self.source_packages = []
+        self.main_package_name = None
+        self.package_name = None
+        self.new_version = ""
+        self.old_version = ""
+        self.size = 0
+        self.real_source_name = None
+        self.source_name = None
+        self.display_name = None
+        self.short_description = ""
+        self.description = "" # None when it was left out by to_tuple()
+        self.archive = ""
+        self.type = "package"
+        self.origin = ""
+        self.site = ""
         if package is not None:
             self.package_names.append(package.name)
-            self.source_packages = {"%s=%s" % (package.candidate.source_name, package.candidate.source_version)}
+            self.source_packages.append("%s=%s" % (package.candidate.source_name, package.candidate.source_version))
             self.main_package_name = package.name
             self.package_name = package.name
             self.new_version = package.candidate.version
@@ -124,22 +208,18 @@ class Update():
             else:
                 self.display_name = self.source_name
 
-            self.short_description = package.candidate.raw_description
-            self.description = package.candidate.description
-            self.archive = ""
+            if with_description:
+                self.short_description = package.candidate.raw_description
+                self.description = package.candidate.description
 
-            self.type = "package"
-            self.origin = ""
             for origin in package.candidate.origins:
-                self.origin = origin.origin
-                self.site = origin.site
-                self.archive = origin.archive
+                self.origin = sys.intern(origin.origin)
+                self.site = sys.intern(origin.site)
+                self.archive = sys.intern(origin.archive)
                 if origin.origin == "Ubuntu":
                     self.origin = "ubuntu"
                 elif origin.origin == "Debian":
                     self.origin = "debian"
-                elif origin.origin.startswith("LP-PPA"):
-                    self.origin = origin.origin
                 if origin.origin == "Ubuntu" and '-security' in origin.archive:
                     self.type = "security"
                     break
@@ -156,38 +236,108 @@ class Update():
             if package.candidate.section == "kernel" or self.package_name.startswith("linux-headers") or self.real_source_name in ["linux", "linux-kernel", "linux-signed", "linux-meta"]:
                 self.type = "kernel"
 
-    def add_package(self, pkg):
+    def add_package(self, pkg, with_description=True):
         if self.main_package_name in SOURCE_PACKAGE_NAME_OVERRIDES:
             self.display_name = self.source_name
 
         self.package_names.append(pkg.name)
-        self.source_packages.add("%s=%s" % (pkg.candidate.source_name, pkg.candidate.source_version))
+        source_package = "%s=%s" % (pkg.candidate.source_name, pkg.candidate.source_version)
+        if source_package not in self.source_packages:
+            self.source_packages.append(source_package)
         self.size += pkg.candidate.size
         if self.main_package_name is None or pkg.name == self.source_name:
-            self.overwrite_main_package(pkg)
+            self.overwrite_main_package(pkg, with_description)
             return
 
         if self.main_package_name != self.source_name:
             # Overwrite dev, dbg, common, arch packages
             for suffix in ["-dev", "-dbg", "-common", "-core", "-data", "-doc", ":i386", ":amd64"]:
                 if (self.main_package_name.endswith(suffix) and not pkg.name.endswith(suffix)):
-                    self.overwrite_main_package(pkg)
+                    self.overwrite_main_package(pkg, with_description)
                     return
             # Overwrite lib packages
             for prefix in ["lib", "gir1.2"]:
                 if (self.main_package_name.startswith(prefix) and not pkg.name.startswith(prefix)):
-                    self.overwrite_main_package(pkg)
+                    self.overwrite_main_package(pkg, with_description)
                     return
             for keyword in ["-locale-", "-l10n-", "-help-"]:
                 if (keyword in self.main_package_name) and (keyword not in pkg.name):
-                    self.overwrite_main_package(pkg)
+                    self.overwrite_main_package(pkg, with_description)
                     return
 
-    def overwrite_main_package(self, pkg):
-        self.description = pkg.candidate.description
-        self.short_description = pkg.candidate.raw_description
+    def overwrite_main_package(self, pkg, with_description=True):
+        if with_description:
+            self.description = pkg.candidate.description
+            self.short_description = pkg.candidate.raw_description
         self.main_package_name = pkg.name
 
+    def to_tuple(self, with_description=True):
+        """ Returns a compact representation of the update, to pass it to another process or store it """
+        data = [self.SERIALIZATION_VERSION]
+        for name in self.__slots__:
+            data.append(getattr(self, name))
+        if not with_description:
+            data[self.__slots__.index("description") + 1] = None
+        return tuple(data)
+
+    @classmethod
+    def from_tuple(cls, data):
+        """ Recreates an update from the output of to_tuple() """
+        if data[0] != cls.SERIALIZATION_VERSION:
+            raise ValueError("Unsupported update format version: %s" % data[0])
+        update = cls()
+        for name, value in zip(cls.__slots__, data[1:]):
+            setattr(update, name, value)
+        update.type = sys.intern(update.type)
+        update.origin = sys.intern(update.origin)
+        update.archive = sys.intern(update.archive)
+        update.site = sys.intern(update.site)
+        return update
+
+class Blacklist():
+    """ Matches names against blacklist entries: exact names, shell-style patterns and name=version """
+
+    def __init__(self, entries):
+        self.names = set()
+        self.pattern = None
+        self.versions = {} # name -> set of blacklisted versions
+        self.versioned_patterns = [] # (compiled pattern, blacklisted version)
+        patterns = []
+        for entry in entries:
+            entry = entry.strip()
+            if "=" in entry:
+                (name, version) = entry.split("=", 1)
+            else:
+                name = entry
+                version = None
+            if not name:
+                continue
+            is_pattern = any(char in name for char in "*?[")
+            if not version:
+                if is_pattern:
+                    patterns.append(fnmatch.translate(name))
+                else:
+                    self.names.add(name)
+            elif is_pattern:
+                self.versioned_patterns.append((re.compile(fnmatch.translate(name)), version))
+            else:
+                self.versions.setdefault(name, set()).add(version)
+        if patterns:
+            self.pattern = re.compile("|".join(patterns))
+
+    def is_blacklisted(self, name, version=None):
+        if name in self.names:
+            return True
+        if self.pattern is not None and self.pattern.match(name):
+            return True
+        if version is not None:
+            if version in self.versions.get(name, ()):
+                return True
+            for pattern, pattern_version in self.versioned_patterns:
+                if pattern_version == version and pattern.match(name):
+                    return True
+        return False
+
 class Alias():
     def __init__(self, name, short_description, description):
 
@@ -218,7 +368,7 @@ class UpdateTracker():
         self.tracker_version = 1 # version of the data structure
         self.settings = settings
         self.tracked_updates = {}
-        self.refreshed_update_names = [] # updates which are seen in checkAPT
+        self.refreshed_update_names = set() # updates which are seen in checkAPT
         self.today = datetime.date.today().strftime("%Y.%m.%d")
         self.max_days = 0 # oldest update (in number of days seen)
         self.oldest_since_date = self.today # oldest update (according to since date)
@@ -247,7 +397,7 @@ class UpdateTracker():
 
     # Updates the record for a particular update
     def update(self, update):
-        self.refreshed_update_names.append(update.real_source_name)
+        self.refreshed_update_names.add(update.real_source_name)
         if update.real_source_name not in self.tracked_updates['updates']:
             update_record = {}
             update_record['type'] = update.type
@@ -282,39 +432,93 @@ class UpdateTracker():
         days = (datetime.date.today() - datetime_object.date()).days
         return days
 
+    # Reads APT history events from a file object, returns the End-Date of the most recent
+    # upgrade event and the number of bytes up to the end of the last complete event
+    def scan_apt_history(self, f):
+        latest_upgrade_date = None
+        position = 0
+        complete_position = 0
+        is_upgrade = False
+        end_date = None
+        for line in f:
+            position += len(line)
+            line = line.strip()
+            if line == b"":
+                # Events are separated by empty lines
+                complete_position = position
+                is_upgrade = False
+                end_date = None
+            elif line.startswith(b"Upgrade: "):
+                is_upgrade = True
+            elif line.startswith(b"End-Date: "):
+                end_date = line[10:].decode("utf-8", errors="replace").split()[0]
+                # An event is finished once its End-Date is written
+                complete_position = position
+            if is_upgrade and end_date is not None and \
+                    (latest_upgrade_date is None or end_date > latest_upgrade_date):
+                latest_upgrade_date = end_date
+        return latest_upgrade_date, complete_position
+
+    # Returns the rotated APT history files, newest first
+    def get_rotated_apt_histories(self):
+        paths = []
+        for path in glob.glob(APT_HISTORY_PATH + ".*"):
+            number = path[len(APT_HISTORY_PATH) + 1:].split(".")[0]
+            if number.isdigit():
+                paths.append((int(number), path))
+        return [path for (number, path) in sorted(paths)]
+
     def get_latest_apt_upgrade(self):
+        state_path = os.path.join(CONFIG_PATH, "apt-history.json")
+        try:
+            with open(state_path) as f:
+                state = json.load(f)
+        except Exception:
+            state = {}
+        previous_date = state.get("date")
         latest_upgrade_date = None
 
-        if os.path.exists("/var/log/apt/history.log"):
-            logs = subprocess.getoutput("cat /var/log/apt/history.log")
-            for event in logs.split("\n\n"):
-                if "Upgrade: " not in event:
-                    continue
-                end_date = None
-                for line in event.split("\n"):
-                    line = line.strip()
-                    if line.startswith("End-Date: "):
-                        end_date = line.replace("End-Date: ", "")
-                        end_date = end_date.split()[0]
-                if end_date is not None and (latest_upgrade_date is None or end_date > latest_upgrade_date):
-                    latest_upgrade_date = end_date
-
-        if latest_upgrade_date is None:
+        try:
+            stat = os.stat(APT_HISTORY_PATH)
+        except OSError:
+            stat = None
+        if stat is not None:
+            # Only read what was appended since the previous run, unless the log was rotated or truncated
+            offset = 0
+            if state.get("inode") == stat.st_ino and state.get("offset", 0) <= stat.st_size:
+                offset = state["offset"]
+            try:
+                with open(APT_HISTORY_PATH, "rb") as f:
+                    f.seek(offset)
+                    latest_upgrade_date, length = self.scan_apt_history(f)
+                offset += length
+            except Exception as e:
+                print("Failed to read the APT history", e)
+
+        if latest_upgrade_date is None and previous_date is None:
+            for path in self.get_rotated_apt_histories():
+                try:
+                    if path.endswith(".gz"):
+                        f = gzip.open(path, "rb")
+                    else:
+                        f = open(path, "rb")
+                    with f:
+                        latest_upgrade_date, length = self.scan_apt_history(f)
+                except Exception as e:
+                    print("Failed to check rotated APT logs", e)
+                if latest_upgrade_date is not None:
+                    break
+
+        if previous_date is not None and (latest_upgrade_date is None or previous_date > latest_upgrade_date):
+            latest_upgrade_date = previous_date
+
+        if stat is not None:
             try:
-                logs = subprocess.getoutput("zcat /var/log/apt/history.log*gz")
-                for event in logs.split("\n\n"):
-                    if "Upgrade: " not in event:
-                        continue
-                    end_date = None
-                    for line in event.split("\n"):
-                        line = line.strip()
-                        if line.startswith("End-Date: "):
-                            end_date = line.replace("End-Date: ", "")
-                            end_date = end_date.split()[0]
-                    if end_date is not None and (latest_upgrade_date is None or end_date > latest_upgrade_date):
-                        latest_upgrade_date = end_date
+                with open(state_path, "w") as f:
+                    json.dump({"path": APT_HISTORY_PATH, "inode": stat.st_ino, "offset": offset,
+                               "date": latest_upgrade_date}, f)
             except Exception as e:
-                print("Failed to check compressed APT logs", e)
+                print("Failed to save the APT history position", e)
 
         return latest_upgrade_date
 
@@ -376,6 +580,141 @@ class UpdateTracker():
         with open(self.path, "w") as f:
             json.dump(self.tracked_updates, f, indent=2)
 
+class UpdateCache():
+    """ Stores the result of the last APT check, keyed on the state of the package system """
+
+    def __init__(self, settings, logger):
+        self.path = os.path.join(CONFIG_PATH, "updates.cache")
+        self.cache_version = 2 # version of the data structure
+        self.settings = settings
+        self.logger = logger
+
+    def get_key(self):
+        """ Returns a fingerprint of everything the APT check depends on, or None if it can't be determined """
+        key = []
+        for path in (PKGCACHE_PATH, DPKG_STATUS_PATH, ALIASES_PATH):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                # Without a pkgcache.bin we can't tell when the lists change
+                return None
+            key.append((path, stat.st_mtime_ns, stat.st_size, stat.st_ino))
+        key.append(tuple(self.settings.get_strv("blacklisted-packages")))
+        key.append(self.settings.get_string("selected-kernel-type"))
+        key.append(locale.getlocale())
+        key.append(os.uname().release)
+        return key
+
+    def load(self, key):
+        """ Returns the cached list of updates if it was stored with the given key, None otherwise """
+        if key is None:
+            return None
+        try:
+            with open(self.path, "rb") as f:
+                data = pickle.load(f)
+            if data["version"] != self.cache_version or data["key"] != key:
+                return None
+            return [Update.from_tuple(update) for update in data["updates"]]
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            self.logger.write_error("Could not read the update cache: %s" % str(e))
+            return None
+
+    def save(self, key, updates):
+        if key is None:
+            return
+        data = {"version": self.cache_version, "key": key, "updates": [update.to_tuple() for update in updates]}
+        try:
+            os.makedirs(CONFIG_PATH, exist_ok=True)
+            tmp_path = self.path + ".tmp"
+            with open(tmp_path, "wb") as f:
+                pickle.dump(data, f)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            self.logger.write_error("Could not write the update cache: %s" % str(e))
+
+class SystemCheckResult():
+    """ Result of the APT check run once for all sessions by the mintupdate-system-check service (system_check.py).
+        It's computed without a blacklist and before the descriptions are translated, each session does that on top. """
+
+    def __init__(self, path=SYSTEM_CHECK_PATH):
+        self.path = path
+        self.result_version = 1 # version of the data structure
+
+    def get_key(self):
+        """ Returns a fingerprint of the package system, or None if it can't be determined """
+        key = []
+        for path in (PKGCACHE_PATH, DPKG_STATUS_PATH):
+            try:
+                stat = os.stat(path)
+            except OSError:
+                return None
+            key.append([path, stat.st_mtime_ns, stat.st_size, stat.st_ino])
+        key.append(os.uname().release)
+        return key
+
+    def load(self, kernel_type, blacklist):
+        """ Returns the updates and the kernel meta package names found by the system-wide check,
+            or None if there's no current result for this kernel type or if the blacklist changes it """
+        key = self.get_key()
+        if key is None:
+            return None
+        try:
+            with open(self.path) as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print("Could not read the system-wide update check: %s" % e)
+            return None
+        if data["version"] != self.result_version or data["key"] != key or data["kernel_type"] != kernel_type:
+            return None
+        # Blacklisted packages also affect the grouping and the priority updates, leave those cases to a local check
+        for (source_name, version) in data["candidates"]:
+            if blacklist.is_blacklisted(source_name, version):
+                return None
+        return ([Update.from_tuple(update) for update in data["updates"]], data["meta_names"])
+
+    def is_running(self):
+        """ Returns True while the system-wide check runs (or waits for dpkg to be done) """
+        try:
+            output = subprocess.run(["systemctl", "is-active", SYSTEM_CHECK_SERVICE], stdout=subprocess.PIPE,
+                                    stderr=subprocess.DEVNULL, text=True, timeout=10).stdout
+        except (OSError, subprocess.SubprocessError):
+            return False
+        return output.strip() in ("activating", "reloading")
+
+    def wait(self, timeout=SYSTEM_CHECK_TIMEOUT):
+        """ Waits for a running system-wide check to finish, returns False if there was none or it took too long.
+            While dpkg is locked the check only waits for it (up to LOCK_MAX_WAIT in system_check.py), so there's
+            nothing to wait for then. """
+        deadline = time.monotonic() + timeout
+        if get_dpkg_lock_holder() is not None or not self.is_running():
+            return False
+        while time.monotonic() < deadline:
+            time.sleep(1)
+            if not self.is_running():
+                return True
+            if get_dpkg_lock_holder() is not None:
+                return False
+        return False
+
+    def save(self, key, kernel_type, updates, candidates, meta_names):
+        """ Stores the result of the check, candidates are the (source name, version) pairs it considered """
+        data = {"version": self.result_version,
+                "key": key,
+                "kernel_type": kernel_type,
+                "updates": [update.to_tuple() for update in updates],
+                "candidates": sorted(candidates),
+                "meta_names": meta_names}
+        os.makedirs(os.path.dirname(self.path), mode=0o755, exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(data, f)
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, self.path)
+
 try:
     gi.require_version('Flatpak', '1.0')
     from gi.repository import Flatpak
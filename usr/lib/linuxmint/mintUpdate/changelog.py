@@ -0,0 +1,534 @@
+#!/usr/bin/python3
+
+import concurrent.futures
+import hashlib
+import os
+import subprocess
+import tempfile
+import threading
+import time
+
+from gi.repository import Gio
+
+from Classes import CONFIG_PATH, Update
+
+CHANGELOG_CACHE_PATH = os.path.join(CONFIG_PATH, "changelogs")
+
+class ChangelogCache():
+    """ Size-bounded on-disk cache of changelogs, keyed by source package, version and origin.
+        Changelogs which couldn't be found are marked missing for a while. """
+
+    # Least recently used changelogs are removed past this total size (in bytes)
+    MAX_SIZE = 20 * 1000 * 1000
+    # Seconds during which a missing changelog isn't prefetched again
+    MISSING_TTL = 3 * 60 * 60
+
+    def __init__(self, path=CHANGELOG_CACHE_PATH, max_size=MAX_SIZE, missing_ttl=MISSING_TTL):
+        self.path = path
+        self.max_size = max_size
+        self.missing_ttl = missing_ttl
+
+    def get_path(self, source_package, version, origin):
+        key = "%s\n%s\n%s" % (origin, source_package, version)
+        return os.path.join(self.path, hashlib.sha1(key.encode("utf-8")).hexdigest())
+
+    def get_missing_path(self, source_package, version, origin):
+        return self.get_path(source_package, version, origin) + ".missing"
+
+    def is_missing(self, source_package, version, origin):
+        """ Returns True if the changelog couldn't be found less than missing_ttl seconds ago """
+        try:
+            mtime = os.stat(self.get_missing_path(source_package, version, origin)).st_mtime
+        except OSError:
+            return False
+        return time.time() - mtime < self.missing_ttl
+
+    def put_missing(self, source_package, version, origin):
+        try:
+            os.makedirs(self.path, exist_ok=True)
+            # The marker is empty, its mtime is the time of the last attempt
+            with open(self.get_missing_path(source_package, version, origin), "w"):
+                pass
+        except Exception as e:
+            print("Could not mark the changelog of %s %s missing: %s" % (source_package, version, e))
+
+    def contains(self, source_package, version, origin):
+        # Unlike get(), this doesn't count as a use
+        return os.path.exists(self.get_path(source_package, version, origin))
+
+    def get(self, source_package, version, origin):
+        path = self.get_path(source_package, version, origin)
+        try:
+            with open(path, encoding="utf-8") as f:
+                changelog = f.read()
+            # Keep track of the last use for trim()
+            os.utime(path)
+            return changelog
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print("Could not read cached changelog %s: %s" % (path, e))
+            return None
+
+    def put(self, source_package, version, origin, changelog, trim=True):
+        try:
+            os.makedirs(self.path, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(dir=self.path, suffix=".tmp")
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(changelog)
+            os.replace(tmp_path, self.get_path(source_package, version, origin))
+            try:
+                os.remove(self.get_missing_path(source_package, version, origin))
+            except FileNotFoundError:
+                pass
+            if trim:
+                self.trim()
+        except Exception as e:
+            print("Could not cache changelog for %s %s: %s" % (source_package, version, e))
+
+    def trim(self):
+        if not os.path.isdir(self.path):
+            return
+        entries = []
+        total_size = 0
+        now = time.time()
+        with os.scandir(self.path) as it:
+            for entry in it:
+                if entry.name.endswith(".tmp"):
+                    continue
+                stat = entry.stat()
+                if entry.name.endswith(".missing"):
+                    if now - stat.st_mtime >= self.missing_ttl:
+                        try:
+                            os.remove(entry.path)
+                        except OSError:
+                            pass
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+                total_size += stat.st_size
+        entries.sort()
+        for mtime, size, path in entries:
+            if total_size <= self.max_size:
+                break
+            try:
+                os.remove(path)
+                total_size -= size
+            except OSError:
+                pass
+
+def get_keep_alive_handler():
+    """ Returns a urllib handler which keeps one connection per host open and reuses it for the next requests.
+        It's defined here since urllib.request is slow to import. """
+    import http.client
+    import io
+    import urllib.error
+    import urllib.request
+    import urllib.response
+
+    class KeepAliveHandler(urllib.request.HTTPSHandler):
+        # Before the default HTTP handler
+        handler_order = 499
+
+        def __init__(self):
+            super().__init__()
+            self.connections = {}
+
+        def http_open(self, req):
+            return self.open_connection(http.client.HTTPConnection, req)
+
+        def https_open(self, req):
+            return self.open_connection(http.client.HTTPSConnection, req)
+
+        def open_connection(self, connection_class, req):
+            if not req.host:
+                raise urllib.error.URLError("no host given")
+            headers = dict(req.unredirected_hdrs)
+            headers.update({name: value for (name, value) in req.headers.items() if name not in headers})
+            headers = {name.title(): value for (name, value) in headers.items()}
+            tunnel_headers = {}
+            if req._tunnel_host and "Proxy-Authorization" in headers:
+                tunnel_headers["Proxy-Authorization"] = headers.pop("Proxy-Authorization")
+            key = (connection_class, req.host, req._tunnel_host)
+            reused = key in self.connections
+            if not reused:
+                connection = connection_class(req.host, timeout=req.timeout)
+                if req._tunnel_host:
+                    connection.set_tunnel(req._tunnel_host, headers=tunnel_headers)
+                self.connections[key] = connection
+            connection = self.connections[key]
+            try:
+                connection.request(req.get_method(), req.selector, req.data, headers)
+                response = connection.getresponse()
+                # Read the whole body so that the connection is ready for the next request
+                body = response.read()
+            except (http.client.HTTPException, OSError) as e:
+                connection.close()
+                del self.connections[key]
+                if reused:
+                    # The server closed the connection since the previous request
+                    return self.open_connection(connection_class, req)
+                raise urllib.error.URLError(e)
+            result = urllib.response.addinfourl(io.BytesIO(body), response.msg, req.get_full_url(), response.status)
+            result.msg = response.reason
+            return result
+
+        def close(self):
+            for connection in self.connections.values():
+                connection.close()
+            self.connections.clear()
+
+    return KeepAliveHandler()
+
+class ChangelogRetriever():
+    """ Downloads the changelogs of package updates, racing the candidate URLs """
+
+    TIMEOUT = 10 # seconds per request
+
+    def __init__(self, cache=None):
+        if cache is None:
+            cache = ChangelogCache()
+        self.cache = cache
+
+    def get_opener(self, *handlers):
+        # urllib.request is slow to import, it's only loaded once a changelog is needed
+        import urllib.request
+        import proxygsettings
+        # get the proxy settings from gsettings
+        ps = proxygsettings.get_proxy_settings()
+        if ps == {}:
+            # use default urllib.request proxy mechanisms (possibly *_proxy environment vars)
+            proxy = urllib.request.ProxyHandler()
+        else:
+            # use proxy settings retrieved from gsettings
+            proxy = urllib.request.ProxyHandler(ps)
+        return urllib.request.build_opener(proxy, *handlers)
+
+    def get_cached_changelog(self, update):
+        return self.cache.get(update.real_source_name, update.new_version, update.origin)
+
+    def is_cached(self, update):
+        return self.cache.contains(update.real_source_name, update.new_version, update.origin)
+
+    def is_missing(self, update):
+        return self.cache.is_missing(update.real_source_name, update.new_version, update.origin)
+
+    def get_changelog(self, update, race=True, opener=None, trim=True):
+        """ Returns the changelog of an update, from the cache if possible, or None if unavailable
+            (it's then marked missing, see ChangelogCache.is_missing()).
+            With race=False the candidate URLs are tried one after the other.
+            With trim=False the cache isn't trimmed after adding the changelog, the caller does it. """
+        changelog = self.get_cached_changelog(update)
+        if changelog is not None:
+            return changelog
+
+        source_package = update.real_source_name
+        if opener is None:
+            opener = self.get_opener()
+
+        # Remove the epoch if present in the version
+        version = update.new_version
+        if ":" in version:
+            version = version.split(":")[-1]
+
+        changelog_sources = []
+        if update.origin.startswith("LP-PPA"):
+            ppa_owner, ppa_name = self.get_ppa_info(update.origin)
+            if ppa_owner and ppa_name:
+                deb_changelog = self.get_ppa_changelog(opener, ppa_owner, ppa_name, source_package, version)
+                if deb_changelog:
+                    changelog = deb_changelog.decode("utf-8", errors="replace")
+                else:
+                    changelog_sources.append(f"https://launchpad.net/~{ppa_owner}/+archive/ubuntu/{ppa_name}/+files/{source_package}_{version}_source.changes")
+            else:
+                print ("PPA owner or name could not be determined")
+        else:
+            changelog_sources = self.get_changelog_sources(update, version)
+
+        if changelog is None and changelog_sources:
+            if race:
+                changelog = self.fetch_first(opener, changelog_sources)
+            else:
+                for changelog_source in changelog_sources:
+                    changelog = self.fetch(opener, changelog_source)
+                    if changelog is not None:
+                        break
+
+        if changelog is not None:
+            self.cache.put(source_package, update.new_version, update.origin, changelog, trim)
+        else:
+            self.cache.put_missing(source_package, update.new_version, update.origin)
+        return changelog
+
+    def get_changelog_sources(self, update, version):
+        source_package = update.real_source_name
+        origin = update.origin
+        is_kernel_update = update.type == "kernel"
+
+        prefix = source_package[0]
+        if (source_package.startswith("lib")):
+            prefix = source_package[0:4]
+
+        changelog_sources = []
+        if origin == "linuxmint":
+            changelog_sources.append(f"http://packages.linuxmint.com/dev/{source_package}_{version}_amd64.changes")
+            changelog_sources.append(f"http://packages.linuxmint.com/dev/{source_package}_{version}_i386.changes")
+        elif origin == "ubuntu":
+            if is_kernel_update:
+                # Ubuntu HWE kernel versions end with '~' followed by the Ubuntu version (e.g. ~22.04.1). This suffix needs to be removed to get the correct changelog URL
+                kernel_version = version.split("~")[0]
+                changelog_sources.append(f"https://changelogs.ubuntu.com/changelogs/pool/main/l/linux/linux_{kernel_version}/changelog")
+            else:
+                for component in ["main", "multiverse", "universe", "restricted"]:
+                    changelog_sources.append(f"https://changelogs.ubuntu.com/changelogs/pool/{component}/{prefix}/{source_package}/{source_package}_{version}/changelog")
+        elif origin == "debian":
+            if is_kernel_update:
+                changelog_sources.append(f"https://metadata.ftp-master.debian.org/changelogs/main/l/linux/linux_{version}_changelog")
+            else:
+                for component in ["main", "contrib", "non-free", "non-free-firmware"]:
+                    changelog_sources.append(f"https://metadata.ftp-master.debian.org/changelogs/{component}/{prefix}/{source_package}/{source_package}_{version}_changelog")
+        return changelog_sources
+
+    def fetch_first(self, opener, changelog_sources):
+        """ Requests all the sources at once and returns the first changelog found """
+        executor = concurrent.futures.ThreadPoolExecutor(max_workers=len(changelog_sources))
+        try:
+            futures = [executor.submit(self.fetch, opener, source) for source in changelog_sources]
+            for future in concurrent.futures.as_completed(futures):
+                changelog = future.result()
+                if changelog is not None:
+                    return changelog
+            return None
+        finally:
+            # Don't wait for the slower requests, their results are not needed
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def fetch(self, opener, changelog_source):
+        try:
+            print("Trying to fetch the changelog from: %s" % changelog_source)
+            with opener.open(changelog_source, None, self.TIMEOUT) as url:
+                source = url.read().decode("utf-8")
+            return self.parse_changelog(changelog_source, source)
+        except:
+            return None
+
+    def parse_changelog(self, changelog_source, source):
+        changelog = ""
+        if "linuxmint.com" in changelog_source:
+            changes = source.split("\n")
+            for change in changes:
+                stripped_change = change.strip()
+                if stripped_change == ".":
+                    change = ""
+                if change == "" or stripped_change.startswith("*") or stripped_change.startswith("["):
+                    changelog = changelog + change + "\n"
+        elif "launchpad.net" in changelog_source:
+            changes = source.split("Changes:")[1].split("Checksums")[0].split("\n")
+            for change in changes:
+                stripped_change = change.strip()
+                if stripped_change != "":
+                    if stripped_change == ".":
+                        stripped_change = ""
+                    changelog = changelog + stripped_change + "\n"
+        else:
+            changelog = source
+        return changelog
+
+    def get_ppa_info(self, origin):
+        ppa_sources_file = "/etc/apt/sources.list"
+        ppa_sources_dir = "/etc/apt/sources.list.d/"
+        ppa_words = origin.lstrip("LP-PPA-").split("-")
+
+        source = ppa_sources_file
+        if os.path.exists(ppa_sources_dir):
+            for filename in os.listdir(ppa_sources_dir):
+                if filename.startswith(origin.lstrip("LP-PPA-")):
+                    source = os.path.join(ppa_sources_dir, filename)
+                    break
+        if not os.path.exists(source):
+            return None, None
+        try:
+            with open(source) as f:
+                for line in f:
+                    if (not line.startswith("#") and all(word in line for word in ppa_words)):
+                        ppa_info = line.split("://")[1]
+                        break
+                else:
+                    return None, None
+        except EnvironmentError as e:
+            print ("Error encountered while trying to get PPA owner and name: %s" % e)
+            return None, None
+        ppa_url, ppa_owner, ppa_name, ppa_x = ppa_info.split("/", 3)
+        return ppa_owner, ppa_name
+
+    def get_ppa_changelog(self, opener, ppa_owner, ppa_name, source_package, version):
+        max_tarball_size = 1000000
+        print ("\nFetching changelog for PPA package %s/%s/%s ..." % (ppa_owner, ppa_name, source_package))
+        if source_package.startswith("lib"):
+            ppa_abbr = source_package[:4]
+        else:
+            ppa_abbr = source_package[0]
+        deb_dsc_uri = "https://ppa.launchpadcontent.net/%s/%s/ubuntu/pool/main/%s/%s/%s_%s.dsc" % (ppa_owner, ppa_name, ppa_abbr, source_package, source_package, version)
+        try:
+            deb_dsc = opener.open(deb_dsc_uri, None, self.TIMEOUT).read().decode("utf-8")
+        except Exception as e:
+            print ("Could not open Launchpad URL %s - %s" % (deb_dsc_uri, e))
+            return
+        for line in deb_dsc.split("\n"):
+            if "debian.tar" not in line:
+                continue
+            tarball_line = line.strip().split(" ", 2)
+            if len(tarball_line) == 3:
+                deb_checksum, deb_size, deb_filename = tarball_line
+                break
+        else:
+            deb_filename = None
+        if not deb_filename or not deb_size or not deb_size.isdigit():
+            print ("Unsupported debian .dsc file format. Skipping this package.")
+            return
+        if (int(deb_size) > max_tarball_size):
+            print ("Tarball size %s B exceeds maximum download size %d B. Skipping download." % (deb_size, max_tarball_size))
+            return
+        deb_file_uri = "https://ppa.launchpadcontent.net/%s/%s/ubuntu/pool/main/%s/%s/%s" % (ppa_owner, ppa_name, ppa_abbr, source_package, deb_filename)
+        try:
+            deb_file = opener.open(deb_file_uri, None, self.TIMEOUT).read()
+        except Exception as e:
+            print ("Could not download tarball from %s - %s" % (deb_file_uri, e))
+            return
+        if deb_filename.endswith(".xz"):
+            cmd = ["xz", "--decompress"]
+            try:
+                xz = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+                deb_file = xz.communicate(deb_file)[0]
+            except EnvironmentError as e:
+                print ("Error encountered while decompressing xz file: %s" % e)
+                return
+        import io
+        import tarfile
+        deb_file = io.BytesIO(deb_file)
+        try:
+            with tarfile.open(fileobj = deb_file) as f:
+                deb_changelog = f.extractfile("debian/changelog").read()
+        except tarfile.TarError as e:
+            print ("Error encountered while reading tarball: %s" % e)
+            return
+
+        return deb_changelog
+
+class ChangelogPrefetcher():
+    """ Fills the changelog cache for pending updates in the background """
+
+    MAX_WORKERS = 3
+    MAX_REQUESTS_PER_HOST = 2
+    # Seconds between two requests of the same worker, and between checks while paused
+    REQUEST_INTERVAL = 0.5
+    PAUSE_INTERVAL = 60
+
+    def __init__(self, retriever, logger):
+        self.retriever = retriever
+        self.logger = logger
+        self.cancelled = threading.Event()
+        self.host_semaphores = {}
+        self.lock = threading.Lock()
+
+    def start(self, updates):
+        """ Prefetches the changelogs of the given updates, cancelling any previous prefetch """
+        self.cancel()
+        self.cancelled = threading.Event()
+        updates = [update for update in updates if isinstance(update, Update) and
+                   not self.retriever.is_cached(update) and not self.retriever.is_missing(update)]
+        if len(updates) > 0:
+            # Security and kernel updates first
+            updates.sort(key=lambda update: 0 if update.type in ("security", "kernel") else 1)
+            thread = threading.Thread(target=self.run, args=[updates, self.cancelled], daemon=True)
+            thread.start()
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def get_host_semaphore(self, update):
+        # Each origin is served by a single changelog host
+        host = update.origin if not update.origin.startswith("LP-PPA") else "launchpad"
+        with self.lock:
+            if host not in self.host_semaphores:
+                self.host_semaphores[host] = threading.BoundedSemaphore(self.MAX_REQUESTS_PER_HOST)
+            return self.host_semaphores[host]
+
+    def get_pause_reason(self):
+        monitor = Gio.NetworkMonitor.get_default()
+        # Offline, every changelog would be marked missing
+        if not monitor.get_network_available():
+            return "no network"
+        if monitor.get_network_metered():
+            return "metered connection"
+        if self.on_battery():
+            return "on battery"
+        return None
+
+    def on_battery(self):
+        path = "/sys/class/power_supply"
+        try:
+            supplies = os.listdir(path)
+        except OSError:
+            return False
+        has_battery = False
+        for supply in supplies:
+            try:
+                with open(os.path.join(path, supply, "type")) as f:
+                    supply_type = f.read().strip()
+                if supply_type == "Mains":
+                    with open(os.path.join(path, supply, "online")) as f:
+                        if f.read().strip() == "1":
+                            return False
+                elif supply_type == "Battery":
+                    has_battery = True
+            except OSError:
+                pass
+        return has_battery
+
+    def run(self, updates, cancelled):
+        total = len(updates)
+        self.logger.write("Prefetching %d changelogs" % total)
+        done = 0
+        fetched = 0
+        done_lock = threading.Lock()
+        pending = iter(updates)
+
+        def worker(opener):
+            nonlocal done, fetched
+            while not cancelled.is_set():
+                reason = self.get_pause_reason()
+                if reason is not None:
+                    self.logger.write("Changelog prefetch paused (%s)" % reason)
+                    while reason is not None and not cancelled.wait(self.PAUSE_INTERVAL):
+                        reason = self.get_pause_reason()
+                    if cancelled.is_set():
+                        return
+                    self.logger.write("Changelog prefetch resumed")
+                with done_lock:
+                    update = next(pending, None)
+                if update is None:
+                    return
+                with self.get_host_semaphore(update):
+                    changelog = self.retriever.get_changelog(update, race=False, opener=opener, trim=False)
+                with done_lock:
+                    done += 1
+                    if changelog is not None:
+                        fetched += 1
+                    if done % 10 == 0 and done < total:
+                        self.logger.write("Prefetched changelogs: %d/%d" % (done, total))
+                cancelled.wait(self.REQUEST_INTERVAL)
+
+        # Each worker keeps its connections open between its requests
+        pools = [get_keep_alive_handler() for i in range(min(self.MAX_WORKERS, total))]
+        threads = [threading.Thread(target=worker, args=[self.retriever.get_opener(pool)], daemon=True) for pool in pools]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        for pool in pools:
+            pool.close()
+        self.retriever.cache.trim()
+        if cancelled.is_set():
+            self.logger.write("Changelog prefetch cancelled after %d/%d updates" % (done, total))
+        else:
+            self.logger.write("Changelog prefetch finished: %d of %d changelogs found" % (fetched, total))
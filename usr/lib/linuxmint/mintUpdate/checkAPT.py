@@ -1,8 +1,7 @@
 #!/usr/bin/python3
 
-import codecs
-import fnmatch
 import gettext
+import json
 import os
 import re
 import sys
@@ -11,10 +10,12 @@ import html
 import locale
 
 import apt
+import apt_pkg
 from gi.repository import Gio
 
-from Classes import (CONFIGURED_KERNEL_TYPE, KERNEL_PKG_NAMES,
-                     PRIORITY_UPDATES, SUPPORTED_KERNEL_TYPES, Alias, KernelVersion, Update)
+from Classes import (ALIASES_PATH, CONFIG_PATH, DPKG_STATUS_PATH, KERNEL_PKG_NAMES,
+                     PKGCACHE_PATH, PRIORITY_UPDATES, SUPPORTED_KERNEL_TYPES, Alias, Blacklist, KernelVersion,
+                     SystemCheckResult, Update, get_configured_kernel_type)
 
 gettext.install("mintupdate", "/usr/share/locale")
 
@@ -23,17 +24,293 @@ meta_names = []
 # packages which description is incorrect in Ubuntu (usually those which were replaced by snap dependencies)
 NON_TRANSLATED_PKGS = ["firefox", "thunderbird"]
 
+APT_LISTS_PATH = "/var/lib/apt/lists"
+L10N_INDEX_PATH = os.path.join(CONFIG_PATH, "l10n")
+# Files and directories which change when the APT cache needs to be reopened
+CACHE_SOURCES_PATHS = [PKGCACHE_PATH, DPKG_STATUS_PATH, APT_LISTS_PATH, "/etc/apt/sources.list",
+                       "/etc/apt/sources.list.d", "/etc/apt/preferences.d"]
+
+class TranslationFile():
+    """ Reads package stanzas from an i18n Translation file, using an offset index when available """
+
+    def __init__(self, path):
+        self.path = path
+        self.index_path = os.path.join(L10N_INDEX_PATH, "%s.json" % os.path.basename(path))
+        stat = os.stat(path)
+        self.key = [stat.st_mtime_ns, stat.st_size]
+
+    def get_stanzas(self, pkgnames):
+        """ Yields (pkgname, lines) for each stanza of the given packages, in file order.
+            lines are the stripped lines following the Package line. """
+        index = self.load_index()
+        with open(self.path, "rb") as f:
+            if index is None:
+                yield from self.scan(f, pkgnames)
+            else:
+                offsets = []
+                for pkgname in pkgnames:
+                    offsets += index.get(pkgname, [])
+                for offset in sorted(offsets):
+                    f.seek(offset)
+                    pkgname = self.decode(f.readline())[9:]
+                    yield (pkgname, self.read_stanza(f))
+
+    def scan(self, f, pkgnames):
+        """ Reads the whole file once, building the offset index on the way """
+        index = {}
+        offset = 0
+        pkgname = None
+        lines = None
+        for raw_line in f:
+            line = self.decode(raw_line)
+            if line.startswith("Package: "):
+                if lines is not None:
+                    yield (pkgname, lines)
+                pkgname = line[9:]
+                index.setdefault(pkgname, []).append(offset)
+                lines = [] if pkgname in pkgnames else None
+            elif lines is not None:
+                lines.append(line)
+            offset += len(raw_line)
+        if lines is not None:
+            yield (pkgname, lines)
+        self.save_index(index)
+
+    def read_stanza(self, f):
+        lines = []
+        for raw_line in f:
+            line = self.decode(raw_line)
+            if line.startswith("Package: "):
+                break
+            lines.append(line)
+        return lines
+
+    @staticmethod
+    def decode(raw_line):
+        return raw_line.decode("utf-8", errors="replace").strip()
+
+    def load_index(self):
+        try:
+            with open(self.index_path) as f:
+                data = json.load(f)
+            if data["key"] == self.key:
+                return data["index"]
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            print("Could not read l10n index %s: %s" % (self.index_path, e))
+        return None
+
+    def save_index(self, index):
+        try:
+            os.makedirs(L10N_INDEX_PATH, exist_ok=True)
+            tmp_path = self.index_path + ".tmp"
+            with open(tmp_path, "w") as f:
+                json.dump({"key": self.key, "index": index}, f, separators=(",", ":"))
+            os.replace(tmp_path, self.index_path)
+        except Exception as e:
+            print("Could not write l10n index %s: %s" % (self.index_path, e))
+
+class PackageOrigin():
+    """ Origin of a package version, read from its apt_pkg.PackageFile without checking whether it's trusted """
+
+    __slots__ = ("archive", "component", "label", "origin", "site")
+
+    def __init__(self, package_file):
+        self.archive = package_file.archive
+        self.component = package_file.component
+        self.label = package_file.label
+        self.origin = package_file.origin
+        self.site = package_file.site
+
+class PackageVersion():
+    """ The parts of apt.package.Version used by APTCheck, read from the apt_pkg cache of the check.
+        The package records are only looked up when the source or the description is needed. """
+
+    __slots__ = ("check", "pkg", "ver", "_source")
+
+    def __init__(self, check, pkg, ver):
+        self.check = check
+        self.pkg = pkg
+        self.ver = ver
+        self._source = None
+
+    @property
+    def version(self):
+        return self.ver.ver_str
+
+    @property
+    def size(self):
+        return self.ver.size
+
+    @property
+    def section(self):
+        return self.ver.section
+
+    @property
+    def origins(self):
+        return [PackageOrigin(package_file) for (package_file, index) in self.ver.file_list]
+
+    def get_records(self):
+        """ Returns the package records, moved to this version """
+        records = self.check.records
+        if not records.lookup(self.ver.file_list[0]):
+            raise LookupError("Could not look up the record of %s" % self.pkg.get_fullname(True))
+        return records
+
+    def get_source(self):
+        if self._source is None:
+            # Same fallbacks as apt.package.Version
+            try:
+                records = self.get_records()
+                self._source = (records.source_pkg or self.pkg.name, records.source_ver or self.ver.ver_str)
+            except IndexError:
+                self._source = (self.pkg.name, self.ver.ver_str)
+        return self._source
+
+    @property
+    def source_name(self):
+        return self.get_source()[0]
+
+    @property
+    def source_version(self):
+        return self.get_source()[1]
+
+    @property
+    def raw_description(self):
+        return self.get_records().long_desc
+
+    @property
+    def description(self):
+        records = self.check.records
+        if records.lookup(self.ver.translated_description.file_list[0]):
+            return format_description(self.pkg.get_fullname(True), records.long_desc)
+        return format_description(self.pkg.get_fullname(True), None)
+
+    @property
+    def dependencies(self):
+        # Only needed for kernel meta packages
+        dependencies = []
+        for dep_type in ("PreDepends", "Depends"):
+            for or_group in self.ver.depends_list.get(dep_type, []):
+                dependencies.append(PackageDependency(self.check, dep_type, or_group))
+        return dependencies
+
+class PackageDependency():
+    """ The parts of apt.package.Dependency (an or-group) used by APTCheck.get_kernel_version_from_meta_package() """
+
+    __slots__ = ("check", "rawtype", "or_group")
+
+    def __init__(self, check, rawtype, or_group):
+        self.check = check
+        self.rawtype = rawtype
+        self.or_group = or_group
+
+    @property
+    def target_versions(self):
+        versions = {}
+        for dependency in self.or_group:
+            for ver in dependency.all_targets():
+                if ver.id not in versions:
+                    versions[ver.id] = PackageVersion(self.check, ver.parent_pkg, ver)
+        return list(versions.values())
+
+class CachePackage():
+    """ The parts of apt.package.Package used by APTCheck """
+
+    __slots__ = ("name", "installed", "candidate")
+
+    def __init__(self, check, pkg, current_ver, candidate_ver):
+        self.name = pkg.get_fullname(True)
+        self.installed = None if current_ver is None else PackageVersion(check, pkg, current_ver)
+        self.candidate = None if candidate_ver is None else PackageVersion(check, pkg, candidate_ver)
+
+    @property
+    def is_installed(self):
+        return self.installed is not None
+
+class PackageLookup():
+    """ The parts of apt.Cache used by APTCheck, packages are looked up by name in the apt_pkg cache of the check.
+        Like in apt.Cache, the packages without any version (virtual packages) aren't part of it. """
+
+    def __init__(self, check):
+        self.check = check
+        self._keys = None
+
+    def keys(self):
+        if self._keys is None:
+            self._keys = sorted(pkg.get_fullname(True) for pkg in self.check.apt_pkg_cache.packages if pkg.has_versions)
+        return list(self._keys)
+
+    def get_pkg(self, name):
+        try:
+            pkg = self.check.apt_pkg_cache[name]
+        except KeyError:
+            return None
+        return pkg if pkg.has_versions else None
+
+    def __contains__(self, name):
+        return self.get_pkg(name) is not None
+
+    def __getitem__(self, name):
+        pkg = self.get_pkg(name)
+        if pkg is None:
+            raise KeyError("The cache has no package named %r" % name)
+        return CachePackage(self.check, pkg, pkg.current_ver, self.check.depcache.get_candidate_ver(pkg))
+
+def format_description(name, long_desc):
+    """ Formats a long description the way apt.package.Version.description does (Debian policy 5.6.13) """
+    if not long_desc:
+        return apt_pkg.gettext("Missing description for '%s'." "Please report.") % name
+    description = ""
+    lines = iter(long_desc.split("\n"))
+    # Skip the first line, it's the summary
+    next(lines)
+    for raw_line in lines:
+        if raw_line.strip() == ".":
+            # Line break
+            if not description.endswith("\n"):
+                description += "\n\n"
+            continue
+        if raw_line.startswith("  "):
+            # Displayed verbatim
+            if not description.endswith("\n"):
+                line = "\n%s\n" % raw_line[2:]
+            else:
+                line = "%s\n" % raw_line[2:]
+        elif raw_line.startswith(" "):
+            # Part of a paragraph
+            if description.endswith("\n") or description == "":
+                line = raw_line[1:]
+            else:
+                line = raw_line
+        else:
+            line = raw_line
+        description += line
+    return description
+
 class APTCheck():
 
     def __init__(self):
         self.settings = Gio.Settings(schema_id="com.linuxmint.updates")
-        self.cache = apt.Cache()
+        self.blacklist = Blacklist(self.settings.get_strv("blacklisted-packages"))
+        self.cache_fingerprint = None
+        self._cache = None
+        # apt_pkg cache, depcache and records of the apt_pkg engine, there's no apt.Cache on top of them
+        self.apt_pkg_cache = None
+        self.depcache = None
+        self.records = None
+        self.package_lookup = None
         self.priority_updates_available = False
         self.updates = {}
+        self.candidates = set() # (source name, version) of the packages considered by add_update()
+        self.with_descriptions = True # False when only the names, versions and types are needed
+        # Mark the upgrades and go through them with apt_pkg instead of apt.Cache
+        self.use_apt_pkg = True
 
     def load_aliases(self):
         self.aliases = {}
-        with open("/usr/lib/linuxmint/mintUpdate/aliases") as alias_file:
+        with open(ALIASES_PATH) as alias_file:
             for line in alias_file:
                 if not line.startswith('#'):
                     splitted = line.split("#####")
@@ -44,22 +321,147 @@ class APTCheck():
                             alias_package = alias_package.strip()
                             self.aliases[alias_package] = alias_object
 
-    def find_changes(self):
-        self.cache.upgrade(True) # dist-upgrade
-        changes = self.cache.get_changes()
+    @property
+    def cache(self):
+        """ The APT cache, opened on first use since a system-wide check result doesn't need it """
+        if self._cache is None:
+            self.cache_fingerprint = self.get_cache_fingerprint()
+            self._cache = apt.Cache()
+        return self._cache
+
+    def open_apt_pkg_cache(self):
+        """ Opens the apt_pkg cache, depcache and records used by the apt_pkg engine """
+        self.cache_fingerprint = self.get_cache_fingerprint()
+        self.apt_pkg_cache = apt_pkg.Cache(None)
+        self.depcache = apt_pkg.DepCache(self.apt_pkg_cache)
+        self.records = apt_pkg.PackageRecords(self.apt_pkg_cache)
+        self.package_lookup = PackageLookup(self)
+
+    def open_cache(self):
+        """ Opens the cache of the engine in use if it isn't open yet """
+        if not self.use_apt_pkg:
+            self.cache
+        elif self.apt_pkg_cache is None:
+            self.open_apt_pkg_cache()
+
+    @property
+    def packages(self):
+        """ The packages of the cache of the engine in use, looked up by name like in apt.Cache """
+        if not self.use_apt_pkg:
+            return self.cache
+        self.open_cache()
+        return self.package_lookup
+
+    def get_fingerprint(self, path):
+        try:
+            stat = os.stat(path)
+            return [stat.st_mtime_ns, stat.st_size, stat.st_ino]
+        except OSError:
+            return None
+
+    def get_cache_fingerprint(self):
+        return [self.get_fingerprint(path) for path in CACHE_SOURCES_PATHS]
+
+    def reopen_cache_if_changed(self):
+        """ Reopens the APT cache if the package system changed since it was opened, returns True if it did """
+        if self._cache is None and self.apt_pkg_cache is None:
+            return False
+        fingerprint = self.get_cache_fingerprint()
+        if fingerprint == self.cache_fingerprint:
+            return False
+        self.cache_fingerprint = fingerprint
+        if self._cache is not None:
+            self._cache.open()
+        if self.apt_pkg_cache is not None:
+            self.open_apt_pkg_cache()
+        return True
+
+    def mark_upgrades(self):
+        """ Marks the dist-upgrade in the depcache, the cache is reused between checks so earlier marks are cleared first """
+        if self.use_apt_pkg:
+            self.open_cache()
+            self.depcache.init()
+            self.depcache.upgrade(True) # dist-upgrade
+        else:
+            self.cache.clear()
+            self.cache.upgrade(True) # dist-upgrade
+
+    def load_system_result(self):
+        """ Uses the updates found by the system-wide check instead of find_changes(),
+            returns False if there's no result which applies to this session """
+        self.blacklist = Blacklist(self.settings.get_strv("blacklisted-packages"))
+        kernel_type = get_configured_kernel_type()
+        system_check = SystemCheckResult()
+        result = system_check.load(kernel_type, self.blacklist)
+        # The package system just changed, the system-wide check is probably computing the new result
+        if result is None and system_check.wait():
+            result = system_check.load(kernel_type, self.blacklist)
+        if result is None:
+            return False
+        (updates, system_meta_names) = result
+        self.updates = {update.source_name: update for update in updates}
+        self.priority_updates_available = any(source_name in PRIORITY_UPDATES for source_name in self.updates)
+        for meta_name in system_meta_names:
+            if meta_name not in meta_names:
+                meta_names.append(meta_name)
+        return True
+
+    def find_changes(self, blacklist=None):
+        if blacklist is None:
+            blacklist = Blacklist(self.settings.get_strv("blacklisted-packages"))
+        self.blacklist = blacklist
+        self.mark_upgrades()
 
         self.updates = {}
+        self.candidates = set()
+        self.priority_updates_available = False
 
-        # Package updates
-        for pkg in changes:
-            if (pkg.is_installed and pkg.candidate.version != pkg.installed.version):
-                if (pkg.marked_upgrade or pkg.marked_downgrade):
-                    self.add_update(pkg)
-
-        # Kernel updates
-        lts_meta_name = "linux" + CONFIGURED_KERNEL_TYPE
-        _metas = [s for s in self.cache.keys() if s.startswith(lts_meta_name)]
-        if CONFIGURED_KERNEL_TYPE == "-generic":
+        # With apt_pkg, the descriptions are read once the updates are grouped, for their main package only
+        with_descriptions = self.with_descriptions
+        self.with_descriptions = with_descriptions and not self.use_apt_pkg
+        try:
+            for pkg in self.get_upgraded_packages():
+                self.add_update(pkg)
+            self.add_kernel_update()
+        finally:
+            self.with_descriptions = with_descriptions
+        if with_descriptions and self.use_apt_pkg:
+            self.read_descriptions()
+
+    def get_upgraded_packages(self):
+        """ Returns the installed packages which the dist-upgrade upgrades or downgrades, in cache order """
+        if not self.use_apt_pkg:
+            return [pkg for pkg in self.cache.get_changes() if pkg.is_installed and
+                    pkg.candidate.version != pkg.installed.version and (pkg.marked_upgrade or pkg.marked_downgrade)]
+        return self.get_marked_packages()
+
+    def get_marked_packages(self):
+        """ Yields the upgraded packages straight from the depcache, without apt.Package wrappers """
+        depcache = self.depcache
+        for pkg in self.apt_pkg_cache.packages:
+            # Upgraded and downgraded packages are never marked keep, so these are the same as get_changes()
+            if not (depcache.marked_upgrade(pkg) or depcache.marked_downgrade(pkg)):
+                continue
+            current_ver = pkg.current_ver
+            if current_ver is None:
+                continue
+            candidate_ver = depcache.get_candidate_ver(pkg)
+            if candidate_ver.ver_str != current_ver.ver_str:
+                yield CachePackage(self, pkg, current_ver, candidate_ver)
+
+    def read_descriptions(self):
+        """ Reads the descriptions of the updates, which are those of their main package """
+        for update in self.updates.values():
+            candidate = self.packages[update.main_package_name].candidate
+            update.short_description = candidate.raw_description
+            update.description = candidate.description
+
+    def add_kernel_update(self):
+        packages = self.packages
+        configured_kernel_type = get_configured_kernel_type()
+        lts_meta_name = "linux" + configured_kernel_type
+        _metas = [s for s in packages.keys() if s.startswith(lts_meta_name)]
+        if configured_kernel_type == "-generic":
             _metas.append("linux-virtual")
         global meta_names
         for meta in _metas:
@@ -74,8 +476,8 @@ class APTCheck():
             try:
                 active_kernel_type = "-" + active_kernel.version.split("-")[-1]
             except:
-                active_kernel_type = CONFIGURED_KERNEL_TYPE
-            if  active_kernel_type != CONFIGURED_KERNEL_TYPE:
+                active_kernel_type = configured_kernel_type
+            if  active_kernel_type != configured_kernel_type:
                 active_kernel.series = ("0","0","0")
 
             # Uncomment for testing:
@@ -85,8 +487,8 @@ class APTCheck():
             meta_candidate_same_series = None
             meta_candidate_higher_series = None
             for meta_name in meta_names:
-                if meta_name in self.cache:
-                    meta = self.cache[meta_name]
+                if meta_name in packages:
+                    meta = packages[meta_name]
                     meta_kernel = KernelVersion(meta.candidate.version)
                     if (active_kernel.series > meta_kernel.series):
                         # Meta is lower than the installed kernel series, ignore
@@ -126,8 +528,8 @@ class APTCheck():
                 # unless the installed kernel series is lower than the LTS series
                 # for some reason, in the latter case force the LTS meta
                 if meta_candidate_higher_series.name != lts_meta_name:
-                    if lts_meta_name in self.cache:
-                        lts_meta = self.cache[lts_meta_name]
+                    if lts_meta_name in packages:
+                        lts_meta = packages[lts_meta_name]
                         lts_meta_kernel = KernelVersion(lts_meta.candidate.version)
                         if active_kernel.series < lts_meta_kernel.series:
                             meta_candidate_higher_series = lts_meta
@@ -137,7 +539,7 @@ class APTCheck():
             # We've gone past all the metas, so we should recommend the latest
             # kernel on the series we're in
             max_kernel = active_kernel
-            for pkgname in self.cache.keys():
+            for pkgname in packages.keys():
                 match = re.match(r'^(?:linux-image-)(\d.+?)%s$' % active_kernel_type, pkgname)
                 if match:
                     kernel = KernelVersion(match.group(1))
@@ -146,8 +548,8 @@ class APTCheck():
             if max_kernel.version_id != active_kernel.version_id:
                 for pkgname in KERNEL_PKG_NAMES:
                     pkgname = pkgname.replace('VERSION', max_kernel.version).replace("-KERNELTYPE", active_kernel_type)
-                    if pkgname in self.cache:
-                        pkg = self.cache[pkgname]
+                    if pkgname in packages:
+                        pkg = packages[pkgname]
                         if not pkg.is_installed:
                             self.add_update(pkg, kernel_update=True)
                             return
@@ -156,15 +558,7 @@ class APTCheck():
             traceback.print_exc()
 
     def is_blacklisted(self, source_name, version):
-        for blacklist in self.settings.get_strv("blacklisted-packages"):
-            if "=" in blacklist:
-                (bl_pkg, bl_ver) = blacklist.split("=", 1)
-            else:
-                bl_pkg = blacklist
-                bl_ver = None
-            if fnmatch.fnmatch(source_name, bl_pkg) and (not bl_ver or bl_ver == version):
-                return True
-        return False
+        return self.blacklist.is_blacklisted(source_name, version)
 
     def get_kernel_version_from_meta_package(self, pkg):
         for dependency in pkg.dependencies:
@@ -201,6 +595,8 @@ class APTCheck():
         else:
             source_name = package.candidate.source_name
 
+        self.candidates.add((package.candidate.source_name, package.candidate.version))
+
         # ignore packages blacklisted by the user
         if self.is_blacklisted(package.candidate.source_name, package.candidate.version):
             return
@@ -212,14 +608,14 @@ class APTCheck():
         if source_name in PRIORITY_UPDATES or not self.priority_updates_available:
             if source_name in self.updates:
                 update = self.updates[source_name]
-                update.add_package(package)
+                update.add_package(package, self.with_descriptions)
                 # Adjust update.old_version for kernel updates to try and
                 # match the kernel, not the meta
                 if kernel_update and package.is_installed and \
                         "-" not in update.old_version and "-" in package.installed.version:
                     update.old_version = package.installed.version
             else:
-                update = Update(package, source_name=source_name)
+                update = Update(package, source_name=source_name, with_description=self.with_descriptions)
                 self.updates[source_name] = update
             if kernel_update:
                 update.type = "kernel"
@@ -232,6 +628,25 @@ class APTCheck():
             update_list.append(update)
         return update_list
 
+    def get_description(self, update):
+        """ Returns the description of an update which was received without it.
+            The APT cache is only opened when the check didn't keep the description. """
+        checked_update = self.updates.get(update.source_name)
+        if checked_update is not None and checked_update.main_package_name == update.main_package_name and \
+                checked_update.new_version == update.new_version and checked_update.description:
+            update.description = checked_update.description
+        else:
+            update.description = self.packages[update.main_package_name].candidate.description
+        updates = self.updates
+        self.updates = {update.source_name: update}
+        try:
+            self.apply_l10n_descriptions()
+            self.apply_aliases()
+            self.clean_descriptions()
+        finally:
+            self.updates = updates
+        return update.description
+
     def apply_aliases(self):
         for source_name in self.updates.keys():
             update = self.updates[source_name]
@@ -255,77 +670,70 @@ class APTCheck():
         if lang in [None, "C", "en"]:
             return
         print("found lang", lang)
-        if os.path.exists("/var/lib/apt/lists"):
+        if os.path.exists(APT_LISTS_PATH):
             try:
-                super_buffer = []
-                for file in os.listdir("/var/lib/apt/lists"):
+                translation_files = []
+                for file in os.listdir(APT_LISTS_PATH):
                     if file.endswith(f"_i18n_Translation-{lang}"):
-                        fd = codecs.open(os.path.join("/var/lib/apt/lists", file), "r", "utf-8")
-                        super_buffer += fd.readlines()
-
-                i = 0
-                while i < len(super_buffer):
-                    line = super_buffer[i].strip()
-                    if line.startswith("Package: "):
+                        translation_files.append(file)
+                for file in translation_files:
+                    translation_file = TranslationFile(os.path.join(APT_LISTS_PATH, file))
+                    for pkgname, lines in translation_file.get_stanzas(self.updates):
                         try:
-                            pkgname = line.replace("Package: ", "")
-                            if pkgname in self.updates:
-                                update = self.updates[pkgname]
-                                j = 2 # skip md5 line after package name line
-                                while True:
-                                    if (i+j >= len(super_buffer)):
-                                        break
-                                    line = super_buffer[i+j].strip()
-                                    if line.startswith("Package: "):
-                                        break
-                                    if j==2:
-                                        try:
-                                            # clean short description
-                                            value = line
-                                            try:
-                                                value = html.unescape(value)
-                                            except:
-                                                print ("Unable to unescape '%s'" % value)
-                                            # Remove "Description-xx: " prefix
-                                            value = re.sub(r'Description-(\S+): ', r'', value)
-                                            # Only take the first line and trim it
-                                            value = value.split("\n")[0].strip()
-                                            value = value.split("\\n")[0].strip()
-                                            # Capitalize the first letter
-                                            value = value[:1].upper() + value[1:]
-                                            # Add missing punctuation
-                                            if len(value) > 0 and value[-1] not in [".", "!", "?"]:
-                                                value = "%s." % value
-                                            if update.source_name not in NON_TRANSLATED_PKGS:
-                                                update.short_description = value
-                                                update.description = ""
-                                        except Exception as e:
-                                            print(e)
-                                            print(sys.exc_info()[0])
-                                    else:
-                                        description = "\n" + line
-                                        try:
-                                            try:
-                                                description = html.unescape(description)
-                                            except:
-                                                print ("Unable to unescape '%s'" % description)
-                                            if update.source_name not in NON_TRANSLATED_PKGS:
-                                                update.description += description
-                                        except Exception as e:
-                                            print (e)
-                                            print(sys.exc_info()[0])
-                                    j += 1
-
+                            self.apply_l10n_stanza(self.updates[pkgname], lines)
                         except Exception as e:
                             print (e)
                             print(sys.exc_info()[0])
-                    i += 1
-                del super_buffer
+                self.clean_l10n_indexes(lang, translation_files)
             except Exception as e:
                 print (e)
                 print("Could not fetch l10n descriptions..")
                 print(sys.exc_info()[0])
 
+    def apply_l10n_stanza(self, update, lines):
+        if update.source_name in NON_TRANSLATED_PKGS:
+            return
+        # skip md5 line after package name line
+        for i, line in enumerate(lines[1:]):
+            if i == 0:
+                # clean short description
+                value = line
+                try:
+                    value = html.unescape(value)
+                except:
+                    print ("Unable to unescape '%s'" % value)
+                # Remove "Description-xx: " prefix
+                value = re.sub(r'Description-(\S+): ', r'', value)
+                # Only take the first line and trim it
+                value = value.split("\n")[0].strip()
+                value = value.split("\\n")[0].strip()
+                # Capitalize the first letter
+                value = value[:1].upper() + value[1:]
+                # Add missing punctuation
+                if len(value) > 0 and value[-1] not in [".", "!", "?"]:
+                    value = "%s." % value
+                update.short_description = value
+                update.description = ""
+            else:
+                description = "\n" + line
+                try:
+                    description = html.unescape(description)
+                except:
+                    print ("Unable to unescape '%s'" % description)
+                update.description += description
+
+    def clean_l10n_indexes(self, lang, translation_files):
+        """ Removes the indexes of Translation files which no longer exist """
+        if not os.path.isdir(L10N_INDEX_PATH):
+            return
+        current = ["%s.json" % file for file in translation_files]
+        for index_file in os.listdir(L10N_INDEX_PATH):
+            if index_file.endswith(f"_i18n_Translation-{lang}.json") and index_file not in current:
+                try:
+                    os.remove(os.path.join(L10N_INDEX_PATH, index_file))
+                except OSError:
+                    pass
+
     def clean_descriptions(self):
         for source_name in self.updates.keys():
             update = self.updates[source_name]
@@ -5,11 +5,13 @@ import sys
 
 import apt
 
-from Classes import (CONFIGURED_KERNEL_TYPE, SUPPORTED_KERNEL_TYPES,
-                     KernelVersion, get_release_dates)
+from Classes import (SUPPORTED_KERNEL_TYPES, KernelVersion,
+                     get_configured_kernel_type, get_release_dates)
 
 if len(sys.argv) > 1 and sys.argv[1] in SUPPORTED_KERNEL_TYPES:
     CONFIGURED_KERNEL_TYPE = sys.argv[1]
+else:
+    CONFIGURED_KERNEL_TYPE = get_configured_kernel_type()
 
 release_dates = None
 try:
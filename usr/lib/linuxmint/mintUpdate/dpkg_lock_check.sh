@@ -1,2 +0,0 @@
-#!/bin/sh
-/bin/fuser /var/lib/dpkg/lock
\ No newline at end of file
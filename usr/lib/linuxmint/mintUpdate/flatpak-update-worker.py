@@ -1,6 +1,5 @@
 #!/usr/bin/python3
 
-import functools
 import os
 import argparse
 import json
@@ -20,7 +19,7 @@ from gi.repository import Gtk, GLib, Flatpak, Gio
 from mintcommon.installer import installer
 from mintcommon.installer import _flatpak
 
-from Classes import FlatpakUpdate
+from Classes import FLATPAK_LOG_PATH, FlatpakUpdate
 
 # i18n
 APP = 'mintupdate'
@@ -35,7 +34,10 @@ GLib.set_application_name(_("Flatpak updates"))
 
 CHUNK_SIZE = 4096
 
-LOG_PATH = os.path.join(GLib.get_home_dir(), '.linuxmint', 'mintupdate', 'flatpak-updates.log')
+# Socket of the daemon mode, the name changes with the protocol
+DAEMON_SOCKET_PATH = os.path.join(GLib.get_user_runtime_dir(), 'mintupdate-flatpak-worker-1.sock')
+# Seconds without requests after which the daemon exits
+DAEMON_IDLE_TIMEOUT = 15 * 60
 
 DEBUG_MODE = False
 try:
@@ -56,14 +58,19 @@ def warn(*args):
     print("flatpak-update-worker (WARN): %s" % argstr, file=sys.stderr, flush=True)
 
 class FlatpakUpdateWorker():
-    def __init__(self):
+    def __init__(self, daemon=False):
         self.installer = installer.Installer(installer.PKG_TYPE_FLATPAK)
         self.fp_sys = _flatpak.get_fp_sys()
         self.task = None
+        self.daemon = daemon
+        self.connection = None # daemon mode: the connection of the request being handled
+        self.fetching = False
+        self.appstream_loaded = False
 
         self.cancellable = Gio.Cancellable()
 
-        if not self.check_for_any_installed():
+        # The daemon checks this for each request
+        if not daemon and not self.check_for_any_installed():
             self.send_to_updater("no-installed")
             self.cancellable.cancel()
             self.quit()
@@ -71,6 +78,7 @@ class FlatpakUpdateWorker():
         self.stdin = Gio.UnixInputStream.new(sys.stdin.fileno(), True)
 
         self.updates = []
+        self.updates_by_ref = {}
 
     def check_for_any_installed(self):
         try:
@@ -102,6 +110,12 @@ class FlatpakUpdateWorker():
         if self.cancellable.is_cancelled():
             return
 
+        self.fetching = True
+        if self.appstream_loaded:
+            # Daemon mode, the installer is already initialized
+            self.select_updates()
+            return
+
         self.installer.connect("appstream-changed", self.on_appstream_loaded)
 
         if not self.installer.init_sync():
@@ -111,7 +125,13 @@ class FlatpakUpdateWorker():
             debug("cache valid")
 
     def on_appstream_loaded(self, installer):
+        self.appstream_loaded = True
+        if self.fetching:
+            self.select_updates()
+
+    def select_updates(self):
         self.updates = []
+        self.updates_by_ref = {}
         self.installer.select_flatpak_updates(None,
                                               self._fetch_task_ready, self._fetch_updates_error, 
                                               None, None,
@@ -119,42 +139,42 @@ class FlatpakUpdateWorker():
 
     def _fetch_task_ready(self, task):
         debug("task object:", task, "transaction:", task.transaction)
+        if not self.fetching:
+            return
 
         self.task = task
         self.error = task.error_message
 
         if self.error is None and task.transaction is not None:
+            # The updates are sent while they're being processed
             self._process_fetch_task(task)
+        elif self.error is not None:
+            self.send_to_updater(f"error:{self.error}")
 
-            out = json.dumps(self.updates, default=lambda o: o.to_json(), indent=4)
-            self.send_to_updater(out)
-        else:
-            self.send_to_updater(self.error)
-
-        self.quit()
         debug("done generating updates", self.error)
+        self.fetching = False
+        self.finish_request()
 
     def _fetch_updates_error(self, task):
         warn("fetch error", task.error_message)
+        if self.daemon and self.fetching:
+            # Don't leave the client waiting
+            self.send_to_updater(f"error:{task.error_message}")
+            self.fetching = False
+            self.finish_request()
 
     def _process_fetch_task(self, task):
         trans = task.transaction
         ops = trans.get_operations()
 
-        def cmp_ref_name(a, b):
-            ref_a = Flatpak.Ref.parse(a.get_ref())
-            ref_b = Flatpak.Ref.parse(b.get_ref())
-            a_refstr_len = len(ref_a.get_name().split("."))
-            b_refstr_len = len(ref_b.get_name().split("."))
-
-            return a_refstr_len < b_refstr_len
-
-        ops.sort(key=functools.cmp_to_key(cmp_ref_name))
-        ops.sort(key=lambda op: Flatpak.Ref.parse(op.get_ref()).get_name())
+        # Parse each ref once. Sorting by name puts the packages which can be added to an update
+        # (see add_to_parent_update()) right after it, the sort is stable for refs of the same name.
+        ref_ops = [(Flatpak.Ref.parse(op.get_ref()), op) for op in ops]
+        ref_ops.sort(key=lambda ref_op: ref_op[0].get_name())
 
-        for op in ops:
+        for (ref, op) in ref_ops:
+            self.send_finished_updates(ref.get_name())
             if op.get_operation_type() == Flatpak.TransactionOperationType.UPDATE:
-                ref = Flatpak.Ref.parse(op.get_ref())
                 debug("Update: ", op.get_ref(), ref.get_branch())
                 try:
                     installed_ref = self.fp_sys.get_installed_ref(ref.get_kind(),
@@ -172,12 +192,11 @@ class FlatpakUpdateWorker():
                     update = FlatpakUpdate(op, self.installer, ref, installed_ref, None, pkginfo)
 
                     if self.is_base_package(update) or (not self.add_to_parent_update(update)):
-                        self.updates.append(update)
+                        self.add_update(update)
                 except Exception as e:
                     warn("Problem creating FlatpakUpdate for %s: %s" % (ref.format_ref(), e))
 
             elif op.get_operation_type() == Flatpak.TransactionOperationType.INSTALL:
-                ref = Flatpak.Ref.parse(op.get_ref())
                 debug("Install: ", op.get_ref())
                 try:
                     remote_ref = self.fp_sys.fetch_remote_ref_sync(op.get_remote(),
@@ -195,35 +214,48 @@ class FlatpakUpdateWorker():
                     update = FlatpakUpdate(op, self.installer, ref, None, remote_ref, pkginfo)
 
                     if self.is_base_package(update) or (not self.add_to_parent_update(update)):
-                        self.updates.append(update)
+                        self.add_update(update)
                 except Exception as e:
                     warn("Problem creating FlatpakUpdate for %s: %s" % (ref.format_ref(), e))
+        self.send_finished_updates(None)
         task.cancel()
 
-    def add_to_parent_update(self, update):
-        for maybe_parent in self.updates:
-            if not update.ref_name.startswith(maybe_parent.ref_name):
-                continue
-
-            kf = update.metadata
-
-            try:
-                extension_of = kf.get_string("ExtensionOf", "ref")
-                if extension_of == maybe_parent.ref.format_ref():
-                    maybe_parent.add_package(update)
-                    return True
-            except:
-                pass
+    def add_update(self, update):
+        self.updates.append(update)
+        self.updates_by_ref[update.ref.format_ref()] = update
+
+    def send_finished_updates(self, next_ref_name):
+        # The operations are sorted by name, so the packages added to an update (see add_to_parent_update())
+        # follow it directly. Once a name doesn't start with the name of an update, that update is complete.
+        pending = []
+        for update in self.updates:
+            if next_ref_name is not None and next_ref_name.startswith(update.ref_name):
+                pending.append(update)
+            else:
+                # One json object per line
+                self.send_to_updater(json.dumps(update, default=lambda o: o.to_json()))
+                del self.updates_by_ref[update.ref.format_ref()]
+        self.updates = pending
 
-            try:
-                runtime_ref_id = "runtime/%s" % kf.get_string("Runtime", "runtime")
+    def add_to_parent_update(self, update):
+        # The parent is the update of the ref this package extends, or of its runtime
+        kf = update.metadata
+        parent_refs = []
+        try:
+            parent_refs.append(kf.get_string("ExtensionOf", "ref"))
+        except:
+            pass
+        try:
+            parent_refs.append("runtime/%s" % kf.get_string("Runtime", "runtime"))
+        except:
+            pass
 
-                parent_ref = maybe_parent.ref.format_ref()
-                if parent_ref == runtime_ref_id:
-                    maybe_parent.add_package(update)
-                    return True
-            except:
-                pass
+        for parent_ref in parent_refs:
+            parent = self.updates_by_ref.get(parent_ref)
+            if parent is not None and update.ref_name.startswith(parent.ref_name):
+                parent.add_package(update)
+                return True
+        return False
 
     def is_base_package(self, update):
         name = update.ref.format_ref()
@@ -276,18 +308,109 @@ class FlatpakUpdateWorker():
         except:
             return
 
-        directory = Path(LOG_PATH).parent
+        directory = Path(FLATPAK_LOG_PATH).parent
 
         try:
             os.makedirs(directory, exist_ok=True)
-            with open(LOG_PATH, "a") as f:
+            with open(FLATPAK_LOG_PATH, "a") as f:
                 for entry in entries:
                     f.write("%s\n" % entry)
         except Exception as e:
             warn("Can't write to flatpak update log:", e)
 
     def send_to_updater(self, msg):
-        print(msg, flush=True)
+        if self.connection is None:
+            print(msg, flush=True)
+            return
+
+        try:
+            self.connection.get_output_stream().write_all(("%s\n" % msg).encode(), None)
+        except GLib.Error as e:
+            warn("Error writing to updater: %s" % e.message)
+
+    def start_daemon(self):
+        """ Serves refresh and fetch-updates requests on DAEMON_SOCKET_PATH, one at a time. The installer
+            and its appstream data stay loaded between requests, until the daemon exits when idle. """
+        self.requests = []
+        self.idle_source_id = 0
+
+        try:
+            os.unlink(DAEMON_SOCKET_PATH)
+        except FileNotFoundError:
+            pass
+
+        self.service = Gio.SocketService()
+        self.service.add_address(Gio.UnixSocketAddress.new(DAEMON_SOCKET_PATH),
+                                 Gio.SocketType.STREAM, Gio.SocketProtocol.DEFAULT, None)
+        self.service.connect("incoming", self.on_incoming_connection)
+        self.service.start()
+        self.reset_idle_timeout()
+
+    def reset_idle_timeout(self):
+        if self.idle_source_id > 0:
+            GLib.source_remove(self.idle_source_id)
+        self.idle_source_id = GLib.timeout_add_seconds(DAEMON_IDLE_TIMEOUT, self.on_idle_timeout)
+
+    def on_idle_timeout(self):
+        debug("no request for %d seconds, exiting" % DAEMON_IDLE_TIMEOUT)
+        self.idle_source_id = 0
+        self.quit()
+        return GLib.SOURCE_REMOVE
+
+    def on_incoming_connection(self, service, connection, source_object):
+        self.requests.append(connection)
+        if self.connection is None:
+            self.handle_next_request()
+        return True
+
+    def handle_next_request(self):
+        self.reset_idle_timeout()
+        if len(self.requests) == 0:
+            return
+
+        self.connection = self.requests.pop(0)
+        stream = Gio.DataInputStream.new(self.connection.get_input_stream())
+        stream.read_line_async(GLib.PRIORITY_DEFAULT, None, self.on_request_read)
+
+    def on_request_read(self, stream, result):
+        try:
+            request, length = stream.read_line_finish_utf8(result)
+        except GLib.Error as e:
+            warn("Error reading request: %s" % e.message)
+            request = None
+
+        debug("request from updater: '%s'" % request)
+        if request == "refresh":
+            try:
+                self.refresh(init=not self.appstream_loaded)
+            except Exception as e:
+                warn("Refresh failed: %s" % e)
+            self.finish_request()
+        elif request == "fetch-updates":
+            if self.check_for_any_installed():
+                self.fetch_updates()
+            else:
+                self.send_to_updater("no-installed")
+                self.finish_request()
+        else:
+            warn("Unknown request: '%s'" % request)
+            self.connection.close(None)
+            self.connection = None
+            self.handle_next_request()
+
+    def finish_request(self):
+        if not self.daemon:
+            self.quit()
+            return
+
+        # The client takes a request without "done" as failed
+        self.send_to_updater("done")
+        try:
+            self.connection.close(None)
+        except GLib.Error:
+            pass
+        self.connection = None
+        self.handle_next_request()
 
     def message_from_updater(self, pipe, res):
         if self.cancellable is None or self.cancellable.is_cancelled():
@@ -319,6 +442,11 @@ class FlatpakUpdateWorker():
             self.task.cancel()
 
         self.cancellable.cancel()
+        if self.daemon:
+            try:
+                os.unlink(DAEMON_SOCKET_PATH)
+            except OSError:
+                pass
         Gtk.main_quit()
 
 if __name__ == "__main__":
@@ -327,16 +455,19 @@ if __name__ == "__main__":
                         action="store_true")
     parser.add_argument("-r", "--refresh", help="Refresh local flatpak cache and appstream info.",
                         action="store_true")
-    parser.add_argument("-f", "--fetch-updates", help="Get a json list of update info.",
+    parser.add_argument("-f", "--fetch-updates", help="Print the update info, one json object per update and per line.",
                         action="store_true")
     parser.add_argument("-u", "--update-packages", help="Updates packages - one or more flatpak ref strings must be supplied. "
                                                         "This process will remain running for communication.",
                         action="store_true")
-    
+    parser.add_argument("--daemon", help="Keep running and serve refresh and fetch-updates requests on a socket "
+                                         "until idle for %d minutes." % (DAEMON_IDLE_TIMEOUT // 60),
+                        action="store_true")
+
     parser.add_argument('refs', metavar='ref', type=str, nargs='*', help='refs to update')
     args = parser.parse_args()
 
-    updater = FlatpakUpdateWorker()
+    updater = FlatpakUpdateWorker(daemon=args.daemon)
     GLib.unix_signal_add(GLib.PRIORITY_HIGH, signal.SIGTERM, updater.quit, None)
 
     if args.refresh:
@@ -353,6 +484,8 @@ if __name__ == "__main__":
             print("Expected one or more space-separated flatpak refs")
             exit(1)
         updater.prepare_start_updates(args.refs)
+    elif args.daemon:
+        updater.start_daemon()
     else:
         print("nothing to do")
         exit(0)
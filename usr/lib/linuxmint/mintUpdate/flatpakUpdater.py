@@ -2,8 +2,12 @@
 
 import os
 import json
+import signal
+import socket
 import subprocess
 import sys
+import threading
+import time
 
 import gi
 gi.require_version('GLib', '2.0')
@@ -20,17 +24,32 @@ except Exception:
 
 from Classes import FlatpakUpdate
 
-LOG_PATH = os.path.join(GLib.get_home_dir(), '.linuxmint', 'mintupdate', 'flatpak-updates.log')
 UPDATE_WORKER_PATH = "/usr/lib/linuxmint/mintUpdate/flatpak-update-worker.py"
+# Socket of the worker in daemon mode (see flatpak-update-worker.py --daemon)
+DAEMON_SOCKET_PATH = os.path.join(GLib.get_user_runtime_dir(), 'mintupdate-flatpak-worker-1.sock')
+# Seconds given to the worker to refresh, to list the updates, and to start in daemon mode
+REFRESH_TIMEOUT = 30
+FETCH_TIMEOUT = 45
+DAEMON_START_TIMEOUT = 15
 
 class FlatpakUpdater():
-    def __init__(self):
+    def __init__(self, use_daemon=False):
         self.task = None
+        # Keep a worker running between refreshes, falls back to one-time workers if it doesn't respond
+        self.use_daemon = use_daemon
 
         self.updates = []
         self.error = None
 
     def refresh(self):
+        if self.use_daemon:
+            sock = self.connect_to_daemon()
+            if sock is not None:
+                if "done" in self.request_daemon(sock, "refresh", REFRESH_TIMEOUT):
+                    return
+                print("Flatpaks: the worker daemon didn't refresh, using a one-time worker")
+
+        # This also stops the worker daemon
         self.kill_any_helpers()
 
         try:
@@ -38,40 +57,116 @@ class FlatpakUpdater():
         except subprocess.TimeoutExpired as e:
             print("Flatpaks: timed out trying to refresh", str(e))
 
-    def fetch_updates(self):
+    def fetch_updates(self, callback=None):
+        """ Lists the updates, callback(update) is called for each of them as soon as the worker sends it """
         self.updates = []
-        output = None
-
-        try:
-            output = subprocess.run([UPDATE_WORKER_PATH, "--fetch-updates"], timeout=45, stdout=subprocess.PIPE, encoding="utf-8").stdout
-        except subprocess.TimeoutExpired as e:
-            print("Flatpaks: timed out trying to get a list of updates", str(e))
+        self.error = None
 
-        # print(output)
+        if self.use_daemon:
+            sock = self.connect_to_daemon()
+            if sock is not None:
+                done = self.read_updates(self.request_daemon(sock, "fetch-updates", FETCH_TIMEOUT), callback)
+                # Updates already passed to the callback can't be fetched again
+                if done or len(self.updates) > 0:
+                    print("Flatpak: done generating updates")
+                    return
+                print("Flatpaks: the worker daemon didn't list the updates, using a one-time worker")
 
-        if output is None:
-            print("Flatpaks: no updates")
+        try:
+            proc = subprocess.Popen([UPDATE_WORKER_PATH, "--fetch-updates"], stdout=subprocess.PIPE, encoding="utf-8",
+                                    start_new_session=True)
+        except OSError as e:
+            print("Flatpaks: could not start worker", str(e))
             return
 
-        output = output.strip("\n")
+        # Killing the worker and its children closes its output, which ends the loop below
+        timer = threading.Timer(FETCH_TIMEOUT, self.kill_fetch_worker, [proc])
+        timer.start()
+        try:
+            self.read_updates((line.strip("\n") for line in proc.stdout), callback)
+        finally:
+            timer.cancel()
+            proc.stdout.close()
+            proc.wait()
 
-        if output == "no-installed":
-            print("Flatpaks: skipping update check - nothing installed")
-            return
+        if proc.returncode == -signal.SIGKILL:
+            print("Flatpaks: timed out trying to get a list of updates")
 
-        if output.startswith("error:"):
-            self.error = output[6:]
-            print("Flatpaks: error from fetch-updates call", self.error)
-            return
+        print("Flatpak: done generating updates")
 
+    def read_updates(self, lines, callback):
+        """ Reads the output of a fetch-updates request, returns True if the worker daemon completed it """
+        for line in lines:
+            if line == "done":
+                return True
+            elif line == "no-installed":
+                print("Flatpaks: skipping update check - nothing installed")
+            elif line.startswith("error:"):
+                self.error = line[6:]
+                print("Flatpaks: error from fetch-updates call", self.error)
+            elif line.startswith("{"):
+                try:
+                    update = FlatpakUpdate.from_json(json.loads(line))
+                except json.JSONDecodeError as e:
+                    print("Flatpaks: unable to parse update", str(e))
+                    continue
+                self.updates.append(update)
+                if callback is not None:
+                    callback(update)
+        return False
+
+    def connect_to_daemon(self):
+        """ Returns a socket connected to the worker daemon, which is started if needed, or None """
+        deadline = time.monotonic() + DAEMON_START_TIMEOUT
+        started = False
+        while True:
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                sock.connect(DAEMON_SOCKET_PATH)
+                return sock
+            except OSError:
+                sock.close()
+
+            if not started:
+                started = True
+                try:
+                    subprocess.Popen([UPDATE_WORKER_PATH, "--daemon"], stdin=subprocess.DEVNULL,
+                                     stdout=subprocess.DEVNULL, start_new_session=True)
+                except OSError as e:
+                    print("Flatpaks: could not start worker daemon", str(e))
+                    return None
+            elif time.monotonic() > deadline:
+                print("Flatpaks: timed out trying to connect to the worker daemon")
+                return None
+            time.sleep(0.1)
+
+    def request_daemon(self, sock, request, timeout):
+        """ Sends a request to the worker daemon, yields the lines of its response as they come """
+        # Shutting the socket down ends the response early
+        timer = threading.Timer(timeout, self.shutdown_socket, [sock])
+        timer.start()
+        try:
+            sock.sendall(("%s\n" % request).encode())
+            with sock.makefile("r", encoding="utf-8") as f:
+                for line in f:
+                    yield line.strip("\n")
+        except OSError as e:
+            print("Flatpaks: error from the worker daemon", str(e))
+        finally:
+            timer.cancel()
+            sock.close()
+
+    def shutdown_socket(self, sock):
         try:
-            json_data = json.loads(output)
-            for item in json_data:
-                self.updates.append(FlatpakUpdate.from_json(item))
-        except json.JSONDecodeError as e:
-            print("Flatpaks: unable to parse updates list", str(e))
+            sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
 
-        print("Flatpak: done generating updates")
+    def kill_fetch_worker(self, proc):
+        try:
+            os.killpg(proc.pid, signal.SIGKILL)
+        except OSError:
+            pass
 
     def prepare_start_updates(self, updates):
         argv = [UPDATE_WORKER_PATH, "--update-packages"] + [update.ref.format_ref() for update in updates]
@@ -0,0 +1,186 @@
+#!/usr/bin/python3
+
+import contextlib
+import glob
+import gzip
+import os
+import sqlite3
+
+from gi.repository import GLib
+
+from Classes import CONFIG_PATH, FLATPAK_LOG_PATH
+
+HISTORY_DB_PATH = os.path.join(CONFIG_PATH, "history.db")
+HISTORY_DB_VERSION = 1
+DPKG_LOG_PATTERN = "/var/log/dpkg.log*"
+HARVESTER_LOG_PATH = os.path.join(GLib.get_user_state_dir(), "cinnamon", "harvester.log")
+
+# Each parser returns (date, type, name, old_version, new_version), or None for irrelevant lines
+
+def parse_dpkg_line(line):
+    values = line.split(" ")
+    if len(values) == 6:
+        (date, time, action, package, old_version, new_version) = values
+        if action == "upgrade" and old_version != new_version:
+            return ("%s - %s" % (date, time), "package", package.split(":")[0], old_version, new_version)
+    return None
+
+def parse_harvester_line(line):
+    values = line.split(" ")
+    if len(values) == 7:
+        (date, time, spice_type, action, package, old_version, new_version) = values
+        if action == "upgrade" and old_version != new_version:
+            return ("%s - %s" % (date, time), spice_type, package.split(":")[0], old_version, new_version)
+    return None
+
+def parse_flatpak_line(line):
+    values = line.split("::")
+    if len(values) == 7:
+        (date, time, fp_type, action, name, old_version, new_version) = values
+        return ("%s - %s" % (date, time), "flatpak-runtime" if fp_type == "runtime" else "flatpak-app",
+                name, old_version, new_version)
+    return None
+
+class UpdateHistory():
+    """ Index of the updates recorded in the dpkg, Cinnamon spices and Flatpak logs.
+        Only the data appended to the logs since the previous run is read. """
+
+    def __init__(self, path=HISTORY_DB_PATH):
+        self.path = path
+
+    def connect(self):
+        """ Opens the index, the connection isn't closed by its context manager, see contextlib.closing() """
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        connection = sqlite3.connect(self.path, timeout=30)
+        version = connection.execute("PRAGMA user_version").fetchone()[0]
+        if version != HISTORY_DB_VERSION:
+            connection.executescript("""
+                DROP TABLE IF EXISTS entries;
+                DROP TABLE IF EXISTS files;
+                CREATE TABLE entries (id INTEGER PRIMARY KEY, date TEXT, type TEXT, name TEXT,
+                                      old_version TEXT, new_version TEXT,
+                                      UNIQUE (date, type, name, old_version, new_version));
+                CREATE INDEX entries_date ON entries (date);
+                CREATE TABLE files (device INTEGER, inode INTEGER, offset INTEGER,
+                                    PRIMARY KEY (device, inode));
+                PRAGMA user_version = %d;
+            """ % HISTORY_DB_VERSION)
+        return connection
+
+    def get_log_files(self, include_cinnamon, include_flatpak):
+        log_files = [(path, parse_dpkg_line) for path in glob.glob(DPKG_LOG_PATTERN)]
+        if include_cinnamon:
+            log_files.append((HARVESTER_LOG_PATH, parse_harvester_line))
+        if include_flatpak:
+            log_files.append((FLATPAK_LOG_PATH, parse_flatpak_line))
+        return log_files
+
+    def update(self, include_cinnamon=False, include_flatpak=False):
+        """ Adds the new log entries to the index, returns the number of entries added """
+        # The connection's context manager commits the transaction
+        with contextlib.closing(self.connect()) as connection, connection:
+            offsets = {(device, inode): offset for (device, inode, offset) in
+                       connection.execute("SELECT device, inode, offset FROM files")}
+            seen = {}
+            count = connection.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+            for path, parser in self.get_log_files(include_cinnamon, include_flatpak):
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                key = (stat.st_dev, stat.st_ino)
+                # Rotated files keep their inode, so reading resumes where it stopped under the old name
+                offset = offsets.get(key, 0)
+                try:
+                    offset = self.read_log_file(connection, path, parser, offset, stat.st_size)
+                except Exception as e:
+                    print("Could not read %s: %s" % (path, e))
+                seen[key] = offset
+            connection.execute("DELETE FROM files")
+            connection.executemany("INSERT INTO files (device, inode, offset) VALUES (?, ?, ?)",
+                                   [(device, inode, offset) for ((device, inode), offset) in seen.items()])
+            return connection.execute("SELECT COUNT(*) FROM entries").fetchone()[0] - count
+
+    def read_log_file(self, connection, path, parser, offset, size):
+        """ Reads a log file from the given offset, returns the offset to resume from """
+        if path.endswith(".gz"):
+            # Compressed logs don't change once written
+            if offset > 0:
+                return offset
+            with gzip.open(path, "rb") as f:
+                self.insert_entries(connection, parser, f)
+            return size
+        if offset > size:
+            # The file was truncated
+            offset = 0
+        if offset == size:
+            return offset
+        with open(path, "rb") as f:
+            f.seek(offset)
+            lines = []
+            for line in f:
+                if not line.endswith(b"\n"):
+                    # Incomplete line, read it on the next run
+                    break
+                offset += len(line)
+                lines.append(line)
+            self.insert_entries(connection, parser, lines)
+        return offset
+
+    def insert_entries(self, connection, parser, lines):
+        entries = (parser(line.decode("utf-8", errors="replace").rstrip("\n")) for line in lines)
+        connection.executemany("INSERT OR IGNORE INTO entries (date, type, name, old_version, new_version) "
+                               "VALUES (?, ?, ?, ?, ?)", (entry for entry in entries if entry is not None))
+
+    def count(self):
+        with contextlib.closing(self.connect()) as connection:
+            return connection.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    def get_entries(self, limit=-1, after=None):
+        """ Returns the most recent entries first, all of them by default.
+            after is the key of the last entry of the previous page (see HistoryEntries.get_next_key()) """
+        query = "SELECT date, type, name, old_version, new_version, id FROM entries"
+        if after is None:
+            parameters = (limit,)
+        else:
+            # Keyset paging, the index on the date (which includes the id) gets to the page directly
+            query += " WHERE (date, id) < (?, ?)"
+            parameters = (*after, limit)
+        query += " ORDER BY date DESC, id DESC LIMIT ?"
+        with contextlib.closing(self.connect()) as connection:
+            return HistoryEntries(connection.execute(query, parameters).fetchall())
+
+class HistoryEntries():
+    """ Column arrays of history entries, sorted without going through a GTK model """
+
+    def __init__(self, rows=()):
+        """ rows are (date, type, name, old_version, new_version, id) """
+        if len(rows) > 0:
+            self.columns = [list(column) for column in zip(*rows)]
+        else:
+            self.columns = [[] for i in range(6)]
+        # The ids are only used to get the next page
+        self.ids = self.columns.pop()
+
+    def __len__(self):
+        return len(self.columns[0])
+
+    def extend(self, entries):
+        """ Appends the entries of the next page """
+        for column, values in zip(self.columns, entries.columns):
+            column.extend(values)
+        self.ids.extend(entries.ids)
+
+    def get_next_key(self):
+        """ Returns the key to get the entries which follow these ones, None if there are none """
+        if len(self.ids) == 0:
+            return None
+        return (self.columns[0][-1], self.ids[-1])
+
+    def get_order(self, column, descending):
+        """ Returns the indexes of the entries sorted on the given column """
+        values = self.columns[column]
+        return sorted(range(len(values)), key=values.__getitem__, reverse=descending)
+
+    def get_row(self, index):
+        return [column[index] for column in self.columns]
@@ -16,8 +16,8 @@ from gi.repository import Gtk, Gdk, Gio
 # Local imports
 from apt.utils import get_maintenance_end_date
 
-from Classes import CONFIGURED_KERNEL_TYPE, KERNEL_PKG_NAMES, \
-                     SUPPORTED_KERNEL_TYPES, get_release_dates, _idle, _async
+from Classes import KERNEL_PKG_NAMES, SUPPORTED_KERNEL_TYPES, \
+                     get_configured_kernel_type, get_release_dates, _idle, _async
 
 # i18n
 APP = 'mintupdate'
@@ -218,7 +218,8 @@ class KernelWindow():
         # Get distro release dates for support duration calculation
         self.release_dates = get_release_dates()
         self.allow_kernel_type_selection = False
-        self.initially_configured_kernel_type = CONFIGURED_KERNEL_TYPE
+        self.configured_kernel_type = get_configured_kernel_type()
+        self.initially_configured_kernel_type = self.configured_kernel_type
         if not self.allow_kernel_type_selection and \
            self.settings.get_boolean("allow-kernel-type-selection"):
             self.allow_kernel_type_selection = True
@@ -226,7 +227,7 @@ class KernelWindow():
             # Set up the kernel type selection dropdown
             for index, kernel_type in enumerate(SUPPORTED_KERNEL_TYPES):
                 self.ui_kernel_type_combo.append_text(kernel_type[1:])
-                if kernel_type[1:] == CONFIGURED_KERNEL_TYPE[1:]:
+                if kernel_type[1:] == self.configured_kernel_type[1:]:
                     self.ui_kernel_type_combo.set_active(index)
             self.ui_kernel_type_combo.connect("changed", self.on_kernel_type_combo_changed)
 
@@ -241,9 +242,8 @@ class KernelWindow():
 
     # Refresh window on kernel type selection change
     def on_kernel_type_combo_changed(self, widget):
-        global CONFIGURED_KERNEL_TYPE
-        CONFIGURED_KERNEL_TYPE = "-" + widget.get_active_text()
-        self.settings.set_string("selected-kernel-type", CONFIGURED_KERNEL_TYPE)
+        self.configured_kernel_type = "-" + widget.get_active_text()
+        self.settings.set_string("selected-kernel-type", self.configured_kernel_type)
         self.refresh_kernels_list()
 
     def refresh_kernels_list(self):
@@ -260,7 +260,7 @@ class KernelWindow():
 
     @_async
     def refresh_kernels_async(self):
-        kernels = subprocess.run(["/usr/lib/linuxmint/mintUpdate/checkKernels.py", CONFIGURED_KERNEL_TYPE],
+        kernels = subprocess.run(["/usr/lib/linuxmint/mintUpdate/checkKernels.py", self.configured_kernel_type],
         stdout=subprocess.PIPE).stdout.decode()
         self.cache = apt.Cache()
         self.refresh_kernels_list_done(kernels)
@@ -293,7 +293,7 @@ class KernelWindow():
                     title = _("Installed")
 
                 installable = (installable == "1")
-                if kernel_type == CONFIGURED_KERNEL_TYPE:
+                if kernel_type == self.configured_kernel_type:
                     label = version
                 else:
                     label = version + kernel_type
@@ -514,7 +514,7 @@ class KernelWindow():
     def destroy_window(self, widget):
         self.ui_window.destroy()
         if self.callback is not None:
-            needs_refresh = self.initially_configured_kernel_type != CONFIGURED_KERNEL_TYPE
+            needs_refresh = self.initially_configured_kernel_type != self.configured_kernel_type
             self.callback(needs_refresh)
 
     def on_continue_clicked(self, widget):
@@ -2,62 +2,42 @@
 # -*- coding: utf-8 -*-
 
 # system imports
+import time
+STARTUP_TIME = time.monotonic()
 import os
 import sys
 import gi
 import tempfile
-import time
+import threading
+import concurrent.futures
 import gettext
-import io
 import json
 import locale
-import tarfile
-import urllib.request
-import proxygsettings
 import subprocess
-import pycurl
 import datetime
 import configparser
 import traceback
 import setproctitle
 import platform
 import re
-import aptkit.simpleclient
-import checkAPT
-from multiprocess import Process, Queue
+from multiprocess import Process, Pipe
 
 gi.require_version('Gtk', '3.0')
 gi.require_version('Notify', '0.7')
-from gi.repository import Gtk, Gdk, Gio, GLib, GObject, Notify, Pango
-from xapp.GSettingsWidgets import *
+gi.require_version('XApp', '1.0')
+from gi.repository import Gtk, Gdk, Gio, GLib, GObject, Notify, Pango, XApp
 
 # local imports
 import logger
-from kernelwindow import KernelWindow
-from Classes import Update, PRIORITY_UPDATES, CONFIG_PATH, UpdateTracker, _idle, _async
-
-
-settings = Gio.Settings(schema_id="com.linuxmint.updates")
-cinnamon_support = False
-try:
-    if settings.get_boolean("show-cinnamon-updates"):
-        import cinnamon
-        cinnamon_support = True
-except Exception as e:
-    if os.getenv("DEBUG"):
-        print("No cinnamon update support:\n%s" % traceback.format_exc())
-
-flatpak_support = False
-try:
-    if settings.get_boolean("show-flatpak-updates"):
-        import flatpakUpdater
-        flatpak_support = True
-except Exception as e:
-    if os.getenv("DEBUG"):
-        print("No flatpak update support:\n%s" % traceback.format_exc())
+from changelog import ChangelogRetriever, ChangelogPrefetcher
+from Classes import Update, Blacklist, PRIORITY_UPDATES, CONFIG_PATH, PKGCACHE_PATH, DPKG_STATUS_PATH, MAINTENANCE_PATH, UpdateTracker, UpdateCache, get_dpkg_lock_holder, _idle, _async
 
-CINNAMON_SUPPORT = cinnamon_support
-FLATPAK_SUPPORT = flatpak_support
+# The modules below are imported on first use, to keep them out of the startup time:
+# checkAPT (python-apt) in the APT worker, aptkit, pycurl, the kernel and history windows,
+# the xapp settings widgets used by the preferences, and the cinnamon and flatpakUpdater
+# modules when the refresh needs them (see MintUpdate.load_update_sources()).
+CINNAMON_SUPPORT = False
+FLATPAK_SUPPORT = False
 
 # import AUTOMATIONS dict
 with open("/usr/share/linuxmint/mintupdate/automation/index.json") as f:
@@ -88,6 +68,15 @@ Notify.init(_("Update Manager"))
 
 BLACKLIST_PKG_NAME = 0
 
+# Number of rows added to the History of Updates window per main loop iteration
+HISTORY_BATCH_SIZE = 2000
+
+# Number of Cinnamon spice types refreshed at the same time
+CINNAMON_REFRESH_WORKERS = 3
+
+# Seconds between checks for the end of the launcher maintenance (spices and flatpaks updates)
+MAINTENANCE_CHECK_INTERVAL = 10
+
 
 def size_to_string(size):
     f_size = float(size)
@@ -111,41 +100,74 @@ def name_search_func(model, column, key, iter):
 class APTCacheMonitor():
     """ Monitors package cache and dpkg status and runs the refresh thread() on change """
 
+    # Directories holding the files which change when packages or lists are updated
+    MONITORED_DIRECTORIES = ["/var/lib/dpkg", "/var/lib/apt/lists", "/var/cache/apt"]
+    # Seconds without events before a burst of changes is considered finished
+    DEBOUNCE_DELAY = 1
+    # Seconds between checks while the package manager holds its lock
+    LOCK_RETRY_DELAY = 2
+
     def __init__(self, application):
         self.application = application
         self.cachetime = 0
         self.statustime = 0
         self.paused = False
-        self.pkgcache = "/var/cache/apt/pkgcache.bin"
-        self.dpkgstatus = "/var/lib/dpkg/status"
+        self.pkgcache = PKGCACHE_PATH
+        self.dpkgstatus = DPKG_STATUS_PATH
+        self.monitors = []
+        self.check_source_id = 0
 
-    @_async
     def start(self):
         self.application.refresh(False)
         self.update_cachetime()
         if os.path.isfile(self.pkgcache) and os.path.isfile(self.dpkgstatus):
-            while True:
-                if not self.paused and self.application.hidden:
-                    try:
-                        cachetime = os.path.getmtime(self.pkgcache)
-                        statustime = os.path.getmtime(self.dpkgstatus)
-                        if (cachetime != self.cachetime or statustime != self.statustime) and \
-                            not self.application.dpkg_locked():
-                            self.cachetime = cachetime
-                            self.statustime = statustime
-                            self.application.logger.write("Changes to the package cache detected; triggering refresh")
-                            self.application.refresh(False)
-                    except:
-                        pass
-                time.sleep(90)
+            for path in self.MONITORED_DIRECTORIES:
+                try:
+                    monitor = Gio.File.new_for_path(path).monitor_directory(Gio.FileMonitorFlags.NONE, None)
+                    monitor.connect("changed", self.on_directory_changed)
+                    self.monitors.append(monitor)
+                except GLib.Error as e:
+                    self.application.logger.write_error("Could not monitor %s: %s" % (path, e.message))
         else:
             self.application.logger.write("Package cache location not found, disabling cache monitoring")
 
+    def on_directory_changed(self, monitor, file, other_file, event_type):
+        if event_type != Gio.FileMonitorEvent.ATTRIBUTE_CHANGED:
+            self.queue_check()
+
+    def queue_check(self, delay=DEBOUNCE_DELAY):
+        # Restart the timer on every event so that a whole APT run only triggers one check
+        if self.check_source_id:
+            GLib.source_remove(self.check_source_id)
+        self.check_source_id = GLib.timeout_add_seconds(delay, self.check)
+
+    def check(self):
+        self.check_source_id = 0
+        # Changes are picked up by the next check after resume() or hide_window()
+        if self.paused or not self.application.hidden:
+            return GLib.SOURCE_REMOVE
+        try:
+            cachetime = os.path.getmtime(self.pkgcache)
+            statustime = os.path.getmtime(self.dpkgstatus)
+            if cachetime != self.cachetime or statustime != self.statustime:
+                if self.application.dpkg_locked():
+                    self.queue_check(self.LOCK_RETRY_DELAY)
+                    return GLib.SOURCE_REMOVE
+                self.cachetime = cachetime
+                self.statustime = statustime
+                self.application.logger.write("Changes to the package cache detected; triggering refresh")
+                self.application.refresh(False)
+        except:
+            pass
+        return GLib.SOURCE_REMOVE
+
     def resume(self, update_cachetime=True):
         if self.paused:
             if update_cachetime:
                 self.update_cachetime()
             self.paused = False
+            # resume() is also called from the refresh and install threads
+            GLib.idle_add(self.queue_check)
 
     def pause(self):
         self.paused = True
@@ -155,6 +177,266 @@ class APTCacheMonitor():
             self.cachetime = os.path.getmtime(self.pkgcache)
             self.statustime = os.path.getmtime(self.dpkgstatus)
 
+class APTCheckWorker():
+    """ Runs the APT checks in a long-lived child process which keeps the APT cache open between refreshes """
+
+    # Restart the worker when its resident memory exceeds this many kB
+    MAX_RSS = 512 * 1024
+
+    def __init__(self, application):
+        self.application = application
+        self.process = None
+        self.connection = None
+        self.lock = threading.Lock()
+
+    def start(self):
+        connection, worker_connection = Pipe()
+        self.process = Process(target=self.run, args=[worker_connection, connection], daemon=True)
+        self.process.start()
+        worker_connection.close()
+        self.connection = connection
+
+    def stop(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+        if self.process is not None:
+            if self.process.is_alive():
+                self.process.terminate()
+            self.process.join(1)
+            self.process = None
+
+    def get_rss(self):
+        try:
+            with open("/proc/%d/status" % self.process.pid) as f:
+                for line in f:
+                    if line.startswith("VmRSS:"):
+                        return int(line.split()[1])
+        except:
+            pass
+        return 0
+
+    def request(self, *command):
+        """ Sends a request to the worker and returns its response, (re)starting the worker as needed """
+        with self.lock:
+            for attempt in range(2):
+                if self.process is None or not self.process.is_alive():
+                    self.stop()
+                    self.start()
+                try:
+                    self.connection.send(command)
+                    response = self.connection.recv()
+                    break
+                except (EOFError, OSError):
+                    self.application.logger.write_error("APT check worker exited unexpectedly, restarting it")
+                    self.stop()
+                    if attempt > 0:
+                        raise
+            rss = self.get_rss()
+            if rss > self.MAX_RSS:
+                self.application.logger.write("APT check worker uses %d MB, restarting it" % (rss // 1024))
+                self.stop()
+            return response
+
+    def check(self, enrich=True):
+        """ Returns: error_message (None if successful), list_of_updates (None if error)
+            Without enrich, the descriptions are neither translated nor aliased, see enrich() """
+        return self.get_updates(self.request("check", enrich))
+
+    def enrich(self, source_names=None):
+        """ Returns the updates of the last check(enrich=False), all of them or the given ones,
+            with their translated descriptions and aliases """
+        error, updates = self.get_updates(self.request("enrich", source_names))
+        if updates is not None and source_names is not None:
+            # A restarted worker checks again and returns all the updates
+            source_names = set(source_names)
+            updates = [update for update in updates if update.source_name in source_names]
+        return error, updates
+
+    def get_updates(self, response):
+        error, updates = response
+        if updates is not None:
+            updates = [Update.from_tuple(update) for update in updates]
+        return error, updates
+
+    def get_description(self, update):
+        """ Returns the description of an update, which check() leaves out """
+        error, description = self.request("description", update.to_tuple())
+        if error is not None:
+            self.application.logger.write_error("Could not load the description of %s: %s" % (update.source_name, error))
+            return ""
+        return description
+
+    # called in the worker process
+    def run(self, connection, parent_connection):
+        # Only the GUI end of the pipe may stay open in the GUI, so that the worker sees EOF when it exits
+        parent_connection.close()
+        self.apt_check = None
+        self.enriched_names = set()
+        while True:
+            try:
+                command, *args = connection.recv()
+            except (EOFError, OSError):
+                break
+            handler = getattr(self, "handle_%s" % command, None)
+            if handler is None:
+                response = ["Unknown request: %s" % command, None]
+            else:
+                response = handler(*args)
+            try:
+                connection.send(response)
+            except OSError:
+                break
+
+    def open_cache(self):
+        if self.apt_check is None:
+            import checkAPT
+            self.apt_check = checkAPT.APTCheck()
+            self.apt_check.load_aliases()
+        else:
+            self.apt_check.reopen_cache_if_changed()
+
+    def handle_check(self, enrich=True):
+        try:
+            if not self.application.test_mode:
+                self.open_cache()
+        except Exception as error:
+            self.apt_check = None
+            return self.application.get_apt_check_error(error)
+        error, updates = self.application.check_apt(self.apt_check, enrich)
+        if enrich and updates is not None:
+            self.enriched_names = set(update.source_name for update in updates)
+        else:
+            self.enriched_names = set()
+        return self.get_response(error, updates)
+
+    def handle_enrich(self, source_names=None):
+        if self.apt_check is None:
+            # The worker was restarted since the check (or runs in test mode)
+            return self.handle_check()
+        if source_names is None:
+            source_names = self.apt_check.updates.keys()
+        source_names = [name for name in source_names if name in self.apt_check.updates]
+        # Updates are only enriched once, the process isn't idempotent
+        error, updates = self.application.enrich_apt_updates(self.apt_check,
+                            [name for name in source_names if name not in self.enriched_names])
+        if error is not None:
+            return [error, None]
+        self.enriched_names.update(source_names)
+        return self.get_response(None, [self.apt_check.updates[name] for name in source_names])
+
+    def get_response(self, error, updates):
+        if updates is not None:
+            # Descriptions are only needed for the selected update, see get_description()
+            updates = [update.to_tuple(with_description=False) for update in updates]
+        return [error, updates]
+
+    def handle_description(self, data):
+        try:
+            update = Update.from_tuple(data)
+            if self.apt_check is not None and update.source_name in self.enriched_names:
+                # Already translated and aliased by the check
+                return [None, self.apt_check.updates[update.source_name].description]
+            self.open_cache()
+            return [None, self.apt_check.get_description(update)]
+        except Exception as error:
+            return [str(error), None]
+
+class RefreshTasks():
+    """ Refreshes the sources of updates (APT, Flatpak, Cinnamon) in parallel, so that each of
+        them can be handled as soon as it is ready instead of waiting for the slowest one """
+
+    # Seconds to wait for each source before giving up on it
+    TIMEOUTS = {"apt": 900, "flatpak": 180, "cinnamon": 180}
+
+    def __init__(self, logger):
+        self.logger = logger
+        self.executor = concurrent.futures.ThreadPoolExecutor(thread_name_prefix="refresh")
+        self.futures = {}
+        self.deadlines = {}
+        # (name, result, finished) of the results not handled yet
+        self.results = []
+        self.condition = threading.Condition()
+        self.cancelled = False
+
+    def add(self, name, future=None):
+        """ Registers a source. Without a future, the caller completes the returned one with set_result() """
+        if future is None:
+            future = concurrent.futures.Future()
+        start_time = time.monotonic()
+        self.futures[name] = future
+        self.deadlines[name] = start_time + self.TIMEOUTS[name]
+        def on_done(future):
+            result = None
+            if not future.cancelled():
+                try:
+                    result = future.result()
+                    self.logger.write("%s source ready in %.1fs" % (name, time.monotonic() - start_time))
+                except Exception as e:
+                    self.logger.write_error("Could not refresh the %s source: %s" % (name, e))
+            self.put_result(name, result, True)
+        future.add_done_callback(on_done)
+        return future
+
+    def submit(self, name, function, *args):
+        return self.add(name, self.executor.submit(function, *args))
+
+    def set_result(self, name, result=None):
+        future = self.futures.get(name)
+        if future is not None and not future.done():
+            future.set_result(result)
+
+    def put_result(self, name, result, finished=False):
+        """ Sources can report partial results while they run, their final result is reported when they're done """
+        with self.condition:
+            self.results.append((name, result, finished))
+            self.condition.notify_all()
+
+    def get_results(self, names):
+        """ Yields (name, result, finished) for the given sources, in the order they come. The final result
+            of a source is None if it failed. Sources which time out are skipped, the wait stops on cancel(). """
+        pending = set(name for name in names if name in self.futures)
+        while len(pending) > 0:
+            with self.condition:
+                while not self.cancelled:
+                    results = [result for result in self.results if result[0] in pending]
+                    timeout = min(self.deadlines[name] for name in pending) - time.monotonic()
+                    if len(results) > 0 or timeout <= 0:
+                        break
+                    self.condition.wait(timeout)
+                if self.cancelled:
+                    return
+                for result in results:
+                    self.results.remove(result)
+            for (name, result, finished) in results:
+                if finished:
+                    pending.discard(name)
+                yield (name, result, finished)
+            now = time.monotonic()
+            for name in list(pending):
+                if self.deadlines[name] <= now:
+                    # The thread can't be interrupted, its result is ignored
+                    self.logger.write_error("Timed out waiting for the %s source" % name)
+                    self.futures[name].cancel()
+                    pending.discard(name)
+
+    def wait(self, name):
+        """ Waits for a source, returns its final result, or None if it isn't refreshed """
+        for (name, result, finished) in self.get_results([name]):
+            if finished:
+                return result
+        return None
+
+    def cancel(self):
+        """ Stops waiting for the sources. Sources already running finish in the background. """
+        with self.condition:
+            self.cancelled = True
+            self.condition.notify_all()
+        for future in self.futures.values():
+            if not future.done():
+                future.cancel()
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
 class XAppStatusIcon():
 
     def __init__(self, menu):
@@ -179,9 +461,8 @@ class MintUpdate():
         self.updates_inhibited = False
         self.reboot_required = False
         self.refreshing = False
-        self.refreshing_apt = False
-        self.refreshing_flatpak = False
-        self.refreshing_cinnamon = False
+        self.refresh_tasks = None
+        self.pending_details = None # set when the updates were only counted, see count_updates()
         self.auto_refresh_is_alive = False
         self.hidden = True # whether the window is hidden or not
         self.packages = [] # packages selected for update
@@ -191,8 +472,17 @@ class MintUpdate():
         self.logger = logger.Logger()
         self.cache_monitor = None
         self.logger.write("Launching Update Manager")
+        self.log_startup_step("modules loaded")
         self.test_mode = os.getenv("MINTUPDATE_TEST")
         self.settings = Gio.Settings(schema_id="com.linuxmint.updates")
+        self.update_cache = UpdateCache(self.settings, self.logger)
+        self.apt_worker = APTCheckWorker(self)
+        self.changelog_retriever = ChangelogRetriever()
+        self.changelog_prefetcher = ChangelogPrefetcher(self.changelog_retriever, self.logger)
+        self.update_sources_loaded = False
+        self.maintenance_source_id = 0
+        self.cinnamon_updater = None
+        self.flatpak_updater = None
 
         self.is_lmde = False
         self.app_restart_required = False
@@ -205,6 +495,7 @@ class MintUpdate():
         self.builder = Gtk.Builder()
         self.builder.set_translation_domain("mintupdate")
         self.builder.add_from_file(gladefile)
+        self.log_startup_step("main window loaded")
 
         #self.builder.connect_signals(self)
         for widget in self.builder.get_objects():
@@ -338,6 +629,7 @@ class MintUpdate():
 
             self.statusIcon = XAppStatusIcon(menu)
             self.statusIcon.icon.connect('activate', self.on_statusicon_activated)
+            self.log_startup_step("tray icon created")
 
             # Main window menu
             fileMenu = Gtk.MenuItem.new_with_mnemonic(_("_File"))
@@ -510,20 +802,6 @@ class MintUpdate():
                 if showWindow == "show":
                     self.show_window()
 
-            if CINNAMON_SUPPORT:
-                self.cinnamon_updater = cinnamon.UpdateManager()
-            else:
-                self.cinnamon_updater = None
-
-            global FLATPAK_SUPPORT
-            if FLATPAK_SUPPORT:
-                try:
-                    self.flatpak_updater = flatpakUpdater.FlatpakUpdater()
-                except Exception as e:
-                    print("Error creating FlatpakUpdater:", str(e))
-                    self.flatpak_updater = None
-                    FLATPAK_SUPPORT = False
-
             if self.settings.get_boolean("show-welcome-page"):
                 self.show_welcome_page()
             else:
@@ -535,6 +813,7 @@ class MintUpdate():
             self.refresh_schedule_enabled = self.settings.get_boolean("refresh-schedule-enabled")
             self.start_auto_refresh()
 
+            GLib.idle_add(self.log_startup_step, "main loop running")
             Gtk.main()
 
         except Exception as e:
@@ -543,6 +822,44 @@ class MintUpdate():
             self.logger.write_error("Exception occurred in main thread: " + str(sys.exc_info()[0]))
             self.logger.close()
 
+    def log_startup_step(self, step):
+        self.logger.write("Startup: %s after %d ms" % (step, (time.monotonic() - STARTUP_TIME) * 1000))
+        return False
+
+    def load_update_sources(self):
+        """ Imports the Cinnamon and Flatpak support on first use, they're not needed to show the tray icon """
+        global cinnamon, flatpakUpdater, CINNAMON_SUPPORT, FLATPAK_SUPPORT
+        if self.update_sources_loaded:
+            return
+        self.update_sources_loaded = True
+        start = time.monotonic()
+
+        try:
+            if self.settings.get_boolean("show-cinnamon-updates"):
+                import cinnamon
+                self.cinnamon_updater = cinnamon.UpdateManager()
+                CINNAMON_SUPPORT = True
+        except Exception as e:
+            if os.getenv("DEBUG"):
+                print("No cinnamon update support:\n%s" % traceback.format_exc())
+
+        try:
+            if self.settings.get_boolean("show-flatpak-updates"):
+                import flatpakUpdater
+                FLATPAK_SUPPORT = True
+        except Exception as e:
+            if os.getenv("DEBUG"):
+                print("No flatpak update support:\n%s" % traceback.format_exc())
+
+        if FLATPAK_SUPPORT:
+            try:
+                self.flatpak_updater = flatpakUpdater.FlatpakUpdater(self.settings.get_boolean("flatpak-worker-daemon"))
+            except Exception as e:
+                print("Error creating FlatpakUpdater:", str(e))
+                FLATPAK_SUPPORT = False
+
+        self.logger.write("Update sources loaded in %d ms" % ((time.monotonic() - start) * 1000))
+
     def _on_settings_changed(self, settings, key, data=None):
         if key is None:
             self.show_flatpak_enabled = settings.get_boolean("show-flatpak-updates")
@@ -578,13 +895,8 @@ class MintUpdate():
 
     @staticmethod
     def dpkg_locked():
-        """ Returns True if a process has a handle on /var/lib/dpkg/lock (no check for write lock) """
-        try:
-            subprocess.run(["sudo", "/usr/lib/linuxmint/mintUpdate/dpkg_lock_check.sh"],
-                stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
-            return True
-        except subprocess.CalledProcessError:
-            return False
+        """ Returns True if a process holds a lock on the dpkg database """
+        return get_dpkg_lock_holder() is not None
 
     @staticmethod
     def show_dpkg_lock_msg(parent):
@@ -639,18 +951,51 @@ class MintUpdate():
 
 
     @_idle
-    def show_updates_in_UI(self, num_visible, num_software, num_security, download_size, is_self_update, model_items):
+    def show_updates_in_UI(self, is_self_update, model_items):
+        model = Gtk.TreeStore(bool, str, str, str, str, GObject.TYPE_LONG, str, str, str, str, str, object)
+        # UPDATE_CHECKED, UPDATE_DISPLAY_NAME, UPDATE_OLD_VERSION, UPDATE_NEW_VERSION, UPDATE_SOURCE,
+        # UPDATE_SIZE, UPDATE_SIZE_STR, UPDATE_TYPE_PIX, UPDATE_TYPE, UPDATE_TOOLTIP, UPDATE_SORT_STR, UPDATE_OBJ
+
+        self.fill_update_model(model, model_items)
+        # Sort once, after all the rows were added
+        model.set_sort_column_id(UPDATE_SORT_STR, Gtk.SortType.ASCENDING)
+
+        self.treeview.set_model(model)
+        self.treeview.set_search_column(UPDATE_DISPLAY_NAME)
+        self.ui_notebook_details.set_current_page(0)
+
+        if len(model_items) > 0 and not is_self_update:
+            # Let the user browse the updates found so far, they can be installed once all the sources are done
+            self.ui_stack.set_visible_child_name("updates_page")
+            self.ui_window.set_sensitive(True)
+
+    @_idle
+    def add_updates_to_UI(self, model_items):
+        # Only a few rows are added to the sorted model, at their place
+        self.fill_update_model(self.treeview.get_model(), model_items)
+        self.ui_stack.set_visible_child_name("updates_page")
+        self.ui_window.set_sensitive(True)
+
+    @_idle
+    def finish_updates_in_UI(self, is_self_update, track=True):
+        model = self.treeview.get_model()
         status_string = ""
 
+        # Count the updates of all the sources
+        num_visible = 0
+        download_size = 0
+        for row in model:
+            num_visible += 1
+            download_size += row[UPDATE_SIZE]
+
         if num_visible > 0:
-            self.logger.write("Found %d software updates" % num_visible)
             if is_self_update:
                 self.ui_stack.set_visible_child_name("self_update_page")
                 self.ui_statusbar.set_visible(False)
                 details = []
 
-                for item in model_items:
-                    details.append(f"{item[0].source_name} {item[0].new_version}")
+                for row in model:
+                    details.append(f"{row[UPDATE_OBJ].source_name} {row[UPDATE_OBJ].new_version}")
                 details = ", ".join(details)
                 self.ui_label_self_update_details.set_text(details)
             else:
@@ -661,13 +1006,29 @@ class MintUpdate():
                 self.ui_select_all_button.set_sensitive(True)
                 self.ui_install_button.set_sensitive(True)
                 self.ui_window.set_sensitive(True)
-            systray_tooltip = gettext.ngettext("%d update available", "%d updates available", num_visible) % num_visible
+        else:
+            self.ui_stack.set_visible_child_name("success_page")
+
+        updates = [row[UPDATE_OBJ] for row in model]
+        self.show_status(updates, status_string)
+        if track:
+            self.track_updates(updates)
+
+    @_idle
+    def show_update_counts(self, updates):
+        # Tray mode, see count_updates()
+        self.show_status(updates)
+        self.track_updates(updates)
+
+    def show_status(self, updates, status_string=""):
+        if len(updates) > 0:
+            self.logger.write("Found %d software updates" % len(updates))
+            systray_tooltip = gettext.ngettext("%d update available", "%d updates available", len(updates)) % len(updates)
 
             if not self.reboot_required:
                 self.set_status(status_string, systray_tooltip, "mintupdate-updates-available-symbolic", True)
         else:
             self.logger.write("System is up to date")
-            self.ui_stack.set_visible_child_name("success_page")
 
             if not self.reboot_required:
                 self.set_status("", _("Your system is up to date"), "mintupdate-up-to-date-symbolic",
@@ -676,25 +1037,24 @@ class MintUpdate():
         if self.reboot_required:
             self.set_status(status_string, _("Restart required"), "mintupdate-warning-symbolic", True)
 
-        self.ui_notebook_details.set_current_page(0)
+    def track_updates(self, updates):
+        num_security = 0
+        num_software = 0
+        for update in updates:
+            if update.type in ("security", "kernel"):
+                num_security += 1
+            elif update.type != "unstable":
+                num_software += 1
 
         tracker = UpdateTracker(self.settings, self.logger)
-        model = Gtk.TreeStore(bool, str, str, str, str, GObject.TYPE_LONG, str, str, str, str, str, object)
-        # UPDATE_CHECKED, UPDATE_DISPLAY_NAME, UPDATE_OLD_VERSION, UPDATE_NEW_VERSION, UPDATE_SOURCE,
-        # UPDATE_SIZE, UPDATE_SIZE_STR, UPDATE_TYPE_PIX, UPDATE_TYPE, UPDATE_TOOLTIP, UPDATE_SORT_STR, UPDATE_OBJ
-
-        model.set_sort_column_id(UPDATE_SORT_STR, Gtk.SortType.ASCENDING)
-        for item in model_items:
-            self.add_update_to_model(model, tracker, item)
-
         if tracker.active:
+            for update in updates:
+                if update.type != "unstable":
+                    tracker.update(update)
             if tracker.notify():
                 self.show_tracker_notification(num_software, num_security)
             tracker.record()
 
-        self.treeview.set_model(model)
-        self.treeview.set_search_column(UPDATE_DISPLAY_NAME)
-
     def show_tracker_notification(self, num_software, num_security):
         security_msg = gettext.ngettext("%d security update", "%d security updates", num_security) % num_security
         software_msg = gettext.ngettext("%d software update", "%d software updates", num_software) % num_software
@@ -731,9 +1091,12 @@ class MintUpdate():
     def hide_window(self, widget=None):
         self.ui_window.hide()
         self.hidden = True
+        if self.cache_monitor is not None:
+            self.cache_monitor.queue_check()
 
     @_idle
     def show_window(self, time=Gtk.get_current_event_time()):
+        self.show_details()
         self.ui_window.show()
         self.ui_window.present_with_time(time)
         self.hidden = False
@@ -891,7 +1254,11 @@ class MintUpdate():
             (model, iter) = selection.get_selected()
             if iter is not None:
                 update = model.get_value(iter, UPDATE_OBJ)
-                description = update.description.replace("\\n", "\n")
+                if update.description is None:
+                    self.load_description(update)
+                    description = ""
+                else:
+                    description = update.description.replace("\\n", "\n")
                 desc_tab = self.ui_notebook_details.get_nth_page(TAB_DESC)
 
                 if update.type == "cinnamon":
@@ -932,183 +1299,33 @@ class MintUpdate():
             print(sys.exc_info()[0])
 
 
-    def get_ppa_info(self, origin):
-        ppa_sources_file = "/etc/apt/sources.list"
-        ppa_sources_dir = "/etc/apt/sources.list.d/"
-        ppa_words = origin.lstrip("LP-PPA-").split("-")
-
-        source = ppa_sources_file
-        if os.path.exists(ppa_sources_dir):
-            for filename in os.listdir(ppa_sources_dir):
-                if filename.startswith(origin.lstrip("LP-PPA-")):
-                    source = os.path.join(ppa_sources_dir, filename)
-                    break
-        if not os.path.exists(source):
-            return None, None
-        try:
-            with open(source) as f:
-                for line in f:
-                    if (not line.startswith("#") and all(word in line for word in ppa_words)):
-                        ppa_info = line.split("://")[1]
-                        break
-                else:
-                    return None, None
-        except EnvironmentError as e:
-            print ("Error encountered while trying to get PPA owner and name: %s" % e)
-            return None, None
-        ppa_url, ppa_owner, ppa_name, ppa_x = ppa_info.split("/", 3)
-        return ppa_owner, ppa_name
-
-    def get_ppa_changelog(self, ppa_owner, ppa_name, source_package, version):
-        max_tarball_size = 1000000
-        print ("\nFetching changelog for PPA package %s/%s/%s ..." % (ppa_owner, ppa_name, source_package))
-        if source_package.startswith("lib"):
-            ppa_abbr = source_package[:4]
-        else:
-            ppa_abbr = source_package[0]
-        deb_dsc_uri = "https://ppa.launchpadcontent.net/%s/%s/ubuntu/pool/main/%s/%s/%s_%s.dsc" % (ppa_owner, ppa_name, ppa_abbr, source_package, source_package, version)
-        try:
-            deb_dsc = urllib.request.urlopen(deb_dsc_uri, None, 10).read().decode("utf-8")
-        except Exception as e:
-            print ("Could not open Launchpad URL %s - %s" % (deb_dsc_uri, e))
-            return
-        for line in deb_dsc.split("\n"):
-            if "debian.tar" not in line:
-                continue
-            tarball_line = line.strip().split(" ", 2)
-            if len(tarball_line) == 3:
-                deb_checksum, deb_size, deb_filename = tarball_line
-                break
-        else:
-            deb_filename = None
-        if not deb_filename or not deb_size or not deb_size.isdigit():
-            print ("Unsupported debian .dsc file format. Skipping this package.")
-            return
-        if (int(deb_size) > max_tarball_size):
-            print ("Tarball size %s B exceeds maximum download size %d B. Skipping download." % (deb_size, max_tarball_size))
-            return
-        deb_file_uri = "https://ppa.launchpadcontent.net/%s/%s/ubuntu/pool/main/%s/%s/%s" % (ppa_owner, ppa_name, ppa_abbr, source_package, deb_filename)
-        try:
-            deb_file = urllib.request.urlopen(deb_file_uri, None, 10).read().decode("utf-8")
-        except Exception as e:
-            print ("Could not download tarball from %s - %s" % (deb_file_uri, e))
-            return
-        if deb_filename.endswith(".xz"):
-            cmd = ["xz", "--decompress"]
-            try:
-                xz = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE)
-                xz.stdin.write(deb_file)
-                xz.stdin.close()
-                deb_file = xz.stdout.read()
-                xz.stdout.close()
-            except EnvironmentError as e:
-                print ("Error encountered while decompressing xz file: %s" % e)
-                return
-        deb_file = io.BytesIO(deb_file)
-        try:
-            with tarfile.open(fileobj = deb_file) as f:
-                deb_changelog = f.extractfile("debian/changelog").read()
-        except tarfile.TarError as e:
-            print ("Error encountered while reading tarball: %s" % e)
-            return
-
-        return deb_changelog
+    @_async
+    def load_description(self, update):
+        update.description = self.apt_worker.get_description(update)
+        self.show_loaded_description(update)
 
+    @_idle
+    def show_loaded_description(self, update):
+        (model, iter) = self.treeview.get_selection().get_selected()
+        if iter is not None and model.get_value(iter, UPDATE_OBJ) is update:
+            self.textview_description.set_text(update.description.replace("\\n", "\n"))
 
     @_async
     def retrieve_changelog(self, update):
-        source_package = update.real_source_name
-        origin = update.origin
-        is_kernel_update = update.type == "kernel"
-
-        # get the proxy settings from gsettings
-        ps = proxygsettings.get_proxy_settings()
-
-
-        # Remove the epoch if present in the version
-        version = update.new_version
-        if ":" in version:
-            version = version.split(":")[-1]
-
-        self.set_textview_changes_text(_("Downloading changelog..."))
-
-        if ps == {}:
-            # use default urllib.request proxy mechanisms (possibly *_proxy environment vars)
-            proxy = urllib.request.ProxyHandler()
-        else:
-            # use proxy settings retrieved from gsettings
-            proxy = urllib.request.ProxyHandler(ps)
-
-        opener = urllib.request.build_opener(proxy)
-        urllib.request.install_opener(opener)
-
-        changelog = [_("No changelog available")]
-
-        prefix = source_package[0]
-        if (source_package.startswith("lib")):
-            prefix = source_package[0:4]
-
-        changelog_sources = []
-        if origin == "linuxmint":
-            changelog_sources.append(f"http://packages.linuxmint.com/dev/{source_package}_{version}_amd64.changes")
-            changelog_sources.append(f"http://packages.linuxmint.com/dev/{source_package}_{version}_i386.changes")
-        elif origin == "ubuntu":
-            if is_kernel_update:
-                # Ubuntu HWE kernel versions end with '~' followed by the Ubuntu version (e.g. ~22.04.1). This suffix needs to be removed to get the correct changelog URL
-                kernel_version = version.split("~")[0]
-                changelog_sources.append(f"https://changelogs.ubuntu.com/changelogs/pool/main/l/linux/linux_{kernel_version}/changelog")
-            else:
-                for component in ["main", "multiverse", "universe", "restricted"]:
-                    changelog_sources.append(f"https://changelogs.ubuntu.com/changelogs/pool/{component}/{prefix}/{source_package}/{source_package}_{version}/changelog")
-        elif origin == "debian":
-            if is_kernel_update:
-                changelog_sources.append(f"https://metadata.ftp-master.debian.org/changelogs/main/l/linux/linux_{version}_changelog")
-            else:
-                for component in ["main", "contrib", "non-free", "non-free-firmware"]:
-                    changelog_sources.append(f"https://metadata.ftp-master.debian.org/changelogs/{component}/{prefix}/{source_package}/{source_package}_{version}_changelog")
-        elif origin.startswith("LP-PPA"):
-            ppa_owner, ppa_name = self.get_ppa_info(origin)
-            if ppa_owner and ppa_name:
-                deb_changelog = self.get_ppa_changelog(ppa_owner, ppa_name, source_package, version)
-                if not deb_changelog:
-                    changelog_sources.append(f"https://launchpad.net/~{ppa_owner}/+archive/ubuntu/{ppa_name}/+files/{source_package}_{version}_source.changes")
-                else:
-                    changelog = f"{deb_changelog}\n"
-            else:
-                print ("PPA owner or name could not be determined")
-
-        for changelog_source in changelog_sources:
-            try:
-                print("Trying to fetch the changelog from: %s" % changelog_source)
-                url = urllib.request.urlopen(changelog_source, None, 10)
-                source = url.read().decode("utf-8")
-                url.close()
-
-                changelog = ""
-                if "linuxmint.com" in changelog_source:
-                    changes = source.split("\n")
-                    for change in changes:
-                        stripped_change = change.strip()
-                        if stripped_change == ".":
-                            change = ""
-                        if change == "" or stripped_change.startswith("*") or stripped_change.startswith("["):
-                            changelog = changelog + change + "\n"
-                elif "launchpad.net" in changelog_source:
-                    changes = source.split("Changes:")[1].split("Checksums")[0].split("\n")
-                    for change in changes:
-                        stripped_change = change.strip()
-                        if stripped_change != "":
-                            if stripped_change == ".":
-                                stripped_change = ""
-                            changelog = changelog + stripped_change + "\n"
-                else:
-                    changelog = source
-                changelog = changelog.split("\n")
-                break
-            except:
-                pass
+        changelog = self.changelog_retriever.get_cached_changelog(update)
+        if changelog is None:
+            self.set_textview_changes_text(_("Downloading changelog..."))
+            changelog = self.changelog_retriever.get_changelog(update)
+        if changelog is None:
+            changelog = _("No changelog available")
+        self.show_changelog(update, changelog)
 
-        self.set_textview_changes_text("\n".join(changelog))
+    @_idle
+    def show_changelog(self, update, changelog):
+        # Ignore the result if another update was selected in the meantime
+        (model, iter) = self.treeview.get_selection().get_selected()
+        if iter is not None and model.get_value(iter, UPDATE_OBJ) is update:
+            self.textview_changes.set_text(changelog)
 
 
     @_async
@@ -1266,6 +1483,9 @@ class MintUpdate():
             self.save_window_size()
         except:
             pass # cause log might already been closed
+        if self.refresh_tasks is not None:
+            self.refresh_tasks.cancel()
+        self.apt_worker.stop()
         # Whatever works best heh :)
         os.system("kill -9 %s &" % os.getpid())
 
@@ -1318,23 +1538,17 @@ class MintUpdate():
         self.ui_window.get_style_context().add_class('mintupdate')
 
         (COL_DATE, COL_TYPE, COL_NAME, COL_OLD_VER, COL_NEW_VER) = range(5)
-        model = Gtk.TreeStore(str, str, str, str, str)
 
         treeview = builder.get_object("treeview_history")
         column_date = Gtk.TreeViewColumn(_("Date"), Gtk.CellRendererText(), text=COL_DATE)
-        column_date.set_sort_column_id(COL_DATE)
         column_date.set_resizable(True)
         column_type = Gtk.TreeViewColumn(_("Type"), Gtk.CellRendererText(), text=COL_TYPE)
-        column_type.set_sort_column_id(COL_TYPE)
         column_type.set_resizable(True)
         column_package = Gtk.TreeViewColumn(_("Update"), Gtk.CellRendererText(), text=COL_NAME)
-        column_package.set_sort_column_id(COL_NAME)
         column_package.set_resizable(True)
         self.column_old_version = Gtk.TreeViewColumn(_("Old Version"), Gtk.CellRendererText(ellipsize=Pango.EllipsizeMode.END), text=COL_OLD_VER)
-        self.column_old_version.set_sort_column_id(COL_OLD_VER)
         self.column_old_version.set_resizable(True)
         self.column_new_version = Gtk.TreeViewColumn(_("New Version"), Gtk.CellRendererText(ellipsize=Pango.EllipsizeMode.END), text=COL_NEW_VER)
-        self.column_new_version.set_sort_column_id(COL_NEW_VER)
         self.column_new_version.set_resizable(True)
         treeview.append_column(column_date)
         treeview.append_column(column_type)
@@ -1347,81 +1561,106 @@ class MintUpdate():
         treeview.set_enable_search(True)
         treeview.show()
 
-        updates = []
-        apt_updates = []
-        cinnamon_updates = []
-        flatpak_updates = []
-
-        if os.path.isfile("/var/log/dpkg.log"):
-            apt_updates = subprocess.run('zgrep " upgrade " -sh /var/log/dpkg.log*',
-                stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, shell=True)\
-                .stdout.decode().split("\n")
-
-            for pkg in apt_updates:
-                values = pkg.split(" ")
-                if len(values) == 6:
-                    (date, time, action, package, oldVersion, newVersion) = values
-                    if action != "upgrade" or oldVersion == newVersion:
-                        continue
-                    if ":" in package:
-                        package = package.split(":")[0]
-
-                    iter = model.insert_before(None, None)
-                    model.set_value(iter, COL_NAME, package)
-                    model.row_changed(model.get_path(iter), iter)
-                    model.set_value(iter, COL_DATE, "%s - %s" % (date, time))
-                    model.set_value(iter, COL_OLD_VER, oldVersion)
-                    model.set_value(iter, COL_NEW_VER, newVersion)
-                    model.set_value(iter, COL_TYPE, _("package"))
-
-        if CINNAMON_SUPPORT:
-            logfile = os.path.join(GLib.get_user_state_dir(), 'cinnamon', 'harvester.log')
-            if os.path.isfile(logfile):
-                cinnamon_updates += subprocess.run('grep " upgrade " -sh %s' % logfile,
-                    stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, shell=True)\
-                    .stdout.decode().split("\n")
-
-                for pkg in cinnamon_updates:
-                    values = pkg.split(" ")
-                    if len(values) == 7:
-                        (date, time, spice_type, action, package, oldVersion, newVersion) = values
-                        if action != "upgrade" or oldVersion == newVersion:
-                            continue
-                        if ":" in package:
-                            package = package.split(":")[0]
-
-                        iter = model.insert_before(None, None)
-                        model.set_value(iter, COL_NAME, package)
-                        model.row_changed(model.get_path(iter), iter)
-                        model.set_value(iter, COL_DATE, "%s - %s" % (date, time))
-                        model.set_value(iter, COL_OLD_VER, oldVersion)
-                        model.set_value(iter, COL_NEW_VER, newVersion)
-                        model.set_value(iter, COL_TYPE, spice_type)
+        # The entries are kept in column arrays, sorted there and copied to the model in batches.
+        # In the order of the index, they're read one page per batch.
+        from history import UpdateHistory, HistoryEntries
+        self.load_update_sources()
+        history = UpdateHistory()
+        state = {"entries": HistoryEntries(), "next_key": None, "sort_column": COL_DATE, "descending": True,
+                 "fill_source_id": 0}
 
-        if FLATPAK_SUPPORT:
-            logfile = flatpakUpdater.LOG_PATH
-            if os.path.isfile(logfile):
-                with open(logfile, "r") as f:
-                    for entry in f:
-                        values = entry.strip("\n").split("::")
-                        if len(values) == 7:
-                            (date, time, fp_type, action, name, old_version, new_version) = values
-
-                            iter = model.insert_before(None, None)
-                            model.set_value(iter, COL_NAME, name)
-                            model.row_changed(model.get_path(iter), iter)
-                            model.set_value(iter, COL_DATE, "%s - %s" % (date, time))
-                            model.set_value(iter, COL_OLD_VER, old_version)
-                            model.set_value(iter, COL_NEW_VER, new_version)
-                            model.set_value(iter, COL_TYPE, "flatpak-runtime" if fp_type == "runtime" else "flatpak-app")
-
-
-        updates = apt_updates + cinnamon_updates + flatpak_updates
-
-        model.set_sort_column_id(COL_DATE, Gtk.SortType.DESCENDING)
-        treeview.set_model(model)
+        def load_entries(limit=-1):
+            """ Appends the next entries of the index, returns False if it couldn't """
+            try:
+                entries = self.get_history_entries(history, limit, state["next_key"])
+            except Exception as e:
+                self.logger.write_error("Could not load the history of updates: %s" % e)
+                state["next_key"] = None
+                return False
+            state["entries"].extend(entries)
+            state["next_key"] = entries.get_next_key() if len(entries) == limit else None
+            return True
+
+        def fill_model(order=None):
+            """ Fills the model in the given order of the entries, or in the order of the index """
+            if state["fill_source_id"]:
+                GLib.source_remove(state["fill_source_id"])
+                state["fill_source_id"] = 0
+            entries = state["entries"]
+            model = Gtk.ListStore(str, str, str, str, str)
+            treeview.set_model(model)
+            position = 0
+
+            def add_batch():
+                nonlocal position
+                if order is None:
+                    if position >= len(entries) and state["next_key"] is not None:
+                        load_entries(HISTORY_BATCH_SIZE)
+                    indexes = range(position, min(position + HISTORY_BATCH_SIZE, len(entries)))
+                    count = len(entries)
+                else:
+                    indexes = order[position:position + HISTORY_BATCH_SIZE]
+                    count = len(order)
+                for index in indexes:
+                    model.append(entries.get_row(index))
+                position += HISTORY_BATCH_SIZE
+                if position < count or (order is None and state["next_key"] is not None):
+                    return GLib.SOURCE_CONTINUE
+                state["fill_source_id"] = 0
+                return GLib.SOURCE_REMOVE
+
+            # The first batch is added right away, the others when the main loop is idle
+            if add_batch():
+                state["fill_source_id"] = GLib.idle_add(add_batch)
+
+        def sort_entries():
+            if state["sort_column"] == COL_DATE and state["descending"]:
+                fill_model()
+            else:
+                # Sorting needs all the entries
+                if state["next_key"] is not None:
+                    load_entries()
+                fill_model(state["entries"].get_order(state["sort_column"], state["descending"]))
+
+        def show_entries(entries):
+            if not self.history_window_showing:
+                return
+            state["entries"] = entries
+            state["next_key"] = entries.get_next_key() if len(entries) == HISTORY_BATCH_SIZE else None
+            sort_entries()
+
+        def on_column_clicked(column, column_id):
+            if state["sort_column"] == column_id:
+                state["descending"] = not state["descending"]
+            else:
+                state["sort_column"] = column_id
+                state["descending"] = column_id == COL_DATE
+            for other_column in treeview.get_columns():
+                other_column.set_sort_indicator(other_column == column)
+            column.set_sort_order(Gtk.SortType.DESCENDING if state["descending"] else Gtk.SortType.ASCENDING)
+            sort_entries()
+
+        for column_id, column in enumerate(treeview.get_columns()):
+            column.set_clickable(True)
+            column.connect("clicked", on_column_clicked, column_id)
+        column_date.set_sort_indicator(True)
+        column_date.set_sort_order(Gtk.SortType.DESCENDING)
+
+        treeview.set_model(Gtk.ListStore(str, str, str, str, str))
         treeview.set_search_column(COL_NAME)
 
+        # Show the most recent indexed entries, the others are read as the model is filled,
+        # then index the log entries written since the previous time
+        @_async
+        def load_history():
+            try:
+                GLib.idle_add(show_entries, self.get_history_entries(history, HISTORY_BATCH_SIZE))
+                if history.update(CINNAMON_SUPPORT, FLATPAK_SUPPORT) > 0:
+                    GLib.idle_add(show_entries, self.get_history_entries(history, HISTORY_BATCH_SIZE))
+            except Exception as e:
+                self.logger.write_error("Could not load the history of updates: %s" % e)
+        load_history()
+
         def on_query_tooltip(widget, x, y, keyboard, tooltip):
             if not widget.get_tooltip_context(x, y, keyboard):
                 return False
@@ -1446,11 +1685,24 @@ class MintUpdate():
 
         def destroy_window(widget):
             self.history_window_showing = False
+            if state["fill_source_id"]:
+                GLib.source_remove(state["fill_source_id"])
+                state["fill_source_id"] = 0
             window.destroy()
         window.connect("destroy", destroy_window)
         builder.get_object("button_close").connect("clicked", destroy_window)
         self.history_window_showing = True
 
+    def get_history_entries(self, history, limit=-1, after=None):
+        entries = history.get_entries(limit, after)
+        # Translate the type of package updates once, instead of per row
+        types = entries.columns[1]
+        package_type = _("package")
+        for i, entry_type in enumerate(types):
+            if entry_type == "package":
+                types[i] = package_type
+        return entries
+
 ######### HELP/ABOUT/SHORTCUTS/SOURCES SCREEN #########
 
     def open_help(self, widget):
@@ -1521,6 +1773,7 @@ class MintUpdate():
             return
         self.preferences_window_showing = True
         self.ui_window.set_sensitive(False)
+        from xapp.GSettingsWidgets import GSettingsSwitch, GSettingsSpinButton, SettingsPage, SettingsSection, SettingsRevealer, Switch
         gladefile = "/usr/share/linuxmint/mintupdate/preferences.ui"
         builder = Gtk.Builder()
         builder.set_translation_domain("mintupdate")
@@ -1912,6 +2165,7 @@ class MintUpdate():
     def on_kernel_menu_activated(self, widget):
         self.ui_window.set_sensitive(False)
         self.cache_monitor.pause()
+        from kernelwindow import KernelWindow
         KernelWindow(self.on_kernel_window_closed)
 
     def on_kernel_window_closed(self, needs_refresh):
@@ -1922,32 +2176,19 @@ class MintUpdate():
 
 ######### REFRESH THREAD ##########
 
-    def add_update_to_model(self, model, tracker, item):
-        update, title, description, source, icon, sort_key, tooltip = item
+    def fill_update_model(self, model, model_items):
+        show_descriptions = self.settings.get_boolean("show-descriptions")
+        for item in model_items:
+            update, title, description, source, icon, sort_key, tooltip = item
+            if show_descriptions:
+                display_name = "<b>%s</b>\n%s" % (GLib.markup_escape_text(title), GLib.markup_escape_text(description))
+            else:
+                display_name = "<b>%s</b>" % GLib.markup_escape_text(title)
 
-        iter = model.insert_before(None, None)
-        model.row_changed(model.get_path(iter), iter)
-
-        model.set_value(iter, UPDATE_CHECKED, True)
-        if self.settings.get_boolean("show-descriptions"):
-            model.set_value(iter, UPDATE_DISPLAY_NAME, "<b>%s</b>\n%s" % (GLib.markup_escape_text(title),
-                                                                          GLib.markup_escape_text(description)))
-        else:
-            model.set_value(iter, UPDATE_DISPLAY_NAME, "<b>%s</b>" % GLib.markup_escape_text(title))
-
-        model.set_value(iter, UPDATE_OLD_VERSION, update.old_version)
-        model.set_value(iter, UPDATE_NEW_VERSION, update.new_version)
-        model.set_value(iter, UPDATE_SOURCE, source)
-        model.set_value(iter, UPDATE_SIZE, update.size)
-        model.set_value(iter, UPDATE_SIZE_STR, size_to_string(update.size))
-        model.set_value(iter, UPDATE_TYPE_PIX, icon)
-        model.set_value(iter, UPDATE_TYPE, update.type)
-        model.set_value(iter, UPDATE_TOOLTIP, tooltip)
-        model.set_value(iter, UPDATE_SORT_STR, sort_key)
-        model.set_value(iter, UPDATE_OBJ, update)
-
-        if tracker.active and update.type != "unstable":
-            tracker.update(update)
+            # UPDATE_CHECKED, UPDATE_DISPLAY_NAME, UPDATE_OLD_VERSION, UPDATE_NEW_VERSION, UPDATE_SOURCE,
+            # UPDATE_SIZE, UPDATE_SIZE_STR, UPDATE_TYPE_PIX, UPDATE_TYPE, UPDATE_TOOLTIP, UPDATE_SORT_STR, UPDATE_OBJ
+            model.append(None, (True, display_name, update.old_version, update.new_version, source,
+                                update.size, size_to_string(update.size), icon, update.type, tooltip, sort_key, update))
 
     def check_policy(self):
         """ Check the presence of the Mint layer """
@@ -2034,6 +2275,7 @@ class MintUpdate():
 
     def get_url_last_modified(self, url):
         try:
+            import pycurl
             c = pycurl.Curl()
             c.setopt(pycurl.URL, url)
             c.setopt(pycurl.CONNECTTIMEOUT, 10)
@@ -2075,6 +2317,8 @@ class MintUpdate():
 
     def refresh_cleanup(self):
         # cleanup when finished refreshing
+        if self.refresh_tasks is not None:
+            self.refresh_tasks.cancel()
         self.refreshing = False
         self.uninhibit_pm()
         self.cache_monitor.resume()
@@ -2090,8 +2334,11 @@ class MintUpdate():
             self.show_window()
             return False
 
+        self.load_update_sources()
+
         # Switch to status_refreshing page
         self.refreshing = True
+        self.pending_details = None
         self.set_refresh_mode(True)
         self.set_status(_("Checking for updates"), _("Checking for updates"), "mintupdate-checking-symbolic", not self.settings.get_boolean("hide-systray"))
         self.inhibit_pm("Checking for updates")
@@ -2107,32 +2354,59 @@ class MintUpdate():
                 self._on_infobar_reboot,
                 _("Restart"))
 
+        # Note: The sources are refreshed in parallel, refresh_updates()
+        # handles each of them as soon as it is ready
+        self.refresh_tasks = RefreshTasks(self.logger)
+
+        # APT
         if refresh_cache:
-            # Note: All cache refresh happen asynchronously
-            # refresh_updates() waits for them to finish
             self.logger.write("Refreshing cache")
-
-            # APT
             self.settings.set_int("refresh-last-run", int(time.time()))
-            self.refreshing_apt = True
             if self.hidden:
-                self.refresh_apt_cache_externally()
+                self.refresh_tasks.submit("apt", self.refresh_apt_cache_externally)
             else:
+                self.refresh_tasks.add("apt")
+                import aptkit.simpleclient
                 client = aptkit.simpleclient.SimpleAPTClient(self.ui_window)
                 client.set_finished_callback(self.on_cache_updated)
                 client.update_cache()
 
-            # Cinnamon
-            if CINNAMON_SUPPORT:
-                self.refreshing_cinnamon = True
-                self.refresh_cinnamon_cache()
+        # The launcher is updating the spices and flatpaks, check them once it's done
+        maintenance_running = self.maintenance_running()
+        if maintenance_running and (CINNAMON_SUPPORT or FLATPAK_SUPPORT):
+            self.logger.write("Spices and flatpaks are being updated by the launcher, checking them afterwards")
+            if not self.maintenance_source_id:
+                self.maintenance_source_id = GLib.timeout_add_seconds(MAINTENANCE_CHECK_INTERVAL, self.check_maintenance)
 
-            # Flatpak
-            if FLATPAK_SUPPORT:
-                self.refreshing_flatpak = True
-                self.refresh_flatpak_cache()
+        # Cinnamon
+        if CINNAMON_SUPPORT and self.cinnamon_updater and not maintenance_running:
+            self.refresh_tasks.submit("cinnamon", self.get_cinnamon_updates, refresh_cache)
 
-        self.refresh_updates()
+        # Flatpak
+        if FLATPAK_SUPPORT and self.flatpak_updater and not maintenance_running:
+            self.refresh_tasks.submit("flatpak", self.get_flatpak_updates, refresh_cache, self.refresh_tasks)
+
+        self.refresh_updates(self.refresh_tasks)
+
+    @staticmethod
+    def maintenance_running():
+        """ Returns True while mintupdate-launcher updates the spices and flatpaks """
+        try:
+            with open(MAINTENANCE_PATH) as f:
+                pid = int(f.read())
+            os.kill(pid, 0)
+            return True
+        except (OSError, ValueError):
+            # No maintenance, or the launcher exited without removing the file
+            return False
+
+    def check_maintenance(self):
+        if self.maintenance_running() or self.refreshing:
+            return GLib.SOURCE_CONTINUE
+        self.maintenance_source_id = 0
+        self.logger.write("Launcher maintenance finished; triggering refresh")
+        self.refresh(False)
+        return GLib.SOURCE_REMOVE
 
     def _on_infobar_reboot(self, parent, response_id):
         session = os.environ.get("XDG_CURRENT_DESKTOP")
@@ -2147,56 +2421,65 @@ class MintUpdate():
         else:
             subprocess.run(['/usr/bin/systemctl', 'reboot'])
 
-    @_async
+    # Part of refresh(), in a RefreshTasks thread
     def refresh_apt_cache_externally(self):
         try:
             refresh_command = ["sudo", "/usr/bin/mint-refresh-cache"]
             subprocess.run(refresh_command)
         except:
             print("Exception while calling mint-refresh-cache")
-        finally:
-            self.refreshing_apt = False
 
-    @_async
-    def refresh_cinnamon_cache(self):
-        self.logger.write("Refreshing cache for Cinnamon updates")
-        for spice_type in cinnamon.updates.SPICE_TYPES:
-            try:
-                self.cinnamon_updater.refresh_cache_for_type(spice_type)
-            except:
-                self.logger.write_error("Something went wrong fetching Cinnamon %ss: %s" % (spice_type, str(sys.exc_info()[0])))
-                print("-- Exception occurred fetching Cinnamon %ss:\n%s" % (spice_type, traceback.format_exc()))
-        self.refreshing_cinnamon = False
+    # Part of refresh(), in a RefreshTasks thread
+    def get_cinnamon_updates(self, refresh_cache):
+        if refresh_cache:
+            self.logger.write("Refreshing cache for Cinnamon updates")
+            # Each spice type has its own index and cache, their downloads can overlap
+            with concurrent.futures.ThreadPoolExecutor(max_workers=CINNAMON_REFRESH_WORKERS) as executor:
+                executor.map(self.refresh_cinnamon_cache_for_type, cinnamon.updates.SPICE_TYPES)
+        return self.cinnamon_updater.get_updates()
+
+    def refresh_cinnamon_cache_for_type(self, spice_type):
+        start_time = time.monotonic()
+        try:
+            self.cinnamon_updater.refresh_cache_for_type(spice_type)
+            self.logger.write("Cinnamon %ss refreshed in %.1fs" % (spice_type, time.monotonic() - start_time))
+        except:
+            self.logger.write_error("Something went wrong fetching Cinnamon %ss: %s" % (spice_type, str(sys.exc_info()[0])))
+            print("-- Exception occurred fetching Cinnamon %ss:\n%s" % (spice_type, traceback.format_exc()))
 
-    @_async
-    def refresh_flatpak_cache(self):
-        self.logger.write("Refreshing cache for Flatpak updates")
-        self.flatpak_updater.refresh()
-        self.refreshing_flatpak = False
+    # Part of refresh(), in a RefreshTasks thread
+    def get_flatpak_updates(self, refresh_cache, refresh_tasks):
+        if refresh_cache:
+            self.logger.write("Refreshing cache for Flatpak updates")
+            self.flatpak_updater.refresh()
+        # Each update is reported as soon as the worker sends it
+        self.flatpak_updater.fetch_updates(lambda update: refresh_tasks.put_result("flatpak", [update]))
+        return self.flatpak_updater.error
 
     def on_cache_updated(self, transaction=None, exit_state=None):
-        self.refreshing_apt = False
+        self.refresh_tasks.set_result("apt", exit_state)
 
 
 # ---------------- Test Mode ------------------------------------------#
     def dummy_update(self, check, package_name, kernel=False):
-        pkg = check.cache[package_name]
+        pkg = check.packages[package_name]
         check.add_update(pkg, kernel, "99.0.0")
 
-    # Part of check_apt_in_external_process fork
-    def handle_apt_check_test(self, queue):
+    # Part of check_apt, in the APT check worker
+    def handle_apt_check_test(self):
         print("SIMULATING TEST MODE:", self.test_mode)
+        import checkAPT
         if self.test_mode == "error":
             # See how an error from checkAPT subprocess is handled
             raise Exception("Testing - this is a simulated error.")
         elif self.test_mode == "up-to-date":
             # Simulate checkAPT finding no updates
-            queue.put([None, []])
+            return [None, []]
         elif self.test_mode == "self-update":
             # Simulate an update of mintupdate itself.
             check = checkAPT.APTCheck()
             self.dummy_update(check, "mintupdate", False)
-            queue.put([None, list(check.updates.values())])
+            return [None, list(check.updates.values())]
         elif self.test_mode == "updates":
             # Simulate some normal updates
             check = checkAPT.APTCheck()
@@ -2204,7 +2487,7 @@ class MintUpdate():
             self.dummy_update(check, "mint-meta-core", False)
             self.dummy_update(check, "linux-generic", True)
             self.dummy_update(check, "xreader", False)
-            queue.put([None, list(check.updates.values())])
+            return [None, list(check.updates.values())]
         elif self.test_mode == "tracker-max-age":
             # Simulate the UpdateTracker notifying about updates.
             check = checkAPT.APTCheck()
@@ -2226,38 +2509,53 @@ class MintUpdate():
             with open(os.path.join(CONFIG_PATH, "updates.json"), "w") as f:
                 json.dump(root_json, f)
 
-            queue.put([None, list(check.updates.values())])
+            return [None, list(check.updates.values())]
 
-        return True
 # ---------------- Testing ------------------------------------------#
 
-    # called in a different process
-    def check_apt_in_external_process(self, queue):
-        # in the queue we put: error_message (None if successful), list_of_updates (None if error)
+    # called in the APT check worker
+    def check_apt(self, check, enrich=True):
+        # returns: error_message (None if successful), list_of_updates (None if error)
         try:
             if self.test_mode:
-                self.handle_apt_check_test(queue)
-            else:
-                check = checkAPT.APTCheck()
+                return self.handle_apt_check_test()
+            # The system-wide check (system_check.py) spares this session from opening the APT cache
+            if not check.load_system_result():
                 check.find_changes()
-                check.apply_l10n_descriptions()
-                check.load_aliases()
-                check.apply_aliases()
-                check.clean_descriptions()
-                updates = check.get_updates()
-                queue.put([None, updates])
+            if enrich:
+                return self.enrich_apt_updates(check)
+            return [None, check.get_updates()]
         except Exception as error:
-            error_msg = str(error).replace("E:", "\n").strip()
-            queue.put([error_msg, None])
-            print(sys.exc_info()[0])
-            print("Error in checkAPT: %s" % error)
-            traceback.print_exc()
+            return self.get_apt_check_error(error)
+
+    # Part of check_apt, in the APT check worker
+    def enrich_apt_updates(self, check, source_names=None):
+        updates = check.updates
+        if source_names is not None:
+            if len(source_names) == 0:
+                return [None, []]
+            check.updates = {name: updates[name] for name in source_names}
+        try:
+            check.apply_l10n_descriptions()
+            check.apply_aliases()
+            check.clean_descriptions()
+            return [None, check.get_updates()]
+        except Exception as error:
+            return self.get_apt_check_error(error)
+        finally:
+            check.updates = updates
+
+    def get_apt_check_error(self, error):
+        error_msg = str(error).replace("E:", "\n").strip()
+        print(sys.exc_info()[0])
+        print("Error in checkAPT: %s" % error)
+        traceback.print_exc()
+        return [error_msg, None]
 
     @_async
-    def refresh_updates(self):
-        # Wait for all the caches to be refreshed
-        while (self.refreshing_apt or self.refreshing_flatpak or self.refreshing_cinnamon):
-            time.sleep(1)
+    def refresh_updates(self, refresh_tasks):
+        # Wait for the APT cache only, Flatpak and Cinnamon are handled in show_updates()
+        refresh_tasks.wait("apt")
 
         # Check presence of Mint layer
         if self.test_mode == "layer-error" or (not self.check_policy()):
@@ -2280,12 +2578,23 @@ class MintUpdate():
             error = None
             updates = None
 
-            # call checkAPT in a different process
-            queue = Queue()
-            process = Process(target=self.check_apt_in_external_process, args=[queue])
-            process.start()
-            error, updates = queue.get()
-            process.join()
+            # While the window is hidden, the updates are only counted for the status icon
+            tray_mode = self.hidden and not self.test_mode
+
+            # Reuse the previous result if nothing changed in the package system
+            cache_key = None
+            enriched = True
+            if not self.test_mode:
+                cache_key = self.update_cache.get_key()
+                updates = self.update_cache.load(cache_key)
+
+            if updates is not None:
+                self.logger.write("Package system unchanged, using cached list of updates")
+            else:
+                # call checkAPT in the worker process. The descriptions are translated and aliased
+                # afterwards, see show_apt_updates(), except in test mode
+                enriched = bool(self.test_mode)
+                error, updates = self.apt_worker.check(enriched)
 
             if error is not None:
                 self.logger.write_error("Error in checkAPT.py, could not refresh the list of updates")
@@ -2297,8 +2606,10 @@ class MintUpdate():
                 "mintupdate-error-symbolic", True)
                 self.refresh_cleanup()
                 return
+            elif tray_mode:
+                self.count_updates(updates, refresh_tasks, cache_key, enriched)
             else:
-                self.show_updates(updates)
+                self.show_updates(updates, refresh_tasks, cache_key, enriched)
 
         except:
             print("-- Exception occurred in the refresh thread:\n%s" % traceback.format_exc())
@@ -2306,138 +2617,100 @@ class MintUpdate():
             self.set_status(_("Could not refresh the list of updates"),
                                         _("Could not refresh the list of updates"), "mintupdate-error-symbolic", True)
 
-    def show_updates(self, updates):
-        try:
-            model_items = []
-
-            # Look at the updates one by one
-            num_visible = 0
-            num_security = 0
-            num_software = 0
-            download_size = 0
-            is_self_update = False
-
-            if len(updates) > 0:
-                for update in updates:
-                    # Check if self-update is needed
-                    if update.source_name in PRIORITY_UPDATES:
-                        is_self_update = True
-
-                    shortdesc = update.short_description
-                    if len(shortdesc) > 100:
-                        try:
-                            shortdesc = shortdesc[:100]
-                            # Remove the last word.. in case we chomped
-                            # a word containing an &#234; character..
-                            # if we ended up with &.. without the code and ; sign
-                            # pango would fail to set the markup
-                            words = shortdesc.split()
-                            shortdesc = " ".join(words[:-1]) + "..."
-                        except:
-                            pass
-
-                    origin = update.origin.replace("linuxmint", "Linux Mint").replace("ubuntu", "Ubuntu").replace("LP-PPA-", "PPA ").replace("debian", "Debian")
-
-                    if update.type == "security":
-                        sort_key = 1
-                        tooltip = _("Security update")
-                        num_security += 1
-                    elif update.type == "kernel":
-                        sort_key = 2
-                        tooltip = _("Kernel update")
-                        num_security += 1
-                    elif update.type == "unstable":
-                        sort_key = 7
-                        tooltip = _("Unstable software. Only apply this update to help developers beta-test new software.")
-                    else:
-                        if origin in ["Ubuntu", "Debian", "Linux Mint", "Canonical"]:
-                            sort_key = 3
-                            tooltip = _("Software update")
-                        else:
-                            sort_key = 4
-                            tooltip = "%s\n%s" % (_("3rd-party update"), origin)
-                            update.type = "3rd-party"
-                        num_software += 1
-
-                    title = update.display_name
-                    description = shortdesc
-                    source = f"{origin} / {update.archive}"
-                    icon = f"mintupdate-type-{update.type}-symbolic"
-                    model_items.append((update, title, description, source, icon, f"{sort_key}{update.display_name}", tooltip))
-
-                    num_visible += 1
-                    download_size += update.size
+    def is_self_update(self, updates):
+        # Check if self-update is needed
+        for update in updates:
+            if update.source_name in PRIORITY_UPDATES:
+                return True
+        return False
+
+    def get_other_updates(self, refresh_tasks, callback):
+        """ Passes the model items of the Flatpak and Cinnamon updates to the callback as they come,
+            returns the Flatpak error if any """
+        flatpak_error = None
+        blacklist = Blacklist(self.settings.get_strv("blacklisted-packages"))
+        for (name, result, finished) in refresh_tasks.get_results(["flatpak", "cinnamon"]):
+            if name == "flatpak":
+                # Flatpak updates come one by one, the final result is the error if any
+                if finished:
+                    flatpak_error = result
+                    continue
+                model_items = self.get_flatpak_model_items(result, blacklist)
+            elif result is not None:
+                model_items = self.get_cinnamon_model_items(result, blacklist)
+            else:
+                continue
+            if len(model_items) > 0:
+                callback(model_items)
+        if flatpak_error is not None:
+            self.logger.write("Could not check for flatpak updates: %s" % flatpak_error)
+        return flatpak_error
+
+    def show_flatpak_error(self, flatpak_error):
+        msg = _("Error checking for flatpak updates: %s") % flatpak_error
+        self.set_status_message(msg)
+
+    def get_enriched_updates(self, updates):
+        """ Returns the given updates with their translated descriptions and aliases, None if that failed """
+        error, enriched_updates = self.apt_worker.enrich([update.source_name for update in updates])
+        if error is not None:
+            self.logger.write_error("Could not load the descriptions of the updates: %s" % error)
+            return None
+        return enriched_updates
 
-            if not self.test_mode:
-                if FLATPAK_SUPPORT and self.flatpak_updater and not is_self_update:
-                    blacklist = self.settings.get_strv("blacklisted-packages")
-
-                    self.flatpak_updater.fetch_updates()
-                    if self.flatpak_updater.error is None:
-                        for update in self.flatpak_updater.updates:
-                            update.type = "flatpak"
-                            if update.ref_name in blacklist or update.source_packages[0] in blacklist:
-                                continue
-                            if update.flatpak_type == "app":
-                                tooltip = _("Flatpak application")
-                            else:
-                                tooltip = _("Flatpak runtime")
-
-                            title = update.name
-                            description = update.summary
-                            source = update.origin
-                            icon = "mintupdate-type-flatpak-symbolic"
-                            model_items.append((update, title, description, source, icon, f"5{update.ref_name}", tooltip))
-
-                            num_software += 1
-                            num_visible += 1
-                            download_size += update.size
-
-                if CINNAMON_SUPPORT and not is_self_update:
-                    blacklist = self.settings.get_strv("blacklisted-packages")
-
-                    for update in self.cinnamon_updater.get_updates():
-                        update.real_source_name = update.uuid
-                        update.source_packages = ["%s=%s" % (update.uuid, update.new_version)]
-                        update.package_names = []
-                        update.type = "cinnamon"
-                        if update.uuid in blacklist or update.source_packages[0] in blacklist:
-                            continue
-                        if update.spice_type == cinnamon.SPICE_TYPE_APPLET:
-                            tooltip = _("Cinnamon applet")
-                        elif update.spice_type == cinnamon.SPICE_TYPE_DESKLET:
-                            tooltip = _("Cinnamon desklet")
-                        elif update.spice_type == "action":
-                            # The constant cinnamon.SPICE_TYPE_ACTION is new in Cinnamon 6.0
-                            # use the value "action" instead here so this code can be
-                            # backported.
-                            tooltip = _("Nemo action")
-                        elif update.spice_type == cinnamon.SPICE_TYPE_THEME:
-                            tooltip = _("Cinnamon theme")
-                        else:
-                            tooltip = _("Cinnamon extension")
+    def show_apt_updates(self, is_self_update, updates, cache_key, enriched):
+        """ Shows the security and kernel updates first, then the others. Unless they're enriched already,
+            their descriptions are translated and aliased stage by stage. Returns the updates as shown. """
+        if is_self_update:
+            stages = [updates]
+        else:
+            stages = [[update for update in updates if update.type in ("security", "kernel")],
+                      [update for update in updates if update.type not in ("security", "kernel")]]
+        updates = []
+        for (index, stage) in enumerate(stages):
+            if not enriched and len(stage) > 0:
+                enriched_stage = self.get_enriched_updates(stage)
+                if enriched_stage is None:
+                    # Show them as they are, but don't cache them
+                    cache_key = None
+                else:
+                    stage = enriched_stage
+            updates += stage
+            if index == 0:
+                self.show_updates_in_UI(is_self_update, self.get_apt_model_items(stage))
+                if len(stages) > 1:
+                    self.set_status_message(_("Security and kernel updates loaded, loading the other updates"))
+            elif len(stage) > 0:
+                self.add_updates_to_UI(self.get_apt_model_items(stage))
+        if not enriched:
+            self.update_cache.save(cache_key, updates)
+        return updates
+
+    def show_updates(self, updates, refresh_tasks, cache_key, enriched):
+        try:
+            is_self_update = self.is_self_update(updates)
 
-                        title = update.uuid
-                        description = update.name
-                        source = "Linux Mint / cinnamon"
-                        icon = "cinnamon-symbolic"
-                        model_items.append((update, title, description, source, icon, f"6{update.uuid}", tooltip))
+            # Show the APT updates while Flatpak and Cinnamon might still be refreshing
+            updates = self.show_apt_updates(is_self_update, updates, cache_key, enriched)
 
-                        num_software += 1
-                        num_visible += 1
-                        download_size += update.size
+            flatpak_error = None
+            if not self.test_mode and not is_self_update:
+                if (FLATPAK_SUPPORT and self.flatpak_updater) or (CINNAMON_SUPPORT and self.cinnamon_updater):
+                    self.set_status_message(_("Checking for Flatpak and Cinnamon updates"))
+                flatpak_error = self.get_other_updates(refresh_tasks, self.add_updates_to_UI)
 
             # Updates found, update status message
-            self.show_updates_in_UI(num_visible, num_software, num_security, download_size, is_self_update, model_items)
+            self.finish_updates_in_UI(is_self_update)
 
-            if FLATPAK_SUPPORT and self.flatpak_updater.error is not None and not is_self_update:
-                self.logger.write("Could not check for flatpak updates: %s" % self.flatpak_updater.error)
-                msg = _("Error checking for flatpak updates: %s") % self.flatpak_updater.error
-                self.set_status_message(msg)
+            if flatpak_error is not None:
+                self.show_flatpak_error(flatpak_error)
 
             # Check whether to display the mirror infobar
             self.mirror_check()
 
+            if self.settings.get_boolean("prefetch-changelogs") and not is_self_update and not self.test_mode:
+                self.changelog_prefetcher.start(updates)
+
             self.logger.write("Refresh finished")
 
         except:
@@ -2449,6 +2722,183 @@ class MintUpdate():
         finally:
             self.refresh_cleanup()
 
+    def count_updates(self, updates, refresh_tasks, cache_key, enriched):
+        """ Tray mode: only counts the updates for the status icon and the tracker. The list of updates
+            is built by show_details() when the window is shown. """
+        try:
+            is_self_update = self.is_self_update(updates)
+            for update in updates:
+                self.get_apt_origin(update)
+            other_model_items = []
+            flatpak_error = None
+            if not is_self_update:
+                flatpak_error = self.get_other_updates(refresh_tasks, other_model_items.extend)
+
+            self.pending_details = {"updates": updates,
+                                    "cache_key": cache_key,
+                                    "enriched": enriched,
+                                    "is_self_update": is_self_update,
+                                    "other_model_items": other_model_items,
+                                    "flatpak_error": flatpak_error}
+            # Drop the previous list, it's rebuilt when the window is shown
+            self.show_updates_in_UI(is_self_update, [])
+            self.show_update_counts(updates + [item[0] for item in other_model_items])
+
+            self.logger.write("Refresh finished (tray mode)")
+
+        except:
+            print("-- Exception occurred while counting updates:\n%s" % traceback.format_exc())
+            self.logger.write_error("Exception occurred while counting updates: %s" % str(sys.exc_info()[0]))
+            self.set_status(_("Could not refresh the list of updates"),
+                                        _("Could not refresh the list of updates"), "mintupdate-error-symbolic", True)
+
+        finally:
+            self.refresh_cleanup()
+            self.show_details_if_visible()
+
+    @_idle
+    def show_details_if_visible(self):
+        # The window might have been shown during the refresh
+        if not self.hidden:
+            self.show_details()
+
+    def show_details(self):
+        """ Builds the list of updates counted in tray mode, called in the main loop """
+        if self.pending_details is None or self.refreshing:
+            return
+        details = self.pending_details
+        self.pending_details = None
+        self.refreshing = True
+        self.cache_monitor.pause()
+        self.set_refresh_mode(True)
+        self.load_details(details)
+
+    @_async
+    def load_details(self, details):
+        try:
+            is_self_update = details["is_self_update"]
+            updates = self.show_apt_updates(is_self_update, details["updates"], details["cache_key"], details["enriched"])
+            if len(details["other_model_items"]) > 0:
+                self.add_updates_to_UI(details["other_model_items"])
+            # The status icon and the tracker were already updated by count_updates()
+            self.finish_updates_in_UI(is_self_update, False)
+
+            if details["flatpak_error"] is not None:
+                self.show_flatpak_error(details["flatpak_error"])
+
+            self.mirror_check()
+
+            if self.settings.get_boolean("prefetch-changelogs") and not is_self_update:
+                self.changelog_prefetcher.start(updates)
+
+            self.logger.write("List of updates loaded")
+
+        except:
+            print("-- Exception occurred while loading updates:\n%s" % traceback.format_exc())
+            self.logger.write_error("Exception occurred while loading updates: %s" % str(sys.exc_info()[0]))
+            self.set_status(_("Could not refresh the list of updates"),
+                                        _("Could not refresh the list of updates"), "mintupdate-error-symbolic", True)
+
+        finally:
+            self.refresh_cleanup()
+
+    def get_apt_model_items(self, updates):
+        model_items = []
+        for update in updates:
+            shortdesc = update.short_description
+            if len(shortdesc) > 100:
+                try:
+                    shortdesc = shortdesc[:100]
+                    # Remove the last word.. in case we chomped
+                    # a word containing an &#234; character..
+                    # if we ended up with &.. without the code and ; sign
+                    # pango would fail to set the markup
+                    words = shortdesc.split()
+                    shortdesc = " ".join(words[:-1]) + "..."
+                except:
+                    pass
+
+            origin = self.get_apt_origin(update)
+
+            if update.type == "security":
+                sort_key = 1
+                tooltip = _("Security update")
+            elif update.type == "kernel":
+                sort_key = 2
+                tooltip = _("Kernel update")
+            elif update.type == "unstable":
+                sort_key = 7
+                tooltip = _("Unstable software. Only apply this update to help developers beta-test new software.")
+            else:
+                if origin in ["Ubuntu", "Debian", "Linux Mint", "Canonical"]:
+                    sort_key = 3
+                    tooltip = _("Software update")
+                else:
+                    sort_key = 4
+                    tooltip = "%s\n%s" % (_("3rd-party update"), origin)
+
+            title = update.display_name
+            description = shortdesc
+            source = f"{origin} / {update.archive}"
+            icon = f"mintupdate-type-{update.type}-symbolic"
+            model_items.append((update, title, description, source, icon, f"{sort_key}{update.display_name}", tooltip))
+        return model_items
+
+    def get_apt_origin(self, update):
+        """ Returns the origin of an update as shown to the user, and marks updates from other origins as 3rd-party """
+        origin = update.origin.replace("linuxmint", "Linux Mint").replace("ubuntu", "Ubuntu").replace("LP-PPA-", "PPA ").replace("debian", "Debian")
+        if update.type not in ("security", "kernel", "unstable") and origin not in ["Ubuntu", "Debian", "Linux Mint", "Canonical"]:
+            update.type = "3rd-party"
+        return origin
+
+    def get_flatpak_model_items(self, updates, blacklist):
+        model_items = []
+        for update in updates:
+            update.type = "flatpak"
+            if blacklist.is_blacklisted(update.ref_name, update.new_version):
+                continue
+            if update.flatpak_type == "app":
+                tooltip = _("Flatpak application")
+            else:
+                tooltip = _("Flatpak runtime")
+
+            title = update.name
+            description = update.summary
+            source = update.origin
+            icon = "mintupdate-type-flatpak-symbolic"
+            model_items.append((update, title, description, source, icon, f"5{update.ref_name}", tooltip))
+        return model_items
+
+    def get_cinnamon_model_items(self, updates, blacklist):
+        model_items = []
+        for update in updates:
+            update.real_source_name = update.uuid
+            update.source_packages = ["%s=%s" % (update.uuid, update.new_version)]
+            update.package_names = []
+            update.type = "cinnamon"
+            if blacklist.is_blacklisted(update.uuid, update.new_version):
+                continue
+            if update.spice_type == cinnamon.SPICE_TYPE_APPLET:
+                tooltip = _("Cinnamon applet")
+            elif update.spice_type == cinnamon.SPICE_TYPE_DESKLET:
+                tooltip = _("Cinnamon desklet")
+            elif update.spice_type == "action":
+                # The constant cinnamon.SPICE_TYPE_ACTION is new in Cinnamon 6.0
+                # use the value "action" instead here so this code can be
+                # backported.
+                tooltip = _("Nemo action")
+            elif update.spice_type == cinnamon.SPICE_TYPE_THEME:
+                tooltip = _("Cinnamon theme")
+            else:
+                tooltip = _("Cinnamon extension")
+
+            title = update.uuid
+            description = update.name
+            source = "Linux Mint / cinnamon"
+            icon = "cinnamon-symbolic"
+            model_items.append((update, title, description, source, icon, f"6{update.uuid}", tooltip))
+        return model_items
+
 
 ############## INSTALLATION #########
 
@@ -2478,6 +2928,7 @@ class MintUpdate():
         return GLib.SOURCE_REMOVE
 
     def on_apt_install_finished(self, transaction=None, exit_state=None):
+        import aptkit.enums
         needs_refresh = False
         if exit_state == aptkit.enums.EXIT_SUCCESS:
             self.logger.write("Install finished successfully")
@@ -2612,6 +3063,7 @@ class MintUpdate():
                 if len(self.packages) > 0:
                     self.set_status(_("Installing updates"), _("Installing updates"), "mintupdate-installing-symbolic", True)
                     self.logger.write("Ready to launch aptkit")
+                    import aptkit.simpleclient
                     client = aptkit.simpleclient.SimpleAPTClient(self.ui_window)
                     client.set_finished_callback(self.on_apt_install_finished)
                     client.set_cancelled_callback(self.on_apt_install_cancelled)
@@ -1,28 +1,16 @@
 #!/usr/bin/python3
 
 import argparse
-import fnmatch
 import os
 import subprocess
 import sys
 import traceback
 
 from checkAPT import APTCheck
-from Classes import PRIORITY_UPDATES
+from Classes import PRIORITY_UPDATES, Blacklist
 
 if __name__ == "__main__":
 
-    def is_blacklisted(blacklisted_packages, source_name, version):
-        for blacklist in blacklisted_packages:
-            if "=" in blacklist:
-                (bl_pkg, bl_ver) = blacklist.split("=", 1)
-            else:
-                bl_pkg = blacklist
-                bl_ver = None
-            if fnmatch.fnmatch(source_name, bl_pkg) and (not bl_ver or bl_ver == version):
-                return True
-        return False
-
     parser = argparse.ArgumentParser(prog="mintupdate-cli")
     parser.add_argument("command", help="command to run (possible commands are: list, upgrade)")
 
@@ -42,7 +30,10 @@ if __name__ == "__main__":
         if args.refresh_cache:
             subprocess.run("sudo /usr/bin/mint-refresh-cache", shell=True)
         check = APTCheck()
-        check.find_changes()
+        if not check.load_system_result():
+            # The descriptions aren't shown, don't read them for every update
+            check.with_descriptions = False
+            check.find_changes()
 
         blacklisted = []
         if os.path.exists("/etc/mintupdate.blacklist"):
@@ -54,6 +45,7 @@ if __name__ == "__main__":
                     blacklisted.append(line)
         if args.ignore:
             blacklisted.extend(args.ignore.split(","))
+        blacklist = Blacklist(blacklisted)
 
         updates = []
         for source_name in sorted(check.updates.keys()):
@@ -64,7 +56,7 @@ if __name__ == "__main__":
                 continue
             elif args.only_security and update.type != "security":
                 continue
-            elif is_blacklisted(blacklisted, update.real_source_name, update.new_version):
+            elif blacklist.is_blacklisted(update.real_source_name, update.new_version):
                 continue
             else:
                 updates.append(update)
@@ -0,0 +1,70 @@
+#!/usr/bin/python3
+
+# Checks for updates once for all the user sessions, started by mintupdate-system-check.path
+# when the package system changes. The sessions read the result from SYSTEM_CHECK_PATH.
+
+import os
+import sys
+import time
+import traceback
+
+import checkAPT
+from Classes import Blacklist, SystemCheckResult, get_configured_kernel_type, get_dpkg_lock_holder
+
+# The dpkg status changes many times while packages are installed, wait for dpkg to be done (in seconds).
+# Past LOCK_MAX_WAIT the check is given up, the next change to the dpkg status starts it again.
+LOCK_CHECK_INTERVAL = 5
+LOCK_MAX_WAIT = 1800
+# Checks done when the package system keeps changing during the check
+MAX_ATTEMPTS = 3
+
+def wait_for_dpkg():
+    deadline = time.monotonic() + LOCK_MAX_WAIT
+    while get_dpkg_lock_holder() is not None:
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(LOCK_CHECK_INTERVAL)
+    return True
+
+def check(result, kernel_type):
+    """ Checks for updates and saves the result, returns the number of updates or None if the
+        package system changed during the check """
+    # Opening the cache can regenerate pkgcache.bin, so the cache is opened before reading the key
+    apt_check = checkAPT.APTCheck()
+    apt_check.open_cache()
+    key = result.get_key()
+    if key is None:
+        raise Exception("Could not read the state of the package system")
+    # The blacklists belong to the users, they're applied by their sessions
+    apt_check.find_changes(Blacklist([]))
+    updates = apt_check.get_updates()
+    if result.get_key() != key:
+        return None
+    result.save(key, kernel_type, updates, apt_check.candidates, checkAPT.meta_names)
+    return len(updates)
+
+if __name__ == "__main__":
+    if os.getuid() != 0:
+        print("Error: This must be run as root")
+        sys.exit(1)
+
+    try:
+        start = time.monotonic()
+        kernel_type = get_configured_kernel_type()
+        result = SystemCheckResult()
+        for attempt in range(MAX_ATTEMPTS):
+            if not wait_for_dpkg():
+                print("dpkg is still locked after %ds, no result saved" % LOCK_MAX_WAIT)
+                sys.exit(1)
+            count = check(result, kernel_type)
+            if count is not None:
+                print("Found %d updates in %.1fs" % (count, time.monotonic() - start))
+                break
+            print("The package system changed during the check, checking again")
+        else:
+            print("The package system kept changing, no result saved")
+            sys.exit(1)
+    except Exception as error:
+        print(error)
+        traceback.print_exc()
+        sys.exit(1)